@@ -194,6 +194,16 @@ class W_Root(object):
             from rpython.rlib import rgc
             rgc.may_ignore_finalizer(self)
 
+    def get_external_memory(self):
+        """The number of bytes of raw memory, outside the GC heap, that
+        this object keeps alive and frees when it dies or is closed.
+        Objects that allocate such memory should report it as memory
+        pressure (rgc.add_memory_pressure() or lltype.malloc(...,
+        add_memory_pressure=True)) and override this method, so that
+        gc.get_external_memory() can show where it is.
+        """
+        return 0
+
     # hooks that the mapdict implementations needs:
     def _get_mapdict_map(self):
         return None
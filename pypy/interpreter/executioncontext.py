@@ -1,4 +1,5 @@
 import sys
+import time
 from pypy.interpreter.error import OperationError, get_cleared_operation_error
 from rpython.rlib.unroll import unrolling_iterable
 from rpython.rlib.objectmodel import specialize, not_rpython
@@ -404,7 +405,10 @@ class AbstractActionFlag(object):
         self._periodic_actions = []
         self._nonperiodic_actions = []
         self.has_bytecode_counter = False
-        self.fired_actions = None
+        # the fired actions form a linked list, via 'action._next', so
+        # that fire() doesn't allocate and can be called from a GC hook
+        self._fired_actions_first = None
+        self._fired_actions_last = None
         # the default value is not 100, unlike CPython 2.7, but a much
         # larger value, because we use a technique that not only allows
         # but actually *forces* another thread to run whenever the counter
@@ -416,9 +420,12 @@ class AbstractActionFlag(object):
         """Request for the action to be run before the next opcode."""
         if not action._fired:
             action._fired = True
-            if self.fired_actions is None:
-                self.fired_actions = []
-            self.fired_actions.append(action)
+            action._next = None
+            if self._fired_actions_last is None:
+                self._fired_actions_first = action
+            else:
+                self._fired_actions_last._next = action
+            self._fired_actions_last = action
             # set the ticker to -1 in order to force action_dispatcher()
             # to run at the next possible bytecode
             self.reset_ticker(-1)
@@ -467,9 +474,10 @@ class AbstractActionFlag(object):
                 action.perform(ec, frame)
 
             # nonperiodic actions
-            list = self.fired_actions
-            if list is not None:
-                self.fired_actions = None
+            action = self._fired_actions_first
+            if action is not None:
+                self._fired_actions_first = None
+                self._fired_actions_last = None
                 # NB. in case there are several actions, we reset each
                 # 'action._fired' to false only when we're about to call
                 # 'action.perform()'.  This means that if
@@ -477,9 +485,12 @@ class AbstractActionFlag(object):
                 # the corresponding perform(), the fire() has no
                 # effect---which is the effect we want, because
                 # perform() will be called anyway.
-                for action in list:
+                while action is not None:
+                    next_action = action._next
+                    action._next = None
                     action._fired = False
                     action.perform(ec, frame)
+                    action = next_action
 
         self.action_dispatcher = action_dispatcher
 
@@ -512,6 +523,7 @@ class AsyncAction(object):
     to occur between two opcodes, not at a completely random time.
     """
     _fired = False
+    _next = None
 
     def __init__(self, space):
         self.space = space
@@ -544,19 +556,67 @@ class UserDelAction(AsyncAction):
         self.finalizers_lock_count = 0        # see pypy/module/gc
         self.enabled_at_app_level = True      # see pypy/module/gc
         self.pending_with_disabled_del = None
+        # the objects fetched from the finalizer_queue whose finalizers
+        # did not run yet: they are pending[pending_start:]
+        self.pending = []
+        self.pending_start = 0
+        self.time_budget = 0.0                # see gc.set_finalizer_budget()
+        self.finalizer_thread = None          # see pypy/module/gc
+        # statistics, see gc.get_finalizer_stats()
+        self.stat_finalized = 0
+        self.stat_max_backlog = 0
+        self.stat_deferred = 0
 
     def perform(self, executioncontext, frame):
-        self._run_finalizers()
+        if self.finalizer_thread is not None:
+            self.finalizer_thread.wake_up()
+        else:
+            self._run_finalizers(self.time_budget)
 
     @jit.dont_look_inside
-    def _run_finalizers(self):
+    def _run_finalizers(self, time_budget=0.0):
         # called by perform() when we have to "perform" this action,
-        # and also directly at the end of gc.collect).
+        # and also directly at the end of gc.collect).  If 'time_budget'
+        # is positive, we stop after that many seconds and fire the
+        # action again, so that the remaining finalizers run at the
+        # next check for actions instead of in one long stall.
+        self._fetch_dead()
+        deadline = 0.0
+        if time_budget > 0.0:
+            deadline = time.time() + time_budget
+        while self.pending_start < len(self.pending):
+            w_obj = self.pending[self.pending_start]
+            self.pending[self.pending_start] = None
+            self.pending_start += 1
+            self._call_finalizer(w_obj)
+            self.stat_finalized += 1
+            if deadline > 0.0 and time.time() >= deadline:
+                self._fetch_dead()
+                if self.pending_start < len(self.pending):
+                    if self.pending_start > len(self.pending) // 2:
+                        del self.pending[:self.pending_start]
+                        self.pending_start = 0
+                    self.stat_deferred += 1
+                    self.fire()
+                    return
+        del self.pending[:]
+        self.pending_start = 0
+
+    def _fetch_dead(self):
+        # move all the objects from the GC's queue to 'pending'
         while True:
             w_obj = self.space.finalizer_queue.next_dead()
             if w_obj is None:
                 break
-            self._call_finalizer(w_obj)
+            self.pending.append(w_obj)
+        backlog = self.get_backlog()
+        if backlog > self.stat_max_backlog:
+            self.stat_max_backlog = backlog
+
+    def get_backlog(self):
+        """Number of objects fetched from the finalizer_queue whose
+        finalizers did not run yet."""
+        return len(self.pending) - self.pending_start
 
     def gc_disabled(self, w_obj):
         # If we're running in 'gc.disable()' mode, record w_obj in the
@@ -53,6 +53,9 @@ def cpython_code_signature(code):
 class CodeHookCache(object):
     def __init__(self, space):
         self._code_hook = None
+        # an interp-level object with a new_code() method, see e.g.
+        # pypy/module/pypyjit/warmup.py
+        self._interp_code_hook = None
 
 class PyCode(eval.Code):
     "CPython-style code objects."
@@ -106,7 +109,10 @@ class PyCode(eval.Code):
         return True
 
     def new_code_hook(self):
-        code_hook = self.space.fromcache(CodeHookCache)._code_hook
+        cache = self.space.fromcache(CodeHookCache)
+        if cache._interp_code_hook is not None:
+            cache._interp_code_hook.new_code(self)
+        code_hook = cache._code_hook
         if code_hook is not None:
             try:
                 self.space.call_function(code_hook, self)
@@ -446,6 +446,8 @@ class W_CData(W_Root):
         else:
             with self as ptr:
                 w_res = W_CDataGCP(space, ptr, self.ctype, self, w_destructor)
+            if size > 0:
+                w_res.external_memory = size
         if size != 0:
             rgc.add_memory_pressure(size)
         return w_res
@@ -513,6 +515,9 @@ class W_CDataNewOwning(W_CData):
     def _repr_extra(self):
         return self._repr_extra_owning()
 
+    def get_external_memory(self):
+        return self._sizeof()
+
     def _sizeof(self):
         ctype = self.ctype
         if self.allocated_length >= 0:
@@ -634,15 +639,21 @@ class W_CDataFromBuffer(W_CData):
 
 class W_CDataGCP(W_CData):
     """For ffi.gc()."""
-    _attrs_ = ['w_original_cdata', 'w_destructor']
+    _attrs_ = ['w_original_cdata', 'w_destructor', 'external_memory']
     _immutable_fields_ = ['w_original_cdata']
 
     def __init__(self, space, cdata, ctype, w_original_cdata, w_destructor):
         W_CData.__init__(self, space, cdata, ctype)
         self.w_original_cdata = w_original_cdata
         self.w_destructor = w_destructor
+        self.external_memory = 0     # the 'size' given to ffi.gc()
         self.register_finalizer(space)
 
+    def get_external_memory(self):
+        if self.w_destructor is None:
+            return 0      # already called, or detached
+        return self.external_memory
+
     def _finalize_(self):
         w_destructor = self.w_destructor
         if w_destructor is not None:
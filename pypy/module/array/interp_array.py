@@ -158,6 +158,9 @@ class W_ArrayBase(W_Root):
         if self._buffer:
             lltype.free(self._buffer, flavor='raw')
 
+    def get_external_memory(self):
+        return self.allocated * self.itemsize
+
     def setlen(self, size, zero=False, overallocate=True):
         if size > 0:
             if size > self.allocated or size < self.allocated / 2:
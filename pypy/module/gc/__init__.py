@@ -10,9 +10,28 @@ class Module(MixedModule):
         'enable_finalizers': 'interp_gc.enable_finalizers',
         'disable_finalizers': 'interp_gc.disable_finalizers',
         'garbage': 'space.newlist([])',
+        'get_stats': 'interp_gc.get_stats',
+        'get_param': 'interp_gc.get_param',
+        'set_param': 'interp_gc.set_param',
+        'start_alloc_profile': 'allocprof.start_alloc_profile',
+        'stop_alloc_profile': 'allocprof.stop_alloc_profile',
+        'get_alloc_profile': 'allocprof.get_alloc_profile',
+        'set_finalizer_budget': 'finalizerthread.set_finalizer_budget',
+        'get_finalizer_budget': 'finalizerthread.get_finalizer_budget',
+        'stop_finalizer_thread': 'finalizerthread.stop_finalizer_thread',
+        '_finalizer_thread_start': 'finalizerthread._finalizer_thread_start',
+        '_finalizer_thread_wait': 'finalizerthread._finalizer_thread_wait',
+        '_finalizer_thread_run': 'finalizerthread._finalizer_thread_run',
+        'get_finalizer_stats': 'finalizerthread.get_finalizer_stats',
+        'FinalizerStats': 'finalizerthread.W_FinalizerStats',
+        'GcStats': 'interp_gc.W_GcStats',
+        'hooks': 'space.fromcache(hook.W_AppLevelHooks)',
+        'GcCollectStepStats': 'hook.W_GcCollectStepStats',
         #'dump_heap_stats': 'interp_gc.dump_heap_stats',
     }
-    appleveldefs = {}
+    appleveldefs = {
+        'start_finalizer_thread': 'app_finalizer.start_finalizer_thread',
+    }
 
     def __init__(self, space, w_name):
         if (not space.config.translating or
@@ -26,6 +45,7 @@ class Module(MixedModule):
                 'get_rpy_memory_usage': 'referents.get_rpy_memory_usage',
                 'get_rpy_type_index': 'referents.get_rpy_type_index',
                 'get_objects': 'referents.get_objects',
+                'get_external_memory': 'referents.get_external_memory',
                 'get_referents': 'referents.get_referents',
                 'get_referrers': 'referents.get_referrers',
                 '_dump_rpy_heap': 'referents._dump_rpy_heap',
@@ -34,3 +54,6 @@ class Module(MixedModule):
                 'GcRef': 'referents.W_GcRef',
                 })
         MixedModule.__init__(self, space, w_name)
+        from pypy.module.posix.interp_posix import add_fork_hook
+        from pypy.module.gc.finalizerthread import reinit_after_fork
+        add_fork_hook('child', reinit_after_fork)
@@ -0,0 +1,260 @@
+"""
+Sampling allocation profiler, built on the allocation sampling of the GC
+(see rgc.PARAM_ALLOC_SAMPLE_INTERVAL and GcHooks.on_gc_alloc_sample).
+
+The GC calls us from inside the malloc, where we cannot allocate GC
+objects.  The samples are thus first written in a raw buffer: the weight
+in bytes, the type index and the app-level stack of the allocation, in
+the format of rpython.rlib.rvmprof.traceback.  They are added to the
+per-type, per-site counters later, by an AsyncAction when the buffer gets
+full, or when the profile is read.
+"""
+
+from rpython.rlib import rgc, rvmprof
+from rpython.rlib.nonconst import NonConstant
+from rpython.rlib.objectmodel import we_are_translated, specialize
+from rpython.rlib.rstring import StringBuilder
+from rpython.rlib.rvmprof import cintf
+from rpython.rlib.rvmprof.rvmprof import VMPROF_CODE_TAG, VMPROF_JITTED_TAG
+from rpython.rtyper.lltypesystem import lltype, llmemory, rffi
+from pypy.interpreter.error import oefmt
+from pypy.interpreter.executioncontext import AsyncAction
+from pypy.interpreter.gateway import unwrap_spec
+from pypy.interpreter.pycode import PyCode
+
+MAX_DEPTH = 64          # frames recorded per sample
+TB_LENGTH = 2 * MAX_DEPTH + 2
+# one sample: weight, size, type index, traceback length, traceback
+SAMPLE_WORDS = 4 + TB_LENGTH
+DEFAULT_INTERVAL = 512 * 1024
+BUFFER_SAMPLES = 4096
+
+
+@specialize.memo()
+def _have_vmprof():
+    try:
+        rvmprof._get_vmprof()
+    except rvmprof.VMProfPlatformUnsupported:
+        return False
+    return True
+
+def _get_traceback(array_p, length):
+    # the vmprof stack is only maintained in the translated PyPy, and
+    # only on the platforms supported by vmprof
+    if not we_are_translated() or not _have_vmprof():
+        return 0
+    stack = cintf.get_rvmprof_stack()
+    return rvmprof._get_vmprof().cintf.vmprof_get_traceback(
+        stack, llmemory.NULL, array_p, length)
+
+
+class AllocSite(object):
+    """The allocations of one type at one app-level stack."""
+
+    def __init__(self, type_index, code_ids):
+        self.type_index = type_index
+        self.code_ids = code_ids
+        self.samples = 0
+        self.total_bytes = 0
+
+
+class AllocProfiler(object):
+    """Singleton, created by space.fromcache.  The GC calls record()
+    and record_type() through the LowLevelGcHooks."""
+
+    def __init__(self, space):
+        self.space = space
+        self.enabled = False
+        self.buffer = lltype.nullptr(rffi.SIGNEDP.TO)
+        self.count = 0              # number of samples in the buffer
+        self.type_pending = False   # waiting for the type of the last one
+        self.sites = {}
+        self.action = AllocProfileAction(space, self)
+
+    def start(self, interval):
+        if not self.buffer:
+            # kept until the end of the process
+            self.buffer = lltype.malloc(rffi.SIGNEDP.TO,
+                                        BUFFER_SAMPLES * SAMPLE_WORDS,
+                                        flavor='raw', track_allocation=False)
+        self.reset()
+        self.fix_annotation()
+        self.enabled = True
+        return rgc.set_gc_param(rgc.PARAM_ALLOC_SAMPLE_INTERVAL,
+                                float(interval))
+
+    def stop(self):
+        rgc.set_gc_param(rgc.PARAM_ALLOC_SAMPLE_INTERVAL, 0.0)
+        self.enabled = False
+        self.flush()
+
+    def reset(self):
+        self.count = 0
+        self.type_pending = False
+        self.sites = {}
+
+    def fix_annotation(self):
+        # the annotation of the class and its attributes must be completed
+        # BEFORE we do the gc transform; this makes sure that everything is
+        # annotated with the correct types
+        if NonConstant(False):
+            self.count = NonConstant(-42)
+            self.type_pending = NonConstant(False)
+            self.record(NonConstant(-42), NonConstant(-42))
+            self.record_type(NonConstant(-42))
+
+    def _sample(self, index):
+        return rffi.ptradd(self.buffer, index * SAMPLE_WORDS)
+
+    def record(self, size, weight):
+        # called by the GC: must not allocate GC objects
+        self.type_pending = False
+        if self.count >= BUFFER_SAMPLES:
+            return      # the action didn't run yet: drop this sample
+        p = self._sample(self.count)
+        p[0] = weight
+        p[1] = size
+        p[2] = -1
+        p[3] = _get_traceback(rffi.ptradd(p, 4), TB_LENGTH)
+        self.count += 1
+        self.type_pending = True
+        if self.count >= BUFFER_SAMPLES // 2:
+            self.action.fire()
+
+    def record_type(self, type_index):
+        # called by the GC: must not allocate GC objects
+        if self.type_pending:
+            self._sample(self.count - 1)[2] = type_index
+            self.type_pending = False
+
+    def flush(self):
+        """Move the samples from the buffer to the AllocSites.  Samples
+        can be recorded while we run; the last one is kept in the buffer
+        if its type is still unknown."""
+        i = 0
+        while True:
+            n = self.count
+            if self.type_pending:
+                n -= 1
+            if i >= n:
+                break
+            self._add_sample(self._sample(i))
+            i += 1
+        # no GC allocation from here: no sample can be recorded
+        j = 0
+        while i < self.count:
+            src = self._sample(i)
+            dst = self._sample(j)
+            k = 0
+            while k < SAMPLE_WORDS:
+                dst[k] = src[k]
+                k += 1
+            i += 1
+            j += 1
+        self.count = j
+
+    def _add_sample(self, p):
+        type_index = p[2]
+        length = p[3]
+        code_ids = []
+        builder = StringBuilder()
+        builder.append(str(type_index))
+        i = 0
+        while i < length - 1:
+            tag = p[4 + i]
+            if tag == VMPROF_CODE_TAG or tag == VMPROF_JITTED_TAG:
+                code_id = p[4 + i + 1]
+                code_ids.append(code_id)
+                builder.append(',')
+                builder.append(str(code_id))
+            i += 2
+        key = builder.build()
+        site = self.sites.get(key, None)
+        if site is None:
+            site = AllocSite(type_index, code_ids)
+            self.sites[key] = site
+        site.samples += 1
+        site.total_bytes += p[0]
+
+    def get_profile(self):
+        """Return a list of tuples (type_index, samples, total_bytes,
+        stack), with 'stack' a list of code objects, innermost first."""
+        space = self.space
+        self.flush()
+        codes = _find_code_objects(self.sites)
+        result_w = []
+        for site in self.sites.values():
+            stack_w = []
+            for code_id in site.code_ids:
+                code = codes.get(code_id, None)
+                if code is None:
+                    stack_w.append(space.w_None)
+                else:
+                    stack_w.append(code)
+            result_w.append(space.newtuple([
+                space.newint(site.type_index),
+                space.newint(site.samples),
+                space.newint(site.total_bytes),
+                space.newlist(stack_w)]))
+        return space.newlist(result_w)
+
+
+@specialize.memo()
+def _get_code_weak_list():
+    # None if the _vmprof module is not there to register the code objects
+    return getattr(PyCode, '_vmprof_weak_list', None)
+
+def _find_code_objects(sites):
+    codes = {}
+    weak_list = _get_code_weak_list()
+    if weak_list is None:
+        return codes
+    for site in sites.values():
+        for code_id in site.code_ids:
+            codes[code_id] = None
+    all_code_wrefs = weak_list.get_all_handles()
+    for wref in all_code_wrefs:
+        code = wref()
+        if code is not None and code._vmprof_unique_id in codes:
+            codes[code._vmprof_unique_id] = code
+    return codes
+
+
+class AllocProfileAction(AsyncAction):
+    """Fired by the GC when the buffer of samples is half full."""
+
+    def __init__(self, space, profiler):
+        AsyncAction.__init__(self, space)
+        self.profiler = profiler
+
+    def perform(self, ec, frame):
+        self.profiler.flush()
+
+# ____________________________________________________________
+
+@unwrap_spec(interval=int)
+def start_alloc_profile(space, interval=DEFAULT_INTERVAL):
+    """Start the allocation profiler, forgetting the previous profile.
+    One object is sampled every 'interval' bytes allocated in the
+    nursery, and stands for these 'interval' bytes."""
+    if interval <= 0:
+        raise oefmt(space.w_ValueError, "interval must be positive")
+    profiler = space.fromcache(AllocProfiler)
+    if not profiler.start(interval):
+        profiler.enabled = False
+        raise oefmt(space.w_RuntimeError,
+                    "allocation sampling not supported by this GC")
+
+def stop_alloc_profile(space):
+    """Stop the allocation profiler.  The profile can still be read
+    with get_alloc_profile()."""
+    space.fromcache(AllocProfiler).stop()
+
+def get_alloc_profile(space):
+    """Return the allocation profile, as a list of tuples
+    (type_index, samples, total_bytes, stack).  'type_index' is as
+    returned by get_rpy_type_index(), or -1 if unknown.  'stack' is the
+    list of code objects of the allocation site, innermost first; it
+    contains None for code objects that died in the meantime.  The
+    stacks are only available if vmprof is supported."""
+    return space.fromcache(AllocProfiler).get_profile()
@@ -0,0 +1,17 @@
+# NOT_RPYTHON
+
+import gc
+
+def start_finalizer_thread():
+    """Start a thread that runs the finalizers of the objects found
+    by the GC (the __del__ methods and the closing of the files,
+    sockets, etc.), instead of running them in the thread that happens
+    to trigger the collection.  Does nothing if it is already running.
+    Stop it with stop_finalizer_thread()."""
+    if gc._finalizer_thread_start():
+        import thread
+        thread.start_new_thread(_finalizer_thread_loop, ())
+
+def _finalizer_thread_loop():
+    while gc._finalizer_thread_wait():
+        gc._finalizer_thread_run()
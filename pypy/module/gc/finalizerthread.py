@@ -0,0 +1,160 @@
+"""
+Batched dispatch of the finalizers, see gc.set_finalizer_budget(), and
+an optional dedicated thread to run them, see gc.start_finalizer_thread().
+
+The finalizers of the objects in space.finalizer_queue can run
+arbitrary app-level code, so they need the GIL.  The finalizer thread
+only moves them out of the thread that happened to trigger the
+collection: that thread just wakes up the finalizer thread and goes on,
+and the two threads alternate as usual at the next GIL release.  The
+finalizers that don't need the GIL at all are the "light" finalizers of
+rgc, which the GC already calls directly.
+"""
+
+from rpython.rlib import rthread
+from pypy.interpreter.error import oefmt
+from pypy.interpreter.baseobjspace import W_Root
+from pypy.interpreter.gateway import unwrap_spec
+from pypy.interpreter.typedef import TypeDef, interp_attrproperty
+
+
+class FinalizerThread(object):
+    """Singleton, created by space.fromcache.  Installed as
+    space.user_del_action.finalizer_thread while the thread runs."""
+
+    def __init__(self, space):
+        self.space = space
+        self.lock = None
+        self.running = False      # False if stopped, or stopping
+        self.alive = False        # True until the thread really exits
+        self.waiting = False      # True if blocked on 'lock'
+
+    def _reset(self):
+        # the lock is always held, except to wake up the thread
+        self.lock = rthread.allocate_lock()
+        self.lock.acquire(True)
+        self.waiting = False
+
+    def wake_up(self):
+        if self.waiting:
+            self.waiting = False
+            self.lock.release()
+
+    def start(self):
+        """Return True if the caller must start a new thread."""
+        if self.running:
+            return False
+        self.running = True
+        self.space.user_del_action.finalizer_thread = self
+        if self.alive:
+            return False      # stopped but did not exit yet: keep it
+        if self.lock is None:
+            self._reset()
+        self.alive = True
+        return True
+
+    def stop(self):
+        uda = self.space.user_del_action
+        if uda.finalizer_thread is self:
+            uda.finalizer_thread = None
+        self.running = False
+        self.wake_up()
+        # the remaining finalizers run again in the threads that
+        # trigger the action
+        uda.fire()
+
+    def wait(self):
+        """Called by the finalizer thread.  Block until there are
+        finalizers to run and return True, or return False if the
+        thread must exit."""
+        uda = self.space.user_del_action
+        while self.running:
+            uda._fetch_dead()
+            if uda.get_backlog() > 0:
+                return True
+            self.waiting = True
+            self.lock.acquire(True)       # releases the GIL
+        self.alive = False
+        return False
+
+    def reinit_after_fork(self):
+        # the thread did not survive in the child process
+        if self.alive:
+            self.stop()
+            self.alive = False
+            self._reset()
+
+def reinit_after_fork(space):
+    space.fromcache(FinalizerThread).reinit_after_fork()
+
+# ____________________________________________________________
+
+@unwrap_spec(seconds=float)
+def set_finalizer_budget(space, seconds):
+    """Limit the time spent running the finalizers at once, in seconds.
+    If there are more finalizers to run after that time, they run a bit
+    later, instead of all at once after the collection that found the
+    objects.  0.0 means no limit, which is the default.  gc.collect()
+    always runs all the pending finalizers."""
+    if not seconds >= 0.0:
+        raise oefmt(space.w_ValueError, "the budget must be positive or 0")
+    space.user_del_action.time_budget = seconds
+
+def get_finalizer_budget(space):
+    """Return the value given to set_finalizer_budget()."""
+    return space.newfloat(space.user_del_action.time_budget)
+
+def _finalizer_thread_start(space):
+    if not space.config.objspace.usemodules.thread:
+        raise oefmt(space.w_RuntimeError,
+                    "the finalizer thread needs the 'thread' module")
+    return space.newbool(space.fromcache(FinalizerThread).start())
+
+def _finalizer_thread_wait(space):
+    return space.newbool(space.fromcache(FinalizerThread).wait())
+
+def _finalizer_thread_run(space):
+    space.user_del_action._run_finalizers()
+
+def stop_finalizer_thread(space):
+    """Stop the thread started by start_finalizer_thread(), if any.
+    The finalizers run again in the threads that trigger them."""
+    space.fromcache(FinalizerThread).stop()
+
+# ____________________________________________________________
+
+class W_FinalizerStats(W_Root):
+    """A snapshot of the state of the finalizers."""
+
+    def __init__(self, space):
+        uda = space.user_del_action
+        uda._fetch_dead()
+        self.pending = uda.get_backlog()
+        self.max_pending = uda.stat_max_backlog
+        self.finalized = uda.stat_finalized
+        self.deferred = uda.stat_deferred
+        self.thread = uda.finalizer_thread is not None
+
+W_FinalizerStats.typedef = TypeDef(
+    "FinalizerStats",
+    pending = interp_attrproperty("pending", cls=W_FinalizerStats,
+                                  wrapfn="newint"),
+    max_pending = interp_attrproperty("max_pending", cls=W_FinalizerStats,
+                                      wrapfn="newint"),
+    finalized = interp_attrproperty("finalized", cls=W_FinalizerStats,
+                                    wrapfn="newint"),
+    deferred = interp_attrproperty("deferred", cls=W_FinalizerStats,
+                                   wrapfn="newint"),
+    thread = interp_attrproperty("thread", cls=W_FinalizerStats,
+                                 wrapfn="newbool"),
+    )
+W_FinalizerStats.typedef.acceptable_as_base_class = False
+
+def get_finalizer_stats(space):
+    """Return a snapshot of the state of the finalizers: the number of
+    objects waiting for their finalizer ('pending') and its maximum so
+    far ('max_pending'), the number of finalizers that ran
+    ('finalized'), the number of times that some of them were postponed
+    because of the budget ('deferred'), and whether the finalizer thread
+    is running ('thread')."""
+    return W_FinalizerStats(space)
@@ -1,5 +1,7 @@
 from pypy.interpreter.gateway import unwrap_spec
 from pypy.interpreter.error import oefmt
+from pypy.interpreter.baseobjspace import W_Root
+from pypy.interpreter.typedef import TypeDef, interp_attrproperty
 from rpython.rlib import rgc
 
 
@@ -89,3 +91,89 @@ def dump_heap_stats(space, filename):
         f.write("%d %d " % (tb[i].count, tb[i].size))
         f.write(",".join([str(tb[i].links[j]) for j in range(len(tb))]) + "\n")
     f.close()
+
+# ____________________________________________________________
+
+# name -> (rgc.PARAM_xxx, is_a_size); the same knobs as the PYPY_GC_xxx
+# environment variables, see pypy/doc/gc_info.rst
+GC_PARAMS = {
+    'nursery_size':   (rgc.PARAM_NURSERY_SIZE, True),
+    'major_collect':  (rgc.PARAM_MAJOR_COLLECT, False),
+    'growth':         (rgc.PARAM_GROWTH, False),
+    'min_heap_size':  (rgc.PARAM_MIN_HEAP_SIZE, True),
+    'max_heap_size':  (rgc.PARAM_MAX_HEAP_SIZE, True),
+    'max_delta':      (rgc.PARAM_MAX_DELTA, True),
+    'increment_step': (rgc.PARAM_INCREMENT_STEP, True),
+}
+
+def _get_param_no(space, name):
+    for key, (param_no, is_size) in GC_PARAMS.items():
+        if key == name:
+            return param_no, is_size
+    raise oefmt(space.w_ValueError, "unknown GC parameter '%s'", name)
+
+@unwrap_spec(name='text')
+def get_param(space, name):
+    """Return the current value of one of the tuning parameters of the GC:
+    'nursery_size', 'major_collect', 'growth', 'min_heap_size',
+    'max_heap_size', 'max_delta' or 'increment_step'."""
+    param_no, is_size = _get_param_no(space, name)
+    value = rgc.get_gc_param(param_no)
+    if value < 0.0:
+        raise oefmt(space.w_ValueError,
+                    "GC parameter '%s' not supported by this GC", name)
+    if is_size:
+        return space.newint(int(value))
+    return space.newfloat(value)
+
+@unwrap_spec(name='text', value=float)
+def set_param(space, name, value):
+    """Change one of the tuning parameters of the GC while the program
+    runs, with the same meaning as the PYPY_GC_xxx environment variables;
+    see get_param() for the names.  Raises ValueError if the value is out
+    of bounds."""
+    param_no, is_size = _get_param_no(space, name)
+    if rgc.get_gc_param(param_no) < 0.0:
+        raise oefmt(space.w_ValueError,
+                    "GC parameter '%s' not supported by this GC", name)
+    if not rgc.set_gc_param(param_no, value):
+        raise oefmt(space.w_ValueError,
+                    "value out of bounds for GC parameter '%s'", name)
+
+# ____________________________________________________________
+
+class W_GcStats(W_Root):
+    """A snapshot of the GC statistics, see rgc.get_stats().  All the
+    values are 0 if the GC does not support them (e.g. untranslated)."""
+
+    def __init__(self):
+        self.total_memory = rgc.get_stats(rgc.TOTAL_MEMORY)
+        self.total_arena_memory = rgc.get_stats(rgc.TOTAL_ARENA_MEMORY)
+        self.total_rawmalloced = rgc.get_stats(rgc.TOTAL_RAWMALLOCED)
+        self.arenas_count = rgc.get_stats(rgc.ARENAS_COUNT)
+        self.arena_size = rgc.get_stats(rgc.ARENA_SIZE)
+        self.nursery_size = rgc.get_stats(rgc.NURSERY_SIZE)
+        self.nursery_used = rgc.get_stats(rgc.NURSERY_USED)
+        self.minor_collections = rgc.get_stats(rgc.MINOR_COLLECTIONS)
+        self.major_collections = rgc.get_stats(rgc.MAJOR_COLLECTIONS)
+        self.total_gc_time = rgc.get_stats(rgc.TOTAL_GC_TIME)
+        self.gc_state = rgc.get_stats(rgc.GC_STATE)
+
+GC_STATS_FIELDS = ['total_memory', 'total_arena_memory', 'total_rawmalloced',
+                   'arenas_count', 'arena_size', 'nursery_size',
+                   'nursery_used', 'minor_collections', 'major_collections',
+                   'total_gc_time', 'gc_state']
+
+W_GcStats.typedef = TypeDef(
+    "GcStats",
+    **dict([(name, interp_attrproperty(name, cls=W_GcStats, wrapfn="newint"))
+            for name in GC_STATS_FIELDS])
+    )
+W_GcStats.typedef.acceptable_as_base_class = False
+
+def get_stats(space):
+    """Return a snapshot of the GC statistics: memory used by the arenas,
+    by the raw-malloced objects and by the nursery, number of minor and
+    major collections, total time spent in the GC (in read_timestamp()
+    ticks) and the current state of the incremental major collection."""
+    return W_GcStats()
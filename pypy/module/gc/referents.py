@@ -117,6 +117,28 @@ def get_objects(space):
     result_w = rgc.do_get_objects(try_cast_gcref_to_w_root)
     return space.newlist(result_w)
 
+def get_external_memory(space):
+    """Return a dict {type name: (count, total_bytes)} of the raw memory
+    outside the GC heap kept alive by the app-level objects, like the
+    buffers of ffi.new(), array.array or mmap.mmap.  This walks the
+    whole heap, like get_objects()."""
+    if not rgc.has_gcflag_extra():
+        raise missing_operation(space)
+    counts = {}
+    sizes = {}
+    for w_obj in rgc.do_get_objects(try_cast_gcref_to_w_root):
+        size = w_obj.get_external_memory()
+        if size > 0:
+            name = w_obj.typedef.name
+            counts[name] = counts.get(name, 0) + 1
+            sizes[name] = sizes.get(name, 0) + size
+    w_result = space.newdict()
+    for name, size in sizes.items():
+        space.setitem(w_result, space.newtext(name),
+                      space.newtuple([space.newint(counts[name]),
+                                      space.newint(size)]))
+    return w_result
+
 def get_referents(space, args_w):
     """Return a list of objects directly referred to by any of the arguments.
     """
@@ -152,10 +174,10 @@ def get_referrers(space, args_w):
     rgc.assert_no_more_gcflags()
     return space.newlist(result_w)
 
-@unwrap_spec(fd=int)
-def _dump_rpy_heap(space, fd):
+@unwrap_spec(fd=int, compact=bool)
+def _dump_rpy_heap(space, fd, compact=False):
     try:
-        ok = rgc.dump_rpy_heap(fd)
+        ok = rgc.dump_rpy_heap(fd, compact)
     except OSError as e:
         raise wrap_oserror(space, e)
     if not ok:
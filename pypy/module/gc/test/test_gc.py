@@ -84,6 +84,106 @@ class AppTestGC(object):
         gc.enable()
 
 
+class AppTestGcParams(object):
+
+    def setup_class(cls):
+        from rpython.rlib import rgc
+        params = {rgc.PARAM_NURSERY_SIZE: 4194304.0,
+                  rgc.PARAM_MAJOR_COLLECT: 1.82}
+
+        def fake_get_gc_param(param_no):
+            return params.get(param_no, -1.0)
+
+        def fake_set_gc_param(param_no, value):
+            if param_no not in params or value <= 0.0:
+                return False
+            params[param_no] = value
+            return True
+
+        cls._saved = rgc.get_gc_param, rgc.set_gc_param
+        rgc.get_gc_param = fake_get_gc_param
+        rgc.set_gc_param = fake_set_gc_param
+
+    def teardown_class(cls):
+        from rpython.rlib import rgc
+        rgc.get_gc_param, rgc.set_gc_param = cls._saved
+
+    def test_get_set_param(self):
+        import gc
+        assert gc.get_param('nursery_size') == 4194304
+        assert type(gc.get_param('nursery_size')) is int
+        assert gc.get_param('major_collect') == 1.82
+        gc.set_param('nursery_size', 1048576)
+        assert gc.get_param('nursery_size') == 1048576
+        gc.set_param('major_collect', 1.5)
+        assert gc.get_param('major_collect') == 1.5
+
+    def test_errors(self):
+        import gc
+        raises(ValueError, gc.get_param, 'foobar')
+        raises(ValueError, gc.set_param, 'foobar', 42)
+        raises(ValueError, gc.set_param, 'nursery_size', -1)
+        raises(ValueError, gc.get_param, 'growth')     # not supported
+        raises(ValueError, gc.set_param, 'growth', 2.0)
+        raises(TypeError, gc.set_param, 'growth', 'x')
+
+
+class AppTestGcFinalizers(object):
+    spaceconfig = dict(usemodules=('thread', 'time'))
+
+    def test_finalizer_budget(self):
+        import gc
+        deleted = []
+        class X(object):
+            def __del__(self):
+                deleted.append(1)
+        assert gc.get_finalizer_budget() == 0.0
+        gc.set_finalizer_budget(1e-9)
+        try:
+            assert gc.get_finalizer_budget() == 1e-9
+            stats0 = gc.get_finalizer_stats()
+            assert not stats0.thread
+            lst = [X() for i in range(10)]
+            del lst
+            i = 0
+            while not deleted:
+                i += 1
+            gc.collect()
+            assert len(deleted) == 10
+            stats = gc.get_finalizer_stats()
+            assert stats.pending == 0
+            assert stats.finalized >= stats0.finalized + 10
+            assert stats.max_pending >= 9
+            assert stats.deferred > stats0.deferred
+        finally:
+            gc.set_finalizer_budget(0.0)
+        raises(ValueError, gc.set_finalizer_budget, -1.0)
+
+    def test_finalizer_thread(self):
+        import gc, thread, time
+        deleted = []
+        class X(object):
+            def __del__(self):
+                deleted.append(thread.get_ident())
+        gc.start_finalizer_thread()
+        try:
+            gc.start_finalizer_thread()     # no-op
+            assert gc.get_finalizer_stats().thread
+            X(); X(); X()
+            for i in range(200):
+                if len(deleted) == 3:
+                    break
+                time.sleep(0.05)
+            assert len(deleted) == 3
+            assert thread.get_ident() not in deleted
+        finally:
+            gc.stop_finalizer_thread()
+        assert not gc.get_finalizer_stats().thread
+        X()
+        gc.collect()
+        assert deleted[-1] == thread.get_ident()
+
+
 class AppTestGcDumpHeap(object):
     pytestmark = py.test.mark.xfail(run=False)
 
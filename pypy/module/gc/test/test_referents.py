@@ -150,3 +150,84 @@ class AppTestReferentsMore(object):
         assert a in lst
         lst = gc.get_referrers(A)
         assert a in lst
+
+
+class AppTestExternalMemory(object):
+    spaceconfig = dict(usemodules=('array', 'mmap', '_cffi_backend'))
+
+    def setup_class(cls):
+        from rpython.rlib import rgc
+        from rpython.tool.udir import udir
+        cls._backup = [rgc.get_rpy_roots]
+        space = cls.space
+        filename = udir.join('test_external_memory')
+        filename.write('x' * 1000)
+        w_arrays = space.appexec([], """():
+            import array
+            return [array.array('d', [1.5] * 100),
+                    array.array('b', b'x' * 1000)]
+        """)
+        w_mmaps = space.appexec([space.wrap(str(filename))], """(filename):
+            import mmap
+            f = open(filename, 'r+b')
+            try:
+                return [mmap.mmap(-1, 4096),
+                        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY),
+                        mmap.mmap(f.fileno(), 0),
+                        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)]
+            finally:
+                f.close()
+        """)
+        w_cdatas = space.appexec([], """():
+            import _cffi_backend
+            BChar = _cffi_backend.new_primitive_type('char')
+            BCharP = _cffi_backend.new_pointer_type(BChar)
+            BArray = _cffi_backend.new_array_type(BCharP, None)
+            p = _cffi_backend.newp(BArray, 500)
+            q = _cffi_backend.gcp(_cffi_backend.cast(BCharP, 0),
+                                  lambda q: None, 300)
+            return [p, q, _cffi_backend.cast(BCharP, 0)]
+        """)
+        cls.ALL_ROOTS = [w_arrays, w_mmaps, w_cdatas,
+                         space.newlist([space.wrap(5)])]
+        cls.w_ALL_ROOTS = cls.space.newlist(cls.ALL_ROOTS)
+        rgc.get_rpy_roots = lambda: map(rgc._GcRef, cls.ALL_ROOTS)
+        cls.w_runappdirect = cls.space.wrap(option.runappdirect)
+
+    def teardown_class(cls):
+        from rpython.rlib import rgc
+        rgc.get_rpy_roots = cls._backup[0]
+
+    def test_get_external_memory(self):
+        import gc
+        d = gc.get_external_memory()
+        count, size = d['array.array']
+        if self.runappdirect:
+            assert count >= 2
+        else:
+            assert sorted(d.keys()) == ['_cffi_backend.CData', 'array.array',
+                                        'mmap.mmap']
+            assert count == 2
+        assert size >= 100 * 8 + 1000
+
+    def test_get_external_memory_mmap(self):
+        import gc
+        # the anonymous and the ACCESS_COPY mappings, but not the shared
+        # or read-only file mappings, which are in the OS page cache
+        count, size = gc.get_external_memory()['mmap.mmap']
+        if self.runappdirect:
+            assert count >= 2
+            assert size >= 4096 + 1000
+        else:
+            assert (count, size) == (2, 4096 + 1000)
+
+    def test_get_external_memory_cffi(self):
+        import gc
+        # the ffi.new() and the ffi.gc(..., size) cdatas, but not a
+        # plain pointer
+        count, size = gc.get_external_memory()['_cffi_backend.CData']
+        if self.runappdirect:
+            assert count >= 2
+            assert size >= 500 + 300
+        else:
+            assert (count, size) == (2, 500 + 300)
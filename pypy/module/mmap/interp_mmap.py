@@ -2,7 +2,7 @@ from pypy.interpreter.error import OperationError, oefmt, wrap_oserror
 from pypy.interpreter.baseobjspace import W_Root
 from pypy.interpreter.typedef import TypeDef
 from pypy.interpreter.gateway import interp2app, unwrap_spec
-from rpython.rlib import rmmap, rarithmetic, objectmodel
+from rpython.rlib import rmmap, rarithmetic, objectmodel, rgc
 from rpython.rlib.buffer import RawBuffer
 from rpython.rlib.rmmap import RValueError, RTypeError, RMMapError
 from rpython.rlib.rstring import StringBuilder
@@ -17,6 +17,15 @@ class W_MMap(W_Root):
     def __init__(self, space, mmap_obj):
         self.space = space
         self.mmap = mmap_obj
+        # only anonymous or private writable mappings use memory of their
+        # own; the pages of a file mapping are in the OS page cache
+        if mmap_obj.private_memory:
+            rgc.add_memory_pressure(mmap_obj.size)
+
+    def get_external_memory(self):
+        if not self.mmap.private_memory:
+            return 0
+        return self.mmap.size
 
     def readbuf_w(self, space):
         self.check_valid()
@@ -133,6 +142,7 @@ class W_MMap(W_Root):
     def resize(self, newsize):
         self.check_valid()
         self.check_resizeable()
+        oldsize = self.mmap.size
         try:
             self.mmap.resize(newsize)
         except OSError as e:
@@ -142,6 +152,8 @@ class W_MMap(W_Root):
             # SystemError.
             raise OperationError(self.space.w_SystemError,
                                  self.space.newtext(e.message))
+        if newsize > oldsize and self.mmap.private_memory:
+            rgc.add_memory_pressure(newsize - oldsize)
 
     def __len__(self):
         return self.space.newint(self.mmap.size)
@@ -2,6 +2,9 @@ from pypy.interpreter.mixedmodule import MixedModule
 
 class Module(MixedModule):
     appleveldefs = {
+        'record_warmup_profile': 'app_warmup.record_warmup_profile',
+        'write_warmup_profile': 'app_warmup.write_warmup_profile',
+        'load_warmup_profile': 'app_warmup.load_warmup_profile',
     }
 
     interpleveldefs = {
@@ -17,6 +20,11 @@ class Module(MixedModule):
         'set_trace_too_long_hook': 'interp_resop.set_trace_too_long_hook',
         'get_stats_snapshot': 'interp_resop.get_stats_snapshot',
         'get_stats_asmmemmgr': 'interp_resop.get_stats_asmmemmgr',
+        'get_stats_memmgr': 'interp_resop.get_stats_memmgr',
+        'get_warmup_stats': 'warmup.get_warmup_stats',
+        '_start_warmup_recording': 'warmup._start_warmup_recording',
+        '_get_warmup_profile': 'warmup._get_warmup_profile',
+        '_load_warmup_profile': 'warmup._load_warmup_profile',
         # those things are disabled because they have bugs, but if
         # they're found to be useful, fix test_ztranslation_jit_stats
         # in the backend first. get_stats_snapshot still produces
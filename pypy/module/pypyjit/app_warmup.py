@@ -0,0 +1,32 @@
+# NOT_RPYTHON
+
+import pypyjit
+
+def record_warmup_profile(filename):
+    """Record the places where the JIT compiles loops, and write them to
+    'filename' when the process exits.  Use write_warmup_profile() to
+    write the profile at other times, e.g. from a signal handler."""
+    import atexit
+    pypyjit._start_warmup_recording()
+    atexit.register(write_warmup_profile, filename)
+
+def write_warmup_profile(filename):
+    """Write the warmup profile recorded so far to 'filename'.  The file
+    is replaced atomically, so several processes can share it."""
+    import os
+    lines = pypyjit._get_warmup_profile()
+    tmpname = '%s.%d.tmp' % (filename, os.getpid())
+    with open(tmpname, 'w') as f:
+        for line in lines:
+            f.write(line + '\n')
+    os.rename(tmpname, filename)
+
+def load_warmup_profile(filename):
+    """Load a warmup profile written by another process.  From now on,
+    the JIT starts tracing the places of the profile the first time they
+    are run, instead of after 'threshold' iterations.  It only applies
+    to the code objects created after this call, so call it as early as
+    possible.  Returns the number of places loaded."""
+    with open(filename) as f:
+        lines = f.read().splitlines()
+    return pypyjit._load_warmup_profile(lines)
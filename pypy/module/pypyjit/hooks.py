@@ -5,6 +5,7 @@ from rpython.rlib.jit import JitHookInterface, Counters
 from pypy.interpreter.error import OperationError
 from pypy.module.pypyjit.interp_resop import (Cache, wrap_greenkey,
     WrappedOp, W_JitLoopInfo, wrap_oplist)
+from pypy.module.pypyjit.warmup import WarmupProfile
 
 class PyPyJitIface(JitHookInterface):
     def on_abort(self, reason, jitdriver, greenkey, greenkey_repr, logops, operations):
@@ -46,6 +47,7 @@ class PyPyJitIface(JitHookInterface):
                 cache.in_recursion = False
 
     def after_compile(self, debug_info):
+        self.space.fromcache(WarmupProfile).record_loop(debug_info)
         self._compile_hook(debug_info, is_bridge=False)
 
     def after_compile_bridge(self, debug_info):
@@ -85,7 +85,9 @@ def set_trace_too_long_hook(space, w_hook):
     """ set_trace_too_long_hook(hook)
 
     Set a hook (callable) that will be called each time we abort
-    tracing because the trace is too long.
+    tracing because the trace is too long.  If the function being traced
+    is itself too long, its following traces are split into several pieces
+    instead of being aborted, and this hook is only a statistic.
 
     The hook will be called with the signature:
 
@@ -379,6 +381,8 @@ def get_stats_snapshot(space):
     space.setitem_str(w_counter_times, 'TRACING', space.newfloat(tr_time))
     b_time = jit_hooks.stats_get_times_value(None, Counters.BACKEND)
     space.setitem_str(w_counter_times, 'BACKEND', space.newfloat(b_time))
+    max_pause = jit_hooks.stats_get_max_pause(None)
+    space.setitem_str(w_counter_times, 'MAX_PAUSE', space.newfloat(max_pause))
     return W_JitInfoSnapshot(space, w_times, w_counters, w_counter_times)
 
 def get_stats_asmmemmgr(space):
@@ -388,6 +392,22 @@ def get_stats_asmmemmgr(space):
     m2 = jit_hooks.stats_asmmemmgr_used(None)
     return space.newtuple([space.newint(m1), space.newint(m2)])
 
+def get_stats_memmgr(space):
+    """Returns the state of the 'jit_code_max_bytes' budget, as a tuple
+    (max_bytes, code_bytes, evicted_loops, evicted_bytes): the value of
+    the parameter (0 for no limit), the machine code of the loops kept
+    alive now (only counted while there is a limit), and how many loops
+    and bytes of machine code the JIT stopped keeping alive so far to
+    stay below it."""
+    max_bytes = jit_hooks.stats_memmgr_max_bytes(None)
+    code_bytes = jit_hooks.stats_memmgr_code_bytes(None)
+    evicted_loops = jit_hooks.stats_memmgr_evicted_loops(None)
+    evicted_bytes = jit_hooks.stats_memmgr_evicted_bytes(None)
+    return space.newtuple([space.newint(max_bytes),
+                           space.newint(code_bytes),
+                           space.newint(evicted_loops),
+                           space.newint(evicted_bytes)])
+
 def enable_debug(space):
     """ Set the jit debugging - completely necessary for some stats to work,
     most notably assembler counters.
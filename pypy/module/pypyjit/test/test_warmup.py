@@ -0,0 +1,99 @@
+import py
+from pypy.interpreter.gateway import interp2app, unwrap_spec
+from pypy.interpreter.pycode import PyCode, CodeHookCache
+from rpython.jit.metainterp.history import JitCellToken, ConstInt, ConstPtr
+from rpython.jit.metainterp.history import BasicFailDescr
+from rpython.rtyper.annlowlevel import cast_instance_to_base_ptr
+from rpython.rtyper.lltypesystem import lltype, llmemory
+from rpython.rlib.jit import JitDebugInfo
+from rpython.tool.udir import udir
+from pypy.module.pypyjit.hooks import pypy_hooks
+from pypy.module.pypyjit.warmup import WarmupProfile
+from pypy.module.pypyjit.test.test_jit_hook import MockJitDriverSD
+
+
+class AppTestWarmupProfile(object):
+    spaceconfig = dict(usemodules=('pypyjit',))
+
+    def setup_class(cls):
+        if cls.runappdirect:
+            py.test.skip("Can't run this test with -A")
+        space = cls.space
+        traced = []
+
+        @unwrap_spec(w_code=PyCode, next_instr=int)
+        def interp_on_compile(space, w_code, next_instr):
+            ll_code = cast_instance_to_base_ptr(w_code)
+            code_gcref = lltype.cast_opaque_ptr(llmemory.GCREF, ll_code)
+            greenkey = [ConstInt(next_instr), ConstInt(0),
+                        ConstPtr(code_gcref)]
+            di_loop = JitDebugInfo(MockJitDriverSD, None, JitCellToken(),
+                                   [], 'loop', greenkey)
+            pypy_hooks.after_compile(di_loop)
+
+        def interp_on_compile_bridge(space):
+            di_bridge = JitDebugInfo(MockJitDriverSD, None, JitCellToken(),
+                                     [], 'bridge', fail_descr=BasicFailDescr())
+            pypy_hooks.after_compile_bridge(di_bridge)
+
+        def interp_code_hook_installed(space):
+            cache = space.fromcache(CodeHookCache)
+            return space.newbool(cache._interp_code_hook is not None)
+
+        def interp_get_traced(space):
+            return space.wrap(traced)
+
+        def _trace_next_iteration(self, pycode, next_instr,
+                                  is_being_profiled):
+            traced.append((pycode.co_name, next_instr, is_being_profiled))
+        cls._orig_trace = WarmupProfile._trace_next_iteration
+        WarmupProfile._trace_next_iteration = _trace_next_iteration
+
+        cls.w_on_compile = space.wrap(interp2app(interp_on_compile))
+        cls.w_on_compile_bridge = space.wrap(
+            interp2app(interp_on_compile_bridge))
+        cls.w_code_hook_installed = space.wrap(
+            interp2app(interp_code_hook_installed))
+        cls.w_get_traced = space.wrap(interp2app(interp_get_traced))
+        cls.w_filename = space.wrap(str(udir.join('warmup.prof')))
+
+    def teardown_class(cls):
+        WarmupProfile._trace_next_iteration = cls._orig_trace
+
+    def test_record_and_load(self):
+        import pypyjit
+        src = "def f(n):\n    while n:\n        n -= 1\n"
+        d = {}
+        exec compile(src, 'warm.py', 'exec') in d
+        self.on_compile(d['f'].__code__, 3)     # not recording yet
+        assert pypyjit._get_warmup_profile() == [
+            '# pypy jit warmup profile 1']
+        pypyjit.record_warmup_profile(self.filename)
+        self.on_compile(d['f'].__code__, 3)
+        self.on_compile(d['f'].__code__, 3)
+        self.on_compile_bridge()     # bridges are not recorded
+        lines = pypyjit._get_warmup_profile()
+        assert len(lines) == 2
+        assert lines[1].startswith('3 0 1 ')
+        assert lines[1].endswith(' f warm.py')
+        pypyjit.write_warmup_profile(self.filename)
+        #
+        raises(ValueError, pypyjit._load_warmup_profile, ['3 0 f'])
+        raises(ValueError, pypyjit._load_warmup_profile,
+               ['# pypy jit warmup profile 1', 'x 0 2 0 f warm.py'])
+        assert pypyjit.load_warmup_profile(self.filename) == 1
+        assert self.code_hook_installed()
+        assert self.get_traced() == []
+        exec compile(src, 'other.py', 'exec') in {}
+        exec compile(src.replace('n -= 1', 'n = n - 1'), 'warm.py', 'exec') in {}
+        assert self.get_traced() == []
+        exec compile(src, 'warm.py', 'exec') in {}
+        assert self.get_traced() == [('f', 3, 0)]
+        recorded, pending, pretraced = pypyjit.get_warmup_stats()
+        assert recorded == 1
+        assert pending == 1
+        assert pretraced == 1
+        # every code object of the profile was seen: the hook is removed
+        assert not self.code_hook_installed()
+        exec compile(src, 'warm.py', 'exec') in {}
+        assert self.get_traced() == [('f', 3, 0)]
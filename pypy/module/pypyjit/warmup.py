@@ -0,0 +1,171 @@
+"""
+Warmup profiles: the list of the places where the JIT compiled loops,
+saved by one process and loaded by the next one, which then starts
+tracing at these places the first time it runs them, instead of
+waiting for the counters to reach the thresholds.
+
+A place is identified by its code object, as (co_filename,
+co_firstlineno, co_name, hash of co_code), and by the bytecode offset
+and the 'is_being_profiled' flag of the green key.  The profile is a
+text file with one place per line; see app_warmup.py for the file I/O.
+
+Only loops are recorded: a bridge starts from a guard of its loop, not
+from a place of its own, so it cannot be traced early.  It is compiled
+again once its guard fails often enough in the new process.
+"""
+
+from rpython.rlib import jit_hooks
+from rpython.rlib.jit import dont_look_inside
+from rpython.rlib.rarithmetic import r_uint, intmask
+from rpython.rtyper.annlowlevel import cast_base_ptr_to_instance
+from rpython.rtyper.lltypesystem import lltype
+from rpython.rtyper.rclass import OBJECT
+from rpython.rlib.rgc import cast_instance_to_gcref
+from pypy.interpreter.error import oefmt
+from pypy.interpreter.pycode import PyCode, CodeHookCache
+
+PROFILE_HEADER = '# pypy jit warmup profile 1'
+
+
+def _bytecode_hash(s):
+    # FNV-1a; unlike compute_hash(), it is the same in every process
+    h = r_uint(2166136261)
+    for c in s:
+        h = (h ^ r_uint(ord(c))) * r_uint(16777619)
+        h &= r_uint(0xFFFFFFFF)
+    return intmask(h)
+
+def code_key(pycode):
+    return '%d %d %s %s' % (pycode.co_firstlineno,
+                            _bytecode_hash(pycode.co_code),
+                            pycode.co_name, pycode.co_filename)
+
+def _name_key(pycode):
+    # the part of code_key() that is cheap to compute
+    return '%d %s %s' % (pycode.co_firstlineno, pycode.co_name,
+                         pycode.co_filename)
+
+
+class WarmupProfile(object):
+    """Singleton, created by space.fromcache.  While some code objects
+    of the loaded profile were not seen yet, it is installed as the
+    interp-level code hook of CodeHookCache, and new_code() is called for
+    every new code object."""
+
+    def __init__(self, space):
+        self.space = space
+        self.recording = False
+        self.recorded = {}       # {profile line: None}
+        self.pending = {}        # {code_key: [(next_instr, profiled)]}
+        self.pending_names = {}  # {_name_key: None}
+        self.unseen = {}         # {code_key: None}, not seen yet
+        self.pretraced = 0
+
+    def record_loop(self, debug_info):
+        if not self.recording:
+            return
+        if debug_info.get_jitdriver().name != 'pypyjit':
+            return
+        greenkey = debug_info.greenkey
+        if greenkey is None:
+            return
+        next_instr = greenkey[0].getint()
+        is_being_profiled = greenkey[1].getint()
+        ll_code = lltype.cast_opaque_ptr(lltype.Ptr(OBJECT),
+                                         greenkey[2].getref_base())
+        pycode = cast_base_ptr_to_instance(PyCode, ll_code)
+        line = '%d %d %s' % (next_instr, is_being_profiled, code_key(pycode))
+        self.recorded[line] = None
+
+    def load(self, lines):
+        """Parse the profile lines and return the number of places."""
+        count = 0
+        for line in lines:
+            if not line or line.startswith('#'):
+                continue
+            parts = line.split(' ', 2)
+            if len(parts) != 3:
+                raise ValueError
+            next_instr = int(parts[0])
+            is_being_profiled = int(parts[1])
+            key = parts[2]
+            key_parts = key.split(' ', 2)
+            if len(key_parts) != 3:
+                raise ValueError
+            places = self.pending.get(key, None)
+            if places is None:
+                places = self.pending[key] = []
+            places.append((next_instr, is_being_profiled))
+            self.pending_names[key_parts[0] + ' ' + key_parts[2]] = None
+            self.unseen[key] = None
+            count += 1
+        if self.unseen:
+            self.space.fromcache(CodeHookCache)._interp_code_hook = self
+        return count
+
+    def new_code(self, pycode):
+        # most code objects are not in the profile: check the name
+        # before hashing the bytecode
+        if _name_key(pycode) not in self.pending_names:
+            return
+        key = code_key(pycode)
+        places = self.pending.get(key, None)
+        if places is None:
+            return
+        for next_instr, is_being_profiled in places:
+            if 0 <= next_instr < len(pycode.co_code):
+                self._trace_next_iteration(pycode, next_instr,
+                                           is_being_profiled)
+                self.pretraced += 1
+        if key in self.unseen:
+            del self.unseen[key]
+            if not self.unseen:
+                # all done: stop slowing down the creation of code
+                # objects.  The code objects that are created again
+                # later, e.g. by reload(), are not traced early
+                cache = self.space.fromcache(CodeHookCache)
+                if cache._interp_code_hook is self:
+                    cache._interp_code_hook = None
+
+    @dont_look_inside
+    def _trace_next_iteration(self, pycode, next_instr, is_being_profiled):
+        jit_hooks.trace_next_iteration('pypyjit', r_uint(next_instr),
+                                       is_being_profiled,
+                                       cast_instance_to_gcref(pycode))
+
+# ____________________________________________________________
+
+def _start_warmup_recording(space):
+    profile = space.fromcache(WarmupProfile)
+    profile.recording = True
+
+def _get_warmup_profile(space):
+    profile = space.fromcache(WarmupProfile)
+    lines_w = [space.newtext(PROFILE_HEADER)]
+    for line in profile.recorded.keys():
+        lines_w.append(space.newtext(line))
+    return space.newlist(lines_w)
+
+def _load_warmup_profile(space, w_lines):
+    profile = space.fromcache(WarmupProfile)
+    lines = space.listview_bytes(w_lines)
+    if lines is None:
+        lines = [space.bytes_w(w_line)
+                 for w_line in space.listview(w_lines)]
+    if not lines or lines[0] != PROFILE_HEADER:
+        raise oefmt(space.w_ValueError, "not a JIT warmup profile")
+    try:
+        count = profile.load(lines)
+    except ValueError:
+        raise oefmt(space.w_ValueError, "invalid JIT warmup profile")
+    return space.newint(count)
+
+def get_warmup_stats(space):
+    """Return a tuple (recorded, pending, pretraced): the number of
+    places recorded for the next warmup profile, the number of code
+    objects of the loaded profile, and the number of places whose
+    tracing was started early because they were in the loaded profile."""
+    profile = space.fromcache(WarmupProfile)
+    return space.newtuple([space.newint(len(profile.recorded)),
+                           space.newint(len(profile.pending)),
+                           space.newint(profile.pretraced)])
@@ -0,0 +1,160 @@
+"""A host-side cache of compiled .pyc files for sandboxed PyPys.
+
+The sandboxed process cannot write .pyc files, so it would normally
+recompile every module it imports from source, every time it starts.
+Instead, the controller compiles the sources itself (with a trusted
+compiler, never with the sandboxed process) and the virtual filesystem
+shows the results as read-only .pyc files next to the sources.
+"""
+
+import os, struct, subprocess
+from rpython.translator.sandbox.vfs import CachedRealDir, RealFile, MTIME
+
+try:
+    from hashlib import sha1
+except ImportError:
+    from sha import sha as sha1
+
+
+COMPILE_SCRIPT = '''if 1:
+    import sys, marshal
+    filename = sys.argv[1]
+    source = open(filename, 'rU').read()
+    code = compile(source, filename, 'exec', 0, True)
+    sys.stdout.write(marshal.dumps(code, 2))
+'''
+
+def compile_with_host(filename):
+    """Compile 'filename' with the host interpreter.  Only correct if
+    the host has the same bytecode (i.e. pyc magic) as the sandbox.
+    """
+    import marshal
+    f = open(filename, 'rU')
+    try:
+        source = f.read()
+    finally:
+        f.close()
+    code = compile(source, filename, 'exec', 0, True)
+    return marshal.dumps(code, 2)
+
+def make_executable_compiler(executable):
+    """Return a function that compiles a file with a separate, trusted
+    (i.e. not sandboxed) interpreter, such as a regular pypy-c of the
+    same version as the sandboxed one.
+    """
+    def compile_with_executable(filename):
+        popen = subprocess.Popen([executable, '-c', COMPILE_SCRIPT, filename],
+                                 stdout=subprocess.PIPE,
+                                 stderr=subprocess.PIPE)
+        data, error = popen.communicate()
+        if popen.returncode != 0:
+            raise SyntaxError("cannot compile %s: %s" % (filename,
+                                                         error.strip()))
+        return data
+    return compile_with_executable
+
+
+class PycCache(object):
+    """Compiled files for the interpreter with the given 'magic' number.
+    They are stored in 'cachedir', keyed by the magic and by a hash of
+    the source; the in-memory index is keyed by the path, mtime and size
+    of the source.  The .pyc files produced contain 'virtual_mtime' as
+    timestamp, which must match what the virtual filesystem reports for
+    the sources.
+    """
+
+    def __init__(self, cachedir, magic, compiler=None, virtual_mtime=MTIME):
+        if compiler is None:
+            import imp
+            if imp.get_magic() != struct.pack("<i", magic):
+                raise ValueError("the host interpreter has a different pyc "
+                                 "magic number; need an explicit compiler")
+            compiler = compile_with_host
+        if not os.path.isdir(cachedir):
+            os.makedirs(cachedir)
+        self.cachedir = cachedir
+        self.magic = magic
+        self.compiler = compiler
+        self.header = struct.pack("<ii", magic, int(virtual_mtime))
+        self.index = {}    # {(path, mtime, size): cached pyc path or None}
+
+    def get(self, filename):
+        """Return the path of an up-to-date .pyc for the source file
+        'filename', or None if it cannot be compiled.
+        """
+        st = os.stat(filename)
+        key = (filename, st.st_mtime, st.st_size)
+        try:
+            return self.index[key]
+        except KeyError:
+            pass
+        f = open(filename, 'rb')
+        try:
+            source = f.read()
+        finally:
+            f.close()
+        digest = sha1(self.header + source).hexdigest()
+        cpath = os.path.join(self.cachedir, digest + '.pyc')
+        if not self.is_valid(cpath):
+            try:
+                data = self.compiler(filename)
+            except (SyntaxError, ValueError, TypeError):
+                cpath = None    # let the sandboxed process report the error
+            else:
+                self.write(cpath, self.header + data)
+        self.index[key] = cpath
+        return cpath
+
+    def is_valid(self, cpath):
+        try:
+            f = open(cpath, 'rb')
+        except IOError:
+            return False
+        try:
+            return f.read(len(self.header)) == self.header
+        finally:
+            f.close()
+
+    def write(self, cpath, data):
+        # write to a temporary file first, so that concurrent controllers
+        # never see a partially written .pyc
+        tmppath = '%s.%d.tmp' % (cpath, os.getpid())
+        f = open(tmppath, 'wb')
+        try:
+            f.write(data)
+        finally:
+            f.close()
+        os.rename(tmppath, cpath)
+
+
+class PycCacheDir(CachedRealDir):
+    """A CachedRealDir in which 'foo.pyc' is served from a PycCache if
+    'foo.py' is visible.  The sources themselves are shown unchanged.
+    """
+
+    def __init__(self, path, pyc_cache, **kwds):
+        CachedRealDir.__init__(self, path, **kwds)
+        self.pyc_cache = pyc_cache
+
+    def __repr__(self):
+        return '<PycCacheDir %s>' % (self.path,)
+
+    def subdir(self, path):
+        return PycCacheDir(path, self.pyc_cache,
+                           show_dotfiles = self.show_dotfiles,
+                           follow_links  = self.follow_links,
+                           exclude       = self.exclude,
+                           check_mtime   = self.check_mtime)
+
+    def join(self, name):
+        if name.endswith('.pyc'):
+            try:
+                source = CachedRealDir.join(self, name[:-1])
+            except OSError:
+                pass
+            else:
+                if isinstance(source, RealFile):
+                    cpath = self.pyc_cache.get(source.path)
+                    if cpath is not None:
+                        return RealFile(cpath)
+        return CachedRealDir.join(self, name)
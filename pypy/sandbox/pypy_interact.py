@@ -7,11 +7,25 @@ Usage:
 
 Options:
     --tmp=DIR     the real directory that corresponds to the virtual /tmp,
-                  which is the virtual current dir (always read-only for now)
+                  which is the virtual current dir (read-only by default)
+    --tmp-quota=N make the virtual /tmp writable: new files are kept in
+                  memory, up to N bytes (same suffixes as --heapsize)
     --heapsize=N  limit memory usage to N bytes, or kilo- mega- giga-bytes
                   with the 'k', 'm' or 'g' suffix respectively.
-    --timeout=N   limit execution time to N (real-time) seconds.
+    --timeout=N   limit execution time to N (real-time) seconds, which
+                  can be fractional.
+    --cpu-time=N  limit the CPU time used by the subprocess to N seconds.
+    --max-syscalls=N  kill the subprocess when it makes more than N
+                  system calls.
     --log=FILE    log all user input into the FILE.
+    --profile=FILE  write statistics about the system calls proxied for
+                  the subprocess into the FILE, as JSON, when it exits.
+    --pyc-cache=DIR  compile the library modules on the host side into DIR,
+                  and show them to the subprocess as read-only .pyc files.
+    --pyc-compiler=EXE  a trusted, non-sandboxed interpreter of the same
+                  version as <executable>, used to compile the .pyc files
+                  of --pyc-cache (default: this interpreter, if it has
+                  the same bytecode)
     --verbose     log all proxied system calls.
 
 Note that you can get readline-like behavior with a tool like 'ledit',
@@ -25,6 +39,9 @@ sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), '..'
 from rpython.translator.sandbox.sandlib import SimpleIOSandboxedProc
 from rpython.translator.sandbox.sandlib import VirtualizedSandboxedProc
 from rpython.translator.sandbox.vfs import Dir, RealDir, RealFile
+from rpython.translator.sandbox.vfs import CachedRealDir, OverlayDir, Quota
+from pypy.sandbox.pyccache import PycCache, PycCacheDir
+from pypy.sandbox.pyccache import make_executable_compiler
 import pypy
 LIB_ROOT = os.path.dirname(os.path.dirname(pypy.__file__))
 
@@ -34,9 +51,15 @@ class PyPySandboxedProc(VirtualizedSandboxedProc, SimpleIOSandboxedProc):
     virtual_env = {}
     virtual_console_isatty = True
 
-    def __init__(self, executable, arguments, tmpdir=None, debug=True):
+    def __init__(self, executable, arguments, tmpdir=None, debug=True,
+                 pyc_cache=None, tmp_quota=None, cpu_time_limit=None,
+                 max_syscalls=None):
         self.executable = executable = os.path.abspath(executable)
+        self.cpu_time_limit = cpu_time_limit
+        self.max_syscalls = max_syscalls
         self.tmpdir = tmpdir
+        self.tmp_quota = tmp_quota
+        self.pyc_cache = pyc_cache
         self.debug = debug
         super(PyPySandboxedProc, self).__init__([self.argv0] + arguments,
                                                 executable=executable)
@@ -51,27 +74,62 @@ class PyPySandboxedProc(VirtualizedSandboxedProc, SimpleIOSandboxedProc):
             tmpdirnode = Dir({})
         else:
             tmpdirnode = RealDir(self.tmpdir, exclude=exclude)
+        if self.tmp_quota is not None:
+            tmpdirnode = OverlayDir(tmpdirnode, Quota(max_bytes=self.tmp_quota))
         libroot = str(LIB_ROOT)
 
         return Dir({
             'bin': Dir({
                 'pypy-c': RealFile(self.executable, mode=0111),
-                'lib-python': RealDir(os.path.join(libroot, 'lib-python'),
-                                      exclude=exclude), 
-                'lib_pypy': RealDir(os.path.join(libroot, 'lib_pypy'),
-                                      exclude=exclude),
+                'lib-python': self.libdir(os.path.join(libroot, 'lib-python'),
+                                          exclude),
+                'lib_pypy': self.libdir(os.path.join(libroot, 'lib_pypy'),
+                                        exclude),
                 }),
              'tmp': tmpdirnode,
              })
 
+    def libdir(self, path, exclude):
+        # the real .pyc files are always hidden; with a pyc_cache, the
+        # subprocess sees the ones compiled by the controller instead.
+        # The library doesn't change while we run, so its directories
+        # are only listed once in both cases.
+        if self.pyc_cache is None:
+            return CachedRealDir(path, exclude=exclude)
+        return PycCacheDir(path, self.pyc_cache, exclude=exclude)
+
+def parse_size(value, option):
+    value = value.lower()
+    if value.endswith('k'):
+        bytes = int(value[:-1]) * 1024
+    elif value.endswith('m'):
+        bytes = int(value[:-1]) * 1024 * 1024
+    elif value.endswith('g'):
+        bytes = int(value[:-1]) * 1024 * 1024 * 1024
+    else:
+        bytes = int(value)
+    if bytes <= 0:
+        raise ValueError
+    if bytes > sys.maxint:
+        raise OverflowError("%s maximum is %d" % (option, sys.maxint))
+    return bytes
+
 def main():
     from getopt import getopt      # and not gnu_getopt!
     options, arguments = getopt(sys.argv[1:], 't:hv', 
                                 ['tmp=', 'heapsize=', 'timeout=', 'log=',
-                                 'verbose', 'help'])
+                                 'verbose', 'help', 'pyc-cache=',
+                                 'pyc-compiler=', 'tmp-quota=',
+                                 'profile=', 'cpu-time=', 'max-syscalls='])
     tmpdir = None
+    tmp_quota = None
     timeout = None
+    cpu_time_limit = None
+    max_syscalls = None
     logfile = None
+    profilefile = None
+    pyc_cachedir = None
+    pyc_compiler = None
     debug = False
     extraoptions = []
 
@@ -86,24 +144,24 @@ def main():
                 raise OSError("%r is not a directory" % (value,))
             tmpdir = value
         elif option == '--heapsize':
-            value = value.lower()
-            if value.endswith('k'):
-                bytes = int(value[:-1]) * 1024
-            elif value.endswith('m'):
-                bytes = int(value[:-1]) * 1024 * 1024
-            elif value.endswith('g'):
-                bytes = int(value[:-1]) * 1024 * 1024 * 1024
-            else:
-                bytes = int(value)
-            if bytes <= 0:
-                raise ValueError
-            if bytes > sys.maxint:
-                raise OverflowError("--heapsize maximum is %d" % sys.maxint)
+            bytes = parse_size(value, option)
             extraoptions[:0] = ['--heapsize', str(bytes)]
+        elif option == '--tmp-quota':
+            tmp_quota = parse_size(value, option)
         elif option == '--timeout':
-            timeout = int(value)
+            timeout = float(value)
+        elif option == '--cpu-time':
+            cpu_time_limit = float(value)
+        elif option == '--max-syscalls':
+            max_syscalls = int(value)
         elif option == '--log':
             logfile = value
+        elif option == '--profile':
+            profilefile = value
+        elif option == '--pyc-cache':
+            pyc_cachedir = os.path.abspath(value)
+        elif option == '--pyc-compiler':
+            pyc_compiler = make_executable_compiler(value)
         elif option in ['-v', '--verbose']:
             debug = True
         elif option in ['-h', '--help']:
@@ -113,17 +171,32 @@ def main():
 
     if len(arguments) < 1:
         help()
+    if pyc_compiler is not None and pyc_cachedir is None:
+        raise ValueError("--pyc-compiler requires --pyc-cache")
+
+    pyc_cache = None
+    if pyc_cachedir is not None:
+        from pypy.interpreter.pycode import default_magic
+        pyc_cache = PycCache(pyc_cachedir, default_magic, pyc_compiler)
 
     sandproc = PyPySandboxedProc(arguments[0], extraoptions + arguments[1:],
-                                 tmpdir=tmpdir, debug=debug)
+                                 tmpdir=tmpdir, debug=debug,
+                                 pyc_cache=pyc_cache, tmp_quota=tmp_quota,
+                                 cpu_time_limit=cpu_time_limit,
+                                 max_syscalls=max_syscalls)
     if timeout is not None:
         sandproc.settimeout(timeout, interrupt_main=True)
     if logfile is not None:
         sandproc.setlogfile(logfile)
+    if profilefile is not None:
+        sandproc.enable_profiling()
     try:
         sandproc.interact()
     finally:
         sandproc.kill()
+        if profilefile is not None:
+            with open(profilefile, 'w') as f:
+                sandproc.profile.write(f)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,90 @@
+import py
+import os, imp, marshal, struct
+from pypy.sandbox.pyccache import PycCache, PycCacheDir, compile_with_host
+from rpython.translator.sandbox.vfs import CachedRealDir
+from rpython.tool.udir import udir
+
+HOST_MAGIC, = struct.unpack("<i", imp.get_magic())
+
+
+def setup_module(mod):
+    d = udir.ensure('test_pyccache', dir=1)
+    d.join('mod1.py').write('x = 42\n')
+    d.join('broken.py').write('x = (\n')
+    d.join('.hidden.py').write('secret = 1\n')
+    d.ensure('pkg', dir=1).join('__init__.py').write('y = 43\n')
+    mod.srcdir = d
+
+
+def test_host_compile():
+    cache = PycCache(str(udir.join('test_pyccache_host')), HOST_MAGIC)
+    cpath = cache.get(str(srcdir.join('mod1.py')))
+    data = open(cpath, 'rb').read()
+    assert data[:4] == imp.get_magic()
+    assert data[4:8] == '\x00\x00\x00\x00'     # the virtual mtime
+    code = marshal.loads(data[8:])
+    ns = {}
+    exec code in ns
+    assert ns['x'] == 42
+    assert cache.get(str(srcdir.join('broken.py'))) is None
+
+def test_other_magic_needs_a_compiler():
+    py.test.raises(ValueError, PycCache, str(udir.join('test_pyccache_x')),
+                   HOST_MAGIC + 1)
+
+def test_cache_is_reused():
+    compiled = []
+    def compiler(filename):
+        compiled.append(filename)
+        return 'code for ' + os.path.basename(filename)
+    cachedir = str(udir.join('test_pyccache_reused'))
+    source = str(srcdir.join('mod1.py'))
+    cache = PycCache(cachedir, 12345, compiler)
+    cpath = cache.get(source)
+    assert cache.get(source) == cpath
+    assert compiled == [source]
+    # a new cache on the same directory doesn't need to recompile
+    cache = PycCache(cachedir, 12345, compiler)
+    assert cache.get(source) == cpath
+    assert compiled == [source]
+    assert open(cpath, 'rb').read() == (struct.pack("<ii", 12345, 0) +
+                                        'code for mod1.py')
+    # but a different magic does
+    cache = PycCache(cachedir, 12346, compiler)
+    assert cache.get(source) != cpath
+    assert compiled == [source, source]
+
+def test_pyccachedir():
+    def compiler(filename):
+        if filename.endswith('broken.py'):
+            raise SyntaxError
+        return 'code'
+    cache = PycCache(str(udir.join('test_pyccache_dir')), 12345, compiler)
+    d = PycCacheDir(str(srcdir), cache, exclude=['.pyc'])
+    header = struct.pack("<ii", 12345, 0)
+    assert d.join('mod1.pyc').open().read() == header + 'code'
+    assert d.join('mod1.py').open().read() == 'x = 42\n'
+    sub = d.join('pkg')
+    assert isinstance(sub, PycCacheDir)
+    assert sub.join('__init__.pyc').getsize() == 12
+    py.test.raises(OSError, d.join, 'broken.pyc')
+    py.test.raises(OSError, d.join, 'missing.pyc')
+    py.test.raises(OSError, d.join, '.hidden.pyc')
+    assert 'mod1.pyc' not in d.keys()
+
+def test_pyccachedir_is_cached():
+    cache = PycCache(str(udir.join('test_pyccache_dir_cached')), 12345,
+                     lambda filename: 'code')
+    d = PycCacheDir(str(srcdir), cache, exclude=['.pyc'])
+    assert isinstance(d, CachedRealDir)
+    assert isinstance(d.join('pkg'), CachedRealDir)
+    assert d.join('mod1.pyc').getsize() == 12
+    srcdir.join('mod2.py').write('z = 44\n')
+    try:
+        # the directory was listed already
+        py.test.raises(OSError, d.join, 'mod2.py')
+        py.test.raises(OSError, d.join, 'mod2.pyc')
+        d2 = PycCacheDir(str(srcdir), cache, exclude=['.pyc'])
+        assert d2.join('mod2.pyc').getsize() == 12
+    finally:
+        srcdir.join('mod2.py').remove()
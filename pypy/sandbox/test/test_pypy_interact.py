@@ -83,3 +83,11 @@ def test_run():
     sandproc = PyPySandboxedProc(executable, ['foo', 'bar'])
     returncode = sandproc.interact()
     assert returncode == 0
+
+def test_pyc_compiler_requires_pyc_cache(monkeypatch):
+    from pypy.sandbox import pypy_interact
+    monkeypatch.setattr(pypy_interact.sys, 'argv',
+                        ['pypy_interact.py', '--pyc-compiler=pypy-c',
+                         executable])
+    e = py.test.raises(ValueError, pypy_interact.main)
+    assert '--pyc-cache' in str(e.value)
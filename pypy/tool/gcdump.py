@@ -3,24 +3,155 @@
 Prints a human-readable total out of a dumpfile produced
 by gc.dump_rpy_heap(), and optionally a typeids.txt.
 
-Syntax:  dump.py  <dumpfile>  [<typeids.txt>]
+Syntax:  dump.py  [--diff <olddumpfile>]  <dumpfile>  [<typeids.txt>]
 
 By default, typeids.txt is loaded from the same dir as dumpfile.
+Both the raw and the compact formats of gc.dump_rpy_heap() are
+supported, optionally compressed with gzip (if the file name ends
+in '.gz').  The dump files are read as a stream, so the memory used
+only depends on the number of types, not on the size of the dump.
+
+With --diff, prints the growth of each type between the two dumps.
 """
-import sys, array, struct, os
+import sys, array, struct, os, heapq
+
+# see rpython/memory/gc/inspector.py
+COMPACT_MAGIC = 'RPYHEAP\x01'
+COMPACT_END_OF_ROOTS = 0
+COMPACT_END_OF_DUMP = 1
+COMPACT_FIRST_TYPE = 2
+
+CHUNK = 1024 * 1024   # bytes read at once
+
+
+class DumpFormatError(Exception):
+    pass
+
+
+def open_dump_file(filename):
+    if filename.endswith('.gz'):
+        import gzip
+        return gzip.open(filename, 'rb')
+    return open(filename, 'rb')
+
+def iter_dump_file(filename):
+    """Yield all the objects in the dump file, as tuples (addr, typenum,
+    size, list_of_referenced_addrs).  The marker after the GC roots is
+    yielded as (0, 0, 0, [])."""
+    f = open_dump_file(filename)
+    try:
+        head = f.read(len(COMPACT_MAGIC))
+        if head == COMPACT_MAGIC:
+            reader = CompactReader(f, '')
+            for obj in reader.iter_objects():
+                yield obj
+        else:
+            for obj in iter_raw_objects(f, head):
+                yield obj
+    finally:
+        f.close()
+
+
+def iter_raw_objects(f, head):
+    words = iter_raw_words(f, head)
+    for addr in words:
+        try:
+            typenum = words.next()
+            size = words.next()
+            refs = []
+            x = words.next()
+            while x != -1:
+                refs.append(x)
+                x = words.next()
+        except StopIteration:
+            raise DumpFormatError(
+                "invalid or truncated dump file (or 32/64-bit mix)")
+        yield (addr, typenum, size, refs)
+
+def iter_raw_words(f, head=''):
+    itemsize = struct.calcsize('l')
+    data = head + f.read(CHUNK - len(head))
+    while data:
+        if len(data) % itemsize:
+            raise DumpFormatError(
+                "invalid or truncated dump file (or 32/64-bit mix)")
+        a = array.array('l')
+        a.fromstring(data)
+        for x in a:
+            yield x
+        data = f.read(CHUNK)
+
+
+class CompactReader(object):
+
+    def __init__(self, f, buf):
+        self.f = f
+        self.buf = buf
+        self.pos = 0
+
+    def refill(self):
+        self.buf = self.f.read(CHUNK)
+        self.pos = 0
+        if not self.buf:
+            raise DumpFormatError("truncated dump file")
+
+    def read_byte(self):
+        if self.pos >= len(self.buf):
+            self.refill()
+        b = ord(self.buf[self.pos])
+        self.pos += 1
+        return b
+
+    def read_uvarint(self):
+        result = 0
+        shift = 0
+        while True:
+            b = self.read_byte()
+            result |= (b & 0x7F) << shift
+            if b < 0x80:
+                return result
+            shift += 7
+
+    def iter_objects(self):
+        wordsize = self.read_byte()
+        if wordsize != struct.calcsize('l'):
+            raise DumpFormatError("dump file of a %d-bit process"
+                                  % (wordsize * 8,))
+        addr = 0
+        while True:
+            kind = self.read_uvarint()
+            if kind == COMPACT_END_OF_ROOTS:
+                yield (0, 0, 0, [])
+                continue
+            if kind == COMPACT_END_OF_DUMP:
+                break
+            addr += unzigzag(self.read_uvarint())
+            size = self.read_uvarint()
+            refs = []
+            x = self.read_uvarint()
+            while x != 0:
+                refs.append(addr + unzigzag(x - 1))
+                x = self.read_uvarint()
+            yield (addr, kind - COMPACT_FIRST_TYPE, size, refs)
+
+def unzigzag(x):
+    return (x >> 1) ^ -(x & 1)
 
 
 class Stat(object):
     summary = {}
     typeids = {0: '<GCROOT>'}
     BIGOBJ = 65536   # bytes
+    NUM_BIGOBJS = 10
 
     def summarize(self, filename):
-        a = self.load_dump_file(filename)
         self.summary = {}     # {typenum: [count, totalsize]}
-        self.bigobjs = []     # list of individual (size, typenum)
-        for obj in self.walk(a):
-            self.add_object_summary(obj[2], obj[3])
+        self.bigobjs = []     # heap of the largest (size, typenum)
+        self.num_bigobjs = 0
+        print >> sys.stderr, 'walking...',
+        for obj in iter_dump_file(filename):
+            self.add_object_summary(obj[1], obj[2])
+        print >> sys.stderr, 'done'
 
     def load_typeids(self, filename_or_iter):
         self.typeids = Stat.typeids.copy()
@@ -53,9 +184,9 @@ class Stat(object):
                                       self.get_type_name(typenum))
         print 'total %.1fM' % (totalsize / (1024.0*1024.0),)
         print
-        lst = sorted(self.bigobjs)[-10:]
+        lst = sorted(self.bigobjs)
         if lst:
-            if len(lst) == len(self.bigobjs):
+            if len(lst) == self.num_bigobjs:
                 print '%d objects take at least %d bytes each:' % (len(lst), self.BIGOBJ)
             else:
                 print '%d largest single objects:' % (len(lst),)
@@ -65,6 +196,26 @@ class Stat(object):
         else:
             print 'No object takes at least %d bytes on its own.' % (self.BIGOBJ,)
 
+    def diff(self, oldstat):
+        """Return a list of (typenum, count_delta, size_delta), for the
+        types whose count or total size changed, biggest growth last."""
+        result = []
+        for typenum in set(self.summary) | set(oldstat.summary):
+            count, size = self.summary.get(typenum, (0, 0))
+            oldcount, oldsize = oldstat.summary.get(typenum, (0, 0))
+            if count != oldcount or size != oldsize:
+                result.append((typenum, count - oldcount, size - oldsize))
+        result.sort(key=lambda (typenum, dcount, dsize): (dsize, dcount))
+        return result
+
+    def print_diff(self, oldstat):
+        totaldelta = 0
+        for typenum, dcount, dsize in self.diff(oldstat):
+            totaldelta += dsize
+            print '%+9d %+9.2fM  %s' % (dcount, dsize / (1024.0*1024.0),
+                                        self.get_type_name(typenum))
+        print 'total %+.1fM' % (totaldelta / (1024.0*1024.0),)
+
     def load_dump_file(self, filename):
         f = open(filename, 'rb')
         f.seek(0, 2)
@@ -77,7 +228,11 @@ class Stat(object):
 
     def add_object_summary(self, typenum, sizeobj):
         if sizeobj >= self.BIGOBJ:
-            self.bigobjs.append((sizeobj, typenum))
+            self.num_bigobjs += 1
+            if len(self.bigobjs) < self.NUM_BIGOBJS:
+                heapq.heappush(self.bigobjs, (sizeobj, typenum))
+            else:
+                heapq.heappushpop(self.bigobjs, (sizeobj, typenum))
         try:
             stat = self.summary[typenum]
         except KeyError:
@@ -102,20 +257,31 @@ class Stat(object):
 
 
 if __name__ == '__main__':
-    if len(sys.argv) <= 1:
+    args = sys.argv[1:]
+    olddump = None
+    if len(args) >= 2 and args[0] == '--diff':
+        olddump = args[1]
+        del args[:2]
+    if not args:
         print >> sys.stderr, __doc__
         sys.exit(2)
     stat = Stat()
-    stat.summarize(sys.argv[1])
+    stat.summarize(args[0])
+    if olddump is not None:
+        oldstat = Stat()
+        oldstat.summarize(olddump)
     #
-    if len(sys.argv) > 2:
-        typeid_name = sys.argv[2]
+    if len(args) > 1:
+        typeid_name = args[1]
     else:
-        typeid_name = os.path.join(os.path.dirname(sys.argv[1]), 'typeids.txt')
+        typeid_name = os.path.join(os.path.dirname(args[0]), 'typeids.txt')
     if os.path.isfile(typeid_name):
         stat.load_typeids(typeid_name)
     else:
         import zlib, gc
         stat.load_typeids(zlib.decompress(gc.get_typeids_z()).split("\n"))
     #
-    stat.print_summary()
+    if olddump is not None:
+        stat.print_diff(oldstat)
+    else:
+        stat.print_summary()
@@ -0,0 +1,85 @@
+import array, gzip
+from pypy.tool import gcdump
+
+
+def raw_dump(objects):
+    a = array.array('l')
+    for addr, typenum, size, refs in objects:
+        a.extend([addr, typenum, size] + refs + [-1])
+    return a.tostring()
+
+def compact_dump(objects):
+    out = [gcdump.COMPACT_MAGIC, chr(array.array('l').itemsize)]
+    def uvarint(x):
+        while x >= 0x80:
+            out.append(chr((x & 0x7F) | 0x80))
+            x >>= 7
+        out.append(chr(x))
+    def zigzag(x):
+        return (x << 1) if x >= 0 else ((-x << 1) - 1)
+    prev = 0
+    for addr, typenum, size, refs in objects:
+        if (addr, typenum, size, refs) == (0, 0, 0, []):
+            uvarint(gcdump.COMPACT_END_OF_ROOTS)
+            continue
+        uvarint(typenum + gcdump.COMPACT_FIRST_TYPE)
+        uvarint(zigzag(addr - prev))
+        prev = addr
+        uvarint(size)
+        for ref in refs:
+            uvarint(zigzag(ref - addr) + 1)
+        uvarint(0)
+    uvarint(gcdump.COMPACT_END_OF_DUMP)
+    return ''.join(out)
+
+OBJECTS = [(0x1000, 0, 0, [0x2000]),
+           (0, 0, 0, []),
+           (0x2000, 5, 32, [0x1000, 0x3000]),
+           (0x3000, 7, 100000, []),
+           (0x1800, 5, 32, [0x2000])]
+
+
+def test_iter_dump_file_raw(tmpdir):
+    fn = tmpdir.join('dump')
+    fn.write(raw_dump(OBJECTS), mode='wb')
+    assert list(gcdump.iter_dump_file(str(fn))) == OBJECTS
+
+def test_iter_dump_file_compact(tmpdir):
+    fn = tmpdir.join('dump')
+    fn.write(compact_dump(OBJECTS), mode='wb')
+    assert list(gcdump.iter_dump_file(str(fn))) == OBJECTS
+
+def test_iter_dump_file_gzip(tmpdir):
+    for data in [raw_dump(OBJECTS), compact_dump(OBJECTS)]:
+        fn = str(tmpdir.join('dump.gz'))
+        f = gzip.open(fn, 'wb')
+        f.write(data)
+        f.close()
+        assert list(gcdump.iter_dump_file(fn)) == OBJECTS
+
+def test_small_chunks(tmpdir, monkeypatch):
+    monkeypatch.setattr(gcdump, 'CHUNK', 8)
+    for data in [raw_dump(OBJECTS), compact_dump(OBJECTS)]:
+        fn = tmpdir.join('dump')
+        fn.write(data, mode='wb')
+        assert list(gcdump.iter_dump_file(str(fn))) == OBJECTS
+
+def test_truncated(tmpdir):
+    import py
+    fn = tmpdir.join('dump')
+    fn.write(compact_dump(OBJECTS)[:-3], mode='wb')
+    py.test.raises(gcdump.DumpFormatError, list,
+                   gcdump.iter_dump_file(str(fn)))
+
+def test_summarize_and_diff(tmpdir):
+    old = tmpdir.join('old')
+    old.write(compact_dump(OBJECTS[:3]), mode='wb')
+    new = tmpdir.join('new')
+    new.write(compact_dump(OBJECTS), mode='wb')
+    oldstat = gcdump.Stat()
+    oldstat.summarize(str(old))
+    stat = gcdump.Stat()
+    stat.summarize(str(new))
+    assert stat.summary == {0: [2, 0], 5: [2, 64], 7: [1, 100000]}
+    assert stat.bigobjs == [(100000, 7)]
+    assert stat.diff(oldstat) == [(5, 1, 32), (7, 1, 100000)]
@@ -347,15 +347,22 @@ class BoolOption(Option):
 class IntOption(Option):
     opt_type = 'int'
 
-    def __init__(self, name, doc, default=None, cmdline=DEFAULT_OPTION_NAME):
+    def __init__(self, name, doc, default=None, cmdline=DEFAULT_OPTION_NAME,
+                 minvalue=None, maxvalue=None):
         super(IntOption, self).__init__(name, doc, cmdline)
         self.default = default
+        self.minvalue = minvalue
+        self.maxvalue = maxvalue
 
     def validate(self, value):
         try:
-            int(value)
+            value = int(value)
         except TypeError:
             return False
+        if self.minvalue is not None and value < self.minvalue:
+            return False
+        if self.maxvalue is not None and value > self.maxvalue:
+            return False
         return True
 
     def setoption(self, config, value, who):
@@ -175,6 +175,17 @@ def test_to_optparse_number():
     py.test.raises(SystemExit,
         "(options, args) = parser.parse_args(args=['--int=foo', '-f bar'])")
     
+def test_int_option_range():
+    intoption = IntOption('int', 'Int option test', default=0,
+                          minvalue=0, maxvalue=64)
+    descr = OptionDescription('test', '', [intoption])
+    config = Config(descr)
+    config.int = 64
+    assert config.int == 64
+    py.test.raises(ConfigError, 'config.int = 65')
+    py.test.raises(ConfigError, 'config.int = -1')
+    assert config.int == 64
+
 def test_to_optparse_bool():
     booloption1 = BoolOption('bool1', 'Boolean option test', default=False,
                              cmdline='--bool1 -b')
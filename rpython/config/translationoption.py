@@ -97,6 +97,19 @@ translation_optiondescription = OptionDescription(
                  }),
     BoolOption("gcremovetypeptr", "Remove the typeptr from every object",
                default=IS_64_BITS, cmdline="--gcremovetypeptr"),
+    IntOption("gcmarkprefetch",
+              "incminimark: while marking, prefetch the headers of the next "
+              "N objects to visit (0 to disable; at most 64, rounded up "
+              "to a power of 2)",
+              default=0, cmdline="--gcmarkprefetch", minvalue=0, maxvalue=64),
+    BoolOption("gcbackgroundfree",
+               "incminimark: free the large blocks of memory from a helper "
+               "thread (posix only)",
+               default=False, cmdline="--gcbackgroundfree"),
+    BoolOption("gclargeobjectspace",
+               "incminimark: allocate the large objects in 2MB-aligned "
+               "chunks, which can use transparent huge pages (posix only)",
+               default=False, cmdline="--gclargeobjectspace"),
     ChoiceOption("gcrootfinder",
                  "Strategy for finding GC Roots (framework GCs only)",
                  ["n/a", "shadowstack", "asmgcc"],
@@ -628,6 +628,9 @@ def send_bridge_to_backend(jitdriver_sd, metainterp_sd, faildescr, inputargs,
     #if metainterp_sd.warmrunnerdesc is not None:    # for tests
     #    metainterp_sd.warmrunnerdesc.memory_manager.keep_loop_alive(
     #        original_loop_token)
+    if metainterp_sd.warmrunnerdesc is not None:    # for tests
+        memory_manager = metainterp_sd.warmrunnerdesc.memory_manager
+        memory_manager.update_loop_size(original_loop_token)
     return asminfo
 
 # ____________________________________________________________
@@ -49,6 +49,9 @@ class EmptyProfiler(BaseProfiler):
     def get_times(self, num):
         return 0.0
 
+    def get_max_pause(self):
+        return 0.0
+
 class Profiler(BaseProfiler):
     initialized = False
     timer = staticmethod(time.time)
@@ -59,11 +62,15 @@ class Profiler(BaseProfiler):
     calls = 0
     current = None
     cpu = None
+    pause_start = 0
+    max_pause = 0
 
     def start(self):
         self.starttime = self.timer()
         self.t1 = self.starttime
         self.times = [0, 0]
+        self.pause_start = self.starttime
+        self.max_pause = 0
         self.counters = [0] * (Counters.ncounters - _CPU_LINES)
         self.calls = 0
         self.current = []
@@ -77,6 +84,8 @@ class Profiler(BaseProfiler):
         self.t1 = self.timer()
         if self.current:
             self.times[self.current[-1]] += self.t1 - t0
+        else:
+            self.pause_start = self.t1
         self.counters[event] += 1
         self.current.append(event)
 
@@ -91,6 +100,12 @@ class Profiler(BaseProfiler):
             debug_print("BROKEN PROFILER DATA!")
             return
         self.times[ev1] += self.t1 - t0
+        if not self.current:
+            # the end of the outermost event: the interpreter or the
+            # compiled code was paused for that long
+            pause = self.t1 - self.pause_start
+            if pause > self.max_pause:
+                self.max_pause = pause
 
     def start_tracing(self):   self._start(Counters.TRACING)
     def end_tracing(self):     self._end  (Counters.TRACING)
@@ -115,6 +130,10 @@ class Profiler(BaseProfiler):
     def get_times(self, num):
         return self.times[num]
 
+    def get_max_pause(self):
+        """The longest time spent tracing and compiling at once."""
+        return self.max_pause
+
     def count_ops(self, opnum, kind=Counters.OPS):
         from rpython.jit.metainterp.resoperation import OpHelpers
         self.counters[kind] += 1
@@ -152,9 +171,14 @@ class Profiler(BaseProfiler):
         self._print_intline("abort: bad loop", cnt[Counters.ABORT_BAD_LOOP])
         self._print_intline("abort: force quasi-immut",
                             cnt[Counters.ABORT_FORCE_QUASIIMMUT])
+        self._print_intline("trace splits", cnt[Counters.TRACE_SPLITS])
         self._print_intline("nvirtuals", cnt[Counters.NVIRTUALS])
         self._print_intline("nvholes", cnt[Counters.NVHOLES])
         self._print_intline("nvreused", cnt[Counters.NVREUSED])
+        self._print_intline("resume data", cnt[Counters.RESUME_NUMBERINGS])
+        self._print_intline("resume bytes", cnt[Counters.RESUME_BYTES])
+        self._print_intline("resume bytes unshared",
+                            cnt[Counters.RESUME_BYTES_UNSHARED])
         self._print_intline("vecopt tried", cnt[Counters.OPT_VECTORIZE_TRY])
         self._print_intline("vecopt success", cnt[Counters.OPT_VECTORIZED])
         cpu = self.cpu
@@ -2,6 +2,7 @@ import math
 from rpython.rlib.rarithmetic import r_int64
 from rpython.rlib.debug import debug_start, debug_print, debug_stop
 from rpython.rlib.objectmodel import we_are_translated
+from rpython.rlib.listsort import make_timsort_class
 
 #
 # Logic to decide which loops are old and not used any more.
@@ -19,6 +20,36 @@ from rpython.rlib.objectmodel import we_are_translated
 # 'generation' field is much smaller than the current generation, and
 # removed from the set.
 #
+# Independently, if 'max_bytes' is set, the total size of the machine
+# code and raw data of the loops in 'alive_loops' (including their
+# bridges) is kept below 'max_bytes': whenever a new loop or bridge is
+# about to be made, the least recently used loops are removed from the
+# set until the total fits again.  "Least recently used" is again
+# measured by the 'generation' field.  The size of each loop is stored
+# in 'loop_sizes', and their total in 'code_bytes'; it is updated when
+# a loop is kept alive in a new generation and when a bridge is attached
+# to it.  A loop removed from the set is only freed when no other loop
+# jumps or calls to it any more, so 'evicted_bytes' can be more than what
+# was actually freed.
+#
+
+def get_loop_size(looptoken):
+    """Return the number of bytes of machine code and raw data used
+    by the loop and its bridges.  Only the backends that allocate them
+    with asmmemmgr report a non-zero size."""
+    clt = looptoken.compiled_loop_token
+    if clt is None or clt.asmmemmgr_blocks is None:
+        return 0
+    size = 0
+    for rawstart, rawstop in clt.asmmemmgr_blocks:
+        size += rawstop - rawstart
+    return size
+
+def _older(looptoken1, looptoken2):
+    return looptoken1.generation < looptoken2.generation
+
+LoopAgeSort = make_timsort_class(lt=_older)
+
 
 class MemoryManager(object):
 
@@ -38,6 +69,11 @@ class MemoryManager(object):
         self.current_generation = r_int64(1)
         self.next_check = r_int64(-1)
         self.alive_loops = {}
+        self.max_bytes = 0
+        self.loop_sizes = {}         # {looptoken in alive_loops: size}
+        self.code_bytes = 0          # sum of loop_sizes
+        self.evicted_loops = 0
+        self.evicted_bytes = 0
 
     def set_max_age(self, max_age, check_frequency=0):
         if max_age <= 0:
@@ -49,16 +85,43 @@ class MemoryManager(object):
             self.check_frequency = check_frequency
             self.next_check = self.current_generation + 1
 
+    def set_max_bytes(self, max_bytes):
+        if max_bytes < 0:
+            max_bytes = 0
+        self.max_bytes = max_bytes
+        # the sizes are not maintained while there is no limit
+        self.loop_sizes.clear()
+        self.code_bytes = 0
+        for looptoken in self.alive_loops.keys():
+            self.update_loop_size(looptoken)
+
     def next_generation(self):
         self.current_generation += 1
         if self.current_generation == self.next_check:
             self._kill_old_loops_now()
             self.next_check = self.current_generation + self.check_frequency
+        if self.max_bytes > 0:
+            self._evict_loops_over_budget()
 
     def keep_loop_alive(self, looptoken):
         if looptoken.generation != self.current_generation:
             looptoken.generation = self.current_generation
             self.alive_loops[looptoken] = None
+            self.update_loop_size(looptoken)
+
+    def update_loop_size(self, looptoken):
+        """Called when the loop is kept alive and when a bridge was
+        attached to it."""
+        if self.max_bytes > 0 and looptoken in self.alive_loops:
+            size = get_loop_size(looptoken)
+            self.code_bytes += size - self.loop_sizes.get(looptoken, 0)
+            self.loop_sizes[looptoken] = size
+
+    def _forget_loop(self, looptoken):
+        del self.alive_loops[looptoken]
+        if looptoken in self.loop_sizes:
+            self.code_bytes -= self.loop_sizes[looptoken]
+            del self.loop_sizes[looptoken]
 
     def _kill_old_loops_now(self):
         debug_start("jit-mem-collect")
@@ -70,7 +133,7 @@ class MemoryManager(object):
         for looptoken in self.alive_loops.keys():
             if (0 <= looptoken.generation < max_generation or
                 looptoken.invalidated):
-                del self.alive_loops[looptoken]
+                self._forget_loop(looptoken)
         newtotal = len(self.alive_loops)
         debug_print("Loop tokens freed: ", oldtotal - newtotal)
         debug_print("Loop tokens left:  ", newtotal)
@@ -81,3 +144,32 @@ class MemoryManager(object):
             # a single one is not enough for all tests :-(
             rgc.collect(); rgc.collect(); rgc.collect()
         debug_stop("jit-mem-collect")
+
+    def _evict_loops_over_budget(self):
+        if self.code_bytes <= self.max_bytes:
+            return
+        candidates = []
+        for looptoken in self.alive_loops.keys():
+            if 0 <= looptoken.generation < self.current_generation:
+                candidates.append(looptoken)
+        debug_start("jit-mem-evict")
+        debug_print("Current generation:", self.current_generation)
+        debug_print("Bytes before:      ", self.code_bytes)
+        LoopAgeSort(candidates).sort()
+        evicted = 0
+        i = 0
+        while self.code_bytes > self.max_bytes and i < len(candidates):
+            looptoken = candidates[i]
+            i += 1
+            self.evicted_bytes += self.loop_sizes.get(looptoken, 0)
+            self._forget_loop(looptoken)
+            evicted += 1
+        self.evicted_loops += evicted
+        debug_print("Loop tokens evicted:", evicted)
+        debug_print("Bytes left:        ", self.code_bytes)
+        if not we_are_translated():
+            looptoken = None
+            candidates = None
+            from rpython.rlib import rgc
+            rgc.collect(); rgc.collect(); rgc.collect()
+        debug_stop("jit-mem-evict")
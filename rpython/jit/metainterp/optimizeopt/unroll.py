@@ -248,6 +248,8 @@ class UnrollOptimizer(Optimization):
             deserialize_optimizer_knowledge(self.optimizer,
                                             resumestorage, frontend_inputargs,
                                             trace.inputargs)
+            self.optimizer.resumedata_memo.prefix_sharing.set_base(
+                resumestorage.rd_numb)
         info, ops = self.optimizer.propagate_all_forward(trace,
             call_pure_results, False)
         jump_op = info.jump_op
@@ -1267,6 +1267,15 @@ class MIFrame(object):
                                self.metainterp.call_ids[-1],
                                greenboxes)
 
+        if any_operation and not self.metainterp.portal_call_depth:
+            if self.metainterp.should_split_trace(greenboxes):
+                # resume at the jit_merge_point if a guard of the
+                # split fails, and blackhole from there if we abort
+                self.pc = orgpc
+                self.metainterp.compile_trace_split(greenboxes, redboxes)
+                assert False, "should always raise"
+            self.metainterp.last_merge_point_greenkey = greenboxes
+
         if self.metainterp.seen_loop_header_for_jdindex < 0:
             if not any_operation:
                 return
@@ -2037,6 +2046,7 @@ class MetaInterp(object):
 
         self.aborted_tracing_jitdriver = None
         self.aborted_tracing_greenkey = None
+        self.last_merge_point_greenkey = None
 
     def retrace_needed(self, trace, exported_state):
         self.partial_trace = trace
@@ -2403,6 +2413,19 @@ class MetaInterp(object):
                     jd_sd = self.jitdriver_sd
                     greenkey = self.current_merge_points[0][0][:jd_sd.num_green_args]
                     warmrunnerstate.JitCell.trace_next_iteration(greenkey)
+            elif self.last_merge_point_greenkey is not None:
+                # the function we are tracing is too long by itself.  The
+                # next trace stops at the last merge point we went through
+                # and continues with a CALL_ASSEMBLER, see
+                # compile_trace_split()
+                warmrunnerstate.split_trace_here(
+                    self.last_merge_point_greenkey)
+                if self.current_merge_points:
+                    jd_sd = self.jitdriver_sd
+                    greenkey = self.current_merge_points[0][0][:jd_sd.num_green_args]
+                    self.aborted_tracing_jitdriver = jd_sd
+                    self.aborted_tracing_greenkey = greenkey
+                    warmrunnerstate.JitCell.trace_next_iteration(greenkey)
             raise SwitchToBlackhole(Counters.ABORT_TOO_LONG)
 
     def _interpret(self):
@@ -2436,11 +2459,13 @@ class MetaInterp(object):
         self.staticdata._setup_once()
         self.staticdata.profiler.start_tracing()
         assert jitdriver_sd is self.jitdriver_sd
+        pausestart = jitdriver_sd.warmstate.start_pause()
         self.staticdata.try_to_free_some_loops()
         try:
             original_boxes = self.initialize_original_boxes(jitdriver_sd, *args)
             return self._compile_and_run_once(original_boxes)
         finally:
+            jitdriver_sd.warmstate.end_pause(pausestart)
             self.staticdata.profiler.end_tracing()
             debug_stop('jit-tracing')
 
@@ -2463,6 +2488,7 @@ class MetaInterp(object):
     def handle_guard_failure(self, resumedescr, deadframe):
         debug_start('jit-tracing')
         self.staticdata.profiler.start_tracing()
+        pausestart = self.jitdriver_sd.warmstate.start_pause()
         if isinstance(resumedescr, compile.ResumeGuardCopiedDescr):
             key = resumedescr.prev
         else:
@@ -2481,6 +2507,7 @@ class MetaInterp(object):
             self.run_blackhole_interp_to_cancel_tracing(stb)
         finally:
             self.resumekey_original_loop_token = None
+            self.jitdriver_sd.warmstate.end_pause(pausestart)
             self.staticdata.profiler.end_tracing()
             debug_stop('jit-tracing')
 
@@ -2762,6 +2789,59 @@ class MetaInterp(object):
             jitcell_token = target_token.targeting_jitcell_token
             self.raise_continue_running_normally(live_arg_boxes, jitcell_token)
 
+    def should_split_trace(self, greenkey):
+        if self.partial_trace:
+            return False
+        if not self.jitdriver_sd.warmstate.should_split_trace_here(greenkey):
+            return False
+        # better jump to a loop, or close one, if we can
+        if self.get_procedure_token(greenkey, True) is not None:
+            return False
+        num_green_args = self.jitdriver_sd.num_green_args
+        for original_boxes, start in self.current_merge_points:
+            for i in range(num_green_args):
+                if not original_boxes[i].same_constant(greenkey[i]):
+                    break
+            else:
+                return False
+        return True
+
+    def compile_trace_split(self, greenboxes, redboxes):
+        """End the trace at a merge point marked by split_trace_here().
+        The rest of the function runs in a CALL_ASSEMBLER to the code of
+        that merge point, which is a temporary callback to the interpreter
+        until the merge point is traced and compiled on its own.
+        """
+        jd_sd = self.jitdriver_sd
+        warmrunnerstate = jd_sd.warmstate
+        if jd_sd.virtualizable_info is not None:
+            # the callee reads the virtualizable from the heap
+            self.gen_store_back_in_vable(self.virtualizable_boxes[-1])
+        token = warmrunnerstate.get_assembler_token(greenboxes)
+        calldescr = jd_sd.mainjitcode.calldescr
+        opnum = OpHelpers.call_assembler_for_descr(calldescr)
+        resbox = self.history.record_nospec(opnum, redboxes, descr=token)
+        self.generate_guard(rop.GUARD_NOT_FORCED, None)
+        if jd_sd.index_of_virtualizable >= 0:
+            vablebox = redboxes[jd_sd.index_of_virtualizable]
+            self.history.record(rop.KEEPALIVE, [vablebox], None)
+        # if the callee raises, the guard fails and we resume at the
+        # jit_merge_point, from where the exception leaves the portal.
+        # The resume data must not write back into the virtualizable the
+        # values it had before the call.
+        if jd_sd.virtualizable_info is not None:
+            self.reload_virtualizable_after_call()
+        self.generate_guard(rop.GUARD_NO_EXCEPTION, None)
+        if resbox.type == 'v':
+            resbox = None
+        self.leave_portal_frame(jd_sd.index)
+        self.compile_done_with_this_frame(resbox)
+        self.staticdata.profiler.count(Counters.TRACE_SPLITS)
+        debug_print('~~~ SPLIT TRACE AT %s' %
+                    warmrunnerstate.get_location_str(greenboxes))
+        warmrunnerstate.JitCell.trace_next_iteration(greenboxes)
+        self.raise_continue_running_normally(greenboxes + redboxes, token)
+
     def compile_done_with_this_frame(self, exitbox):
         # temporarily put a JUMP to a pseudo-loop
         self.store_token_in_vable()
@@ -3067,6 +3147,55 @@ class MetaInterp(object):
             self.history.record(rop.SETFIELD_GC, [vbox, self.cpu.ts.CONST_NULL],
                                 None, descr=vinfo.vable_token_descr)
 
+    def reload_virtualizable_after_call(self):
+        # record reads of all the fields of the standard virtualizable,
+        # after a call that changed them.  The callee may have left them
+        # in its jitframe, so force the virtualizable first; the pending
+        # exception of the call is saved around that.
+        vinfo = self.jitdriver_sd.virtualizable_info
+        vbox = self.virtualizable_boxes[-1]
+        op1 = self.history.record(rop.SAVE_EXC_CLASS, [], 0)
+        op2 = self.history.record(rop.SAVE_EXCEPTION, [],
+                                  lltype.nullptr(llmemory.GCREF.TO))
+        tokenbox = self.execute_and_record(rop.GETFIELD_GC_R,
+                                           vinfo.vable_token_descr, vbox)
+        condbox = self.execute_and_record(rop.PTR_NE, None, tokenbox,
+                                          history.CONST_NULL)
+        funcbox = ConstInt(rffi.cast(lltype.Signed, vinfo.clear_vable_ptr))
+        self.execute_and_record_varargs(rop.COND_CALL,
+                                        [condbox, funcbox, vbox],
+                                        descr=vinfo.clear_vable_descr)
+        boxes = []
+        for i in range(vinfo.num_static_extra_boxes):
+            descr = vinfo.static_field_descrs[i]
+            if descr.is_pointer_field():
+                box = self.execute_and_record(rop.GETFIELD_GC_R, descr, vbox)
+            elif descr.is_float_field():
+                box = self.execute_and_record(rop.GETFIELD_GC_F, descr, vbox)
+            else:
+                box = self.execute_and_record(rop.GETFIELD_GC_I, descr, vbox)
+            boxes.append(box)
+        virtualizable = vinfo.unwrap_virtualizable_box(vbox)
+        for k in range(vinfo.num_arrays):
+            descr = vinfo.array_field_descrs[k]
+            abox = self.execute_and_record(rop.GETFIELD_GC_R, descr, vbox)
+            descr = vinfo.array_descrs[k]
+            for j in range(vinfo.get_array_length(virtualizable, k)):
+                indexbox = ConstInt(j)
+                if descr.is_array_of_pointers():
+                    box = self.execute_and_record(rop.GETARRAYITEM_GC_R,
+                                                  descr, abox, indexbox)
+                elif descr.is_array_of_floats():
+                    box = self.execute_and_record(rop.GETARRAYITEM_GC_F,
+                                                  descr, abox, indexbox)
+                else:
+                    box = self.execute_and_record(rop.GETARRAYITEM_GC_I,
+                                                  descr, abox, indexbox)
+                boxes.append(box)
+        boxes.append(vbox)
+        self.virtualizable_boxes = boxes
+        self.history.record(rop.RESTORE_EXCEPTION, [op1, op2], None)
+
     def replace_box(self, oldbox, newbox):
         for frame in self.framestack:
             frame.replace_active_box_in_frame(oldbox, newbox)
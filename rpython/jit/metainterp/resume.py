@@ -180,6 +180,7 @@ class ResumeDataLoopMemo(object):
         self.refs = self.cpu.ts.new_ref_dict_2()
         self.cached_boxes = {}
         self.cached_virtuals = {}
+        self.prefix_sharing = resumecode.PrefixSharing()
 
         self.nvirtuals = 0
         self.nvholes = 0
@@ -317,6 +318,11 @@ class ResumeDataLoopMemo(object):
         profiler.count(jitprof.Counters.NVIRTUALS, self.nvirtuals)
         profiler.count(jitprof.Counters.NVHOLES, self.nvholes)
         profiler.count(jitprof.Counters.NVREUSED, self.nvreused)
+        sharing = self.prefix_sharing
+        profiler.count(jitprof.Counters.RESUME_NUMBERINGS, sharing.numberings)
+        profiler.count(jitprof.Counters.RESUME_BYTES, sharing.total_bytes)
+        profiler.count(jitprof.Counters.RESUME_BYTES_UNSHARED,
+                       sharing.unshared_bytes)
 
 _frame_info_placeholder = (None, 0, 0)
 
@@ -465,7 +471,8 @@ class ResumeDataVirtualAdder(VirtualVisitor):
         numb_state.patch(1, len(liveboxes))
 
         self._add_optimizer_sections(numb_state, liveboxes, liveboxes_from_env)
-        storage.rd_numb = numb_state.create_numbering()
+        storage.rd_numb = numb_state.create_numbering(
+            self.memo.prefix_sharing)
         storage.rd_consts = self.memo.consts
         return liveboxes[:]
 
@@ -20,6 +20,18 @@
 
   # ----- optimization section
   <more code>                                      further sections according to bridgeopt.py
+
+The numberings of the guards of a loop or bridge are mostly identical
+after the first two items: the guards of the same inlined function
+share the virtualizable and all the parent frames.  So a numbering can
+take a run of its items from an earlier numbering, see PrefixSharing.
+It then starts with three extra items, not counted in the layout above:
+
+  <split> <start> <stop>
+
+and the items are the ones of its own code up to 'split' bytes after
+these three items, followed by the bytes 'start:stop' of numb.prev.code,
+followed by the rest of its own code.
 """
 
 from rpython.rtyper.lltypesystem import rffi, lltype
@@ -27,6 +39,7 @@ from rpython.rlib import objectmodel
 
 NUMBERINGP = lltype.Ptr(lltype.GcForwardReference())
 NUMBERING = lltype.GcStruct('Numbering',
+                            ('prev', NUMBERINGP),
                             ('code', lltype.Array(rffi.UCHAR)))
 NUMBERINGP.TO.become(NUMBERING)
 NULL_NUMBER = lltype.nullptr(NUMBERING)
@@ -73,13 +86,28 @@ def numb_next_n_items(numb, size, index):
     return index
 
 def unpack_numbering(numb):
+    reader = Reader(numb)
     l = []
-    i = 0
-    while i < len(numb.code):
-        next, i = numb_next_item(numb, i)
-        l.append(next)
+    while not reader.at_end():
+        l.append(reader.next_item())
     return l
 
+def _encode(items, final, offsets):
+    for item in items:
+        offsets.append(len(final))
+        append_numbering(final, item)
+    offsets.append(len(final))
+
+def _same_item(item1, item2):
+    return (rffi.cast(lltype.Signed, item1) ==
+            rffi.cast(lltype.Signed, item2))
+
+def _make_numbering(final):
+    numb = lltype.malloc(NUMBERING, len(final))
+    for i, elt in enumerate(final):
+        numb.code[i] = elt
+    return numb
+
 class Writer(object):
     def __init__(self, size=0):
         self.current = objectmodel.newlist_hint(size)
@@ -92,14 +120,13 @@ class Writer(object):
         assert rffi.cast(lltype.Signed, short) == item
         return self.append_short(short)
 
-    def create_numbering(self):
+    def create_numbering(self, sharing=None):
+        if sharing is not None:
+            return sharing.create_numbering(self.current)
         final = objectmodel.newlist_hint(len(self.current) * 3)
         for item in self.current:
             append_numbering(final, item)
-        numb = lltype.malloc(NUMBERING, len(final))
-        for i, elt in enumerate(final):
-            numb.code[i] = elt
-        return numb
+        return _make_numbering(final)
 
     def patch_current_size(self, index):
         self.patch(index, len(self.current))
@@ -114,29 +141,140 @@ def create_numbering(l):
     return w.create_numbering()
 
 
+
+class PrefixSharing(object):
+    """ Makes the numberings of one loop or bridge, in order.  A new
+    numbering takes the items that follow its first two ones from the
+    last numbering that was stored in full, as far as they are equal,
+    if that saves enough bytes.  A numbering equal to that one is not
+    stored again at all.
+    """
+    SKIP = 2            # the items specific to each guard
+    MIN_SHARED = 8      # bytes
+
+    def __init__(self):
+        self.base = NULL_NUMBER
+        self.base_items = None
+        self.base_offsets = None    # byte offset of each item in base.code
+        self.numberings = 0
+        self.total_bytes = 0
+        self.unshared_bytes = 0     # the total without any sharing
+
+    def set_base(self, numb):
+        """ Start from an existing numbering, e.g. the one of the guard
+        that a bridge starts from. """
+        if not numb or numb.prev:
+            return
+        items = [rffi.cast(rffi.SHORT, item)
+                 for item in unpack_numbering(numb)]
+        offsets = objectmodel.newlist_hint(len(items) + 1)
+        _encode(items, [], offsets)
+        self._set_base(numb, items, offsets)
+
+    def _set_base(self, numb, items, offsets):
+        self.base = numb
+        self.base_items = items
+        self.base_offsets = offsets
+
+    def create_numbering(self, items):
+        final = objectmodel.newlist_hint(len(items) * 3)
+        offsets = objectmodel.newlist_hint(len(items) + 1)
+        _encode(items, final, offsets)
+        self.numberings += 1
+        self.unshared_bytes += len(final)
+        numb = self._share_prefix(items, final, offsets)
+        if not numb:
+            numb = _make_numbering(final)
+            self.total_bytes += len(final)
+            self._set_base(numb, items, offsets)
+        return numb
+
+    def _share_prefix(self, items, final, offsets):
+        base_items = self.base_items
+        skip = self.SKIP
+        if base_items is None or len(base_items) <= skip or len(items) <= skip:
+            return NULL_NUMBER
+        limit = min(len(items), len(base_items))
+        i = skip
+        while i < limit and _same_item(items[i], base_items[i]):
+            i += 1
+        if (i == len(items) == len(base_items) and
+                _same_item(items[0], base_items[0]) and
+                _same_item(items[1], base_items[1])):
+            return self.base
+        start = self.base_offsets[skip]
+        stop = self.base_offsets[i]
+        shared = stop - start
+        # sharing must save at least half of the bytes, otherwise this
+        # numbering is the better base for the next ones
+        if shared < self.MIN_SHARED or shared * 2 < len(final):
+            return NULL_NUMBER
+        if stop >= 2**15 or offsets[skip] >= 2**15:
+            return NULL_NUMBER     # does not fit in an item
+        code = objectmodel.newlist_hint(len(final) - shared + 9)
+        append_numbering(code, offsets[skip])
+        append_numbering(code, start)
+        append_numbering(code, stop)
+        code.extend(final[:offsets[skip]])
+        code.extend(final[offsets[i]:])
+        numb = _make_numbering(code)
+        numb.prev = self.base
+        self.total_bytes += len(code)
+        return numb
+
+
 class Reader(object):
     def __init__(self, code):
-        self.code = code
+        self.numb = code
+        self.code = code     # the numbering that we are reading now
         self.cur_pos = 0 # index into the code
+        self.end = len(code.code)
         self.items_read = 0 # number of items read
+        self.split = -1
+        self.prev_start = 0
+        self.prev_stop = 0
+        if code.prev:
+            split, index = numb_next_item(code, 0)
+            self.prev_start, index = numb_next_item(code, index)
+            self.prev_stop, index = numb_next_item(code, index)
+            self.split = index + split
+            self.cur_pos = index
+            self.end = self.split
+
+    def _next_segment(self):
+        while self.cur_pos == self.end and self.split >= 0:
+            if self.code == self.numb:
+                self.code = self.numb.prev
+                self.cur_pos = self.prev_start
+                self.end = self.prev_stop
+            else:
+                self.code = self.numb
+                self.cur_pos = self.split
+                self.end = len(self.numb.code)
+                self.split = -1
+
+    def at_end(self):
+        self._next_segment()
+        return self.cur_pos >= self.end
 
     def next_item(self):
+        if self.cur_pos == self.end:
+            self._next_segment()
         result, self.cur_pos = numb_next_item(self.code, self.cur_pos)
         self.items_read += 1
         return result
 
     def peek(self):
+        if self.cur_pos == self.end:
+            self._next_segment()
         result, _ = numb_next_item(self.code, self.cur_pos)
         return result
 
     def jump(self, size):
         """ jump n items forward without returning anything """
-        index = self.cur_pos
         for i in range(size):
-            _, index = numb_next_item(self.code, index)
-        self.items_read += size
-        self.cur_pos = index
+            self.next_item()
 
     def unpack(self):
         # mainly for debugging
-        return unpack_numbering(self.code)
+        return unpack_numbering(self.numb)
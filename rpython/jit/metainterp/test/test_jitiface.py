@@ -1,10 +1,11 @@
 
 import py
 from rpython.rlib.jit import JitDriver, JitHookInterface, Counters, dont_look_inside
-from rpython.rlib import jit_hooks
+from rpython.rlib import jit, jit_hooks
 from rpython.jit.metainterp.test.support import LLJitMixin
 from rpython.jit.codewriter.policy import JitPolicy
 from rpython.jit.metainterp.resoperation import rop
+from rpython.jit.metainterp import pyjitpl
 from rpython.rtyper.annlowlevel import hlstr, cast_instance_to_gcref
 from rpython.jit.metainterp.jitprof import Profiler, EmptyProfiler
 from rpython.jit.codewriter.policy import JitPolicy
@@ -141,9 +142,35 @@ class JitHookInterfaceTests(object):
             assert jit_hooks.stats_get_counter_value(None,
                                                      Counters.TRACING) == 2
             assert jit_hooks.stats_get_times_value(None, Counters.TRACING) >= 0
+            assert jit_hooks.stats_get_max_pause(None) >= 0
+            assert jit_hooks.stats_memmgr_max_bytes(None) == 0
+            assert jit_hooks.stats_memmgr_code_bytes(None) == 0
+            assert jit_hooks.stats_memmgr_evicted_loops(None) == 0
 
         self.meta_interp(main, [], ProfilerClass=Profiler)
 
+    def test_get_stats_memmgr(self):
+        driver = JitDriver(greens = [], reds = ['i'])
+
+        def loop(i):
+            while i > 0:
+                driver.jit_merge_point(i=i)
+                i -= 1
+
+        def main():
+            jit.set_param(driver, 'jit_code_max_bytes', 1000000)
+            loop(30)
+            assert jit_hooks.stats_memmgr_max_bytes(None) == 1000000
+            # the llgraph backend does not allocate machine code
+            assert jit_hooks.stats_memmgr_code_bytes(None) == 0
+            assert jit_hooks.stats_memmgr_evicted_loops(None) == 0
+            assert jit_hooks.stats_memmgr_evicted_bytes(None) == 0
+
+        self.meta_interp(main, [])
+        memmgr = pyjitpl._warmrunnerdesc.memory_manager
+        assert memmgr.max_bytes == 1000000
+        assert len(memmgr.loop_sizes) == 1
+
     def test_get_stats_empty(self):
         driver = JitDriver(greens = [], reds = ['i'])
         def loop(i):
@@ -155,6 +182,7 @@ class JitHookInterfaceTests(object):
             assert jit_hooks.stats_get_counter_value(None,
                                            Counters.TOTAL_COMPILED_LOOPS) == 0
             assert jit_hooks.stats_get_times_value(None, Counters.TRACING) == 0
+            assert jit_hooks.stats_get_max_pause(None) == 0
         self.meta_interp(main, [], ProfilerClass=EmptyProfiler)
 
     def test_get_jitcell_at_key(self):
@@ -54,6 +54,7 @@ class TestProfile(ProfilerMixin):
             ]
         assert profiler.events == expected
         assert profiler.times == [2, 1]
+        assert profiler.get_max_pause() == 3
         py.test.skip("disabled until unrolling")
         assert profiler.counters == [1, 1, 3, 3, 2, 15, 2, 0, 0, 0, 0,
                                      0, 0, 0, 0, 0, 0, 0]
@@ -11,7 +11,7 @@ if len(sys.argv) >= 4 and sys.argv[1] == '--sub':
     rpython.conftest.option.__dict__.update(eval(sys.argv[3]))
 
 import py
-from rpython.jit.metainterp.memmgr import MemoryManager
+from rpython.jit.metainterp.memmgr import MemoryManager, get_loop_size
 from rpython.jit.metainterp.test.support import LLJitMixin
 from rpython.rlib.jit import JitDriver, dont_look_inside
 from rpython.jit.metainterp.warmspot import get_stats
@@ -21,6 +21,20 @@ from rpython.rlib import rgc
 class FakeLoopToken:
     generation = 0
     invalidated = False
+    compiled_loop_token = None
+
+class FakeCompiledLoopToken:
+    def __init__(self, *sizes):
+        self.asmmemmgr_blocks = []
+        start = 0
+        for size in sizes:
+            self.asmmemmgr_blocks.append((start, start + size))
+            start += size
+
+def sized_token(*sizes):
+    token = FakeLoopToken()
+    token.compiled_loop_token = FakeCompiledLoopToken(*sizes)
+    return token
 
 
 class _TestMemoryManager:
@@ -78,6 +92,88 @@ class _TestMemoryManager:
             else:
                 assert tokens[i] in memmgr.alive_loops
 
+    def test_loop_size(self):
+        assert get_loop_size(FakeLoopToken()) == 0
+        assert get_loop_size(sized_token()) == 0
+        assert get_loop_size(sized_token(100, 20, 3)) == 123
+
+    def test_max_bytes(self):
+        memmgr = MemoryManager()
+        memmgr.set_max_age(0)
+        memmgr.set_max_bytes(250)
+        tokens = [sized_token(100) for i in range(5)]
+        for token in tokens:
+            memmgr.keep_loop_alive(token)
+            memmgr.next_generation()
+        # the least recently used loops are freed first
+        assert set(memmgr.alive_loops) == set(tokens[3:])
+        assert memmgr.code_bytes == 200
+        assert memmgr.evicted_loops == 3
+        assert memmgr.evicted_bytes == 300
+
+    def test_max_bytes_lru(self):
+        memmgr = MemoryManager()
+        memmgr.set_max_age(0)
+        memmgr.set_max_bytes(300)
+        tokens = [sized_token(100) for i in range(4)]
+        for token in tokens:
+            memmgr.keep_loop_alive(token)
+            memmgr.keep_loop_alive(tokens[0])    # tokens[0] stays in use
+            memmgr.next_generation()
+        assert set(memmgr.alive_loops) == set([tokens[0], tokens[2],
+                                               tokens[3]])
+        # a bridge is attached to tokens[2]: the others are freed
+        tokens[2].compiled_loop_token.asmmemmgr_blocks.append((500, 650))
+        memmgr.keep_loop_alive(tokens[2])
+        assert memmgr.code_bytes == 450
+        memmgr.next_generation()
+        assert set(memmgr.alive_loops) == set([tokens[2]])
+        assert memmgr.code_bytes == 250
+        assert memmgr.evicted_loops == 3
+
+    def test_max_bytes_running_total(self):
+        from rpython.jit.metainterp import memmgr as memmgr_module
+        sizes_computed = []
+        def counting_get_loop_size(looptoken):
+            sizes_computed.append(looptoken)
+            return get_loop_size(looptoken)
+        memmgr_module.get_loop_size = counting_get_loop_size
+        try:
+            memmgr = MemoryManager()
+            memmgr.set_max_age(0)
+            memmgr.set_max_bytes(10000)
+            tokens = [sized_token(100) for i in range(10)]
+            for token in tokens:
+                memmgr.keep_loop_alive(token)
+            assert len(sizes_computed) == 10
+            # no size is computed again when starting to trace
+            for i in range(5):
+                memmgr.next_generation()
+            assert len(sizes_computed) == 10
+            assert memmgr.code_bytes == 1000
+            # only once when a loop is kept alive in a new generation
+            memmgr.keep_loop_alive(tokens[0])
+            memmgr.keep_loop_alive(tokens[0])
+            assert len(sizes_computed) == 11
+            assert memmgr.code_bytes == 1000
+        finally:
+            memmgr_module.get_loop_size = get_loop_size
+
+    def test_max_bytes_disabled(self):
+        memmgr = MemoryManager()
+        memmgr.set_max_age(0)
+        memmgr.set_max_bytes(0)
+        tokens = [sized_token(100) for i in range(5)]
+        for token in tokens:
+            memmgr.keep_loop_alive(token)
+            memmgr.next_generation()
+        assert set(memmgr.alive_loops) == set(tokens)
+        assert memmgr.evicted_loops == 0
+        memmgr.set_max_bytes(250)      # computes the sizes now
+        assert memmgr.code_bytes == 500
+        memmgr.next_generation()
+        assert set(memmgr.alive_loops) == set(tokens[3:])
+
 
 class _TestIntegration(LLJitMixin):
     # See comments in TestMemoryManager.  To get temporarily the normal
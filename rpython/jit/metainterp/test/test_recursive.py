@@ -396,6 +396,90 @@ class RecursiveTests:
         res = self.meta_interp(loop, [100], trace_limit=TRACE_LIMIT)
         assert res == 80
 
+    def test_trace_too_long_is_split(self):
+        driver = JitDriver(greens=['pc'], reds=['n', 'acc'],
+                           get_printable_location=lambda pc: str(pc))
+        def jump_back(pc, n, acc):
+            driver.can_enter_jit(pc=pc, n=n, acc=acc)
+        def step(pc, n, acc):
+            return acc + ((n ^ pc) & 7)
+        def portal(pc, n, acc):
+            while True:
+                driver.jit_merge_point(pc=pc, n=n, acc=acc)
+                if pc == 60:
+                    return acc
+                if pc < 0:
+                    jump_back(pc, n, acc)     # never: the code has no loop
+                acc = step(pc, n, acc)
+                pc += 1
+        def main(n):
+            res = 0
+            for i in range(n):
+                res += portal(0, i, 0)
+            return res
+        TRACE_LIMIT = 80
+        res = self.meta_interp(main, [40], trace_limit=TRACE_LIMIT)
+        assert res == main(40)
+        self.check_max_trace_length(TRACE_LIMIT)
+        # instead of giving up, 'portal' is compiled in pieces that are
+        # chained with CALL_ASSEMBLERs
+        pieces = 0
+        for loop in get_stats().get_all_loops():
+            opnames = [op.getopname() for op in loop.operations]
+            if 'call_assembler_i' in opnames:
+                assert opnames[-5:] == ['call_assembler_i', 'guard_not_forced',
+                                        'guard_no_exception',
+                                        'leave_portal_frame', 'finish']
+                pieces += 1
+        assert pieces >= 3
+
+    def test_trace_too_long_is_split_virtualizable(self):
+        class Frame(object):
+            _virtualizable_ = ['pc', 'acc']
+            def __init__(self, n):
+                self.pc = 0
+                self.acc = 0
+                self.n = n
+
+        driver = JitDriver(greens=['code'], reds=['frame'],
+                           virtualizables=['frame'],
+                           get_printable_location=lambda code: str(code))
+        def jump_back(code, frame):
+            driver.can_enter_jit(code=code, frame=frame)
+        def step(frame):
+            if frame.pc == 55 and frame.n % 3 == 0:
+                raise ValueError
+            frame.acc += (frame.n ^ frame.pc) & 7
+        def portal(code, frame):
+            while True:
+                driver.jit_merge_point(code=code, frame=frame)
+                if frame.pc == 60:
+                    return frame.acc
+                if frame.pc < 0:
+                    jump_back(code, frame)     # never: the code has no loop
+                step(frame)
+                frame.pc += 1
+                code = frame.pc
+        def main(n):
+            res = 0
+            for i in range(n):
+                frame = Frame(i)
+                try:
+                    res += portal(0, frame)
+                except ValueError:
+                    res += frame.pc * 1000
+            return res
+        TRACE_LIMIT = 120
+        res = self.meta_interp(main, [40], trace_limit=TRACE_LIMIT)
+        assert res == main(40)
+        self.check_max_trace_length(TRACE_LIMIT)
+        pieces = 0
+        for loop in get_stats().get_all_loops():
+            opnames = [op.getopname() for op in loop.operations]
+            if 'call_assembler_i' in opnames:
+                pieces += 1
+        assert pieces >= 2
+
     def test_max_failure_args(self):
         FAILARGS_LIMIT = 10
         jitdriver = JitDriver(greens = [], reds = ['i', 'n', 'o'])
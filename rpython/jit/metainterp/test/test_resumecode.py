@@ -1,5 +1,5 @@
 from rpython.jit.metainterp.resumecode import create_numbering,\
-    unpack_numbering, Reader, Writer
+    unpack_numbering, Reader, Writer, PrefixSharing
 from rpython.rtyper.lltypesystem import lltype
 
 from hypothesis import strategies, given, example
@@ -60,3 +60,64 @@ def test_patch(l):
         n = w.create_numbering()
         assert unpack_numbering(n)[1:] == l
         assert unpack_numbering(n)[0] == middle + 1
+
+def test_prefix_sharing():
+    sharing = PrefixSharing()
+    items1 = [50, 3] + range(100, 140)
+    items2 = [60, 4] + range(100, 130) + [-7, 8]
+    n1 = sharing.create_numbering(items1)
+    n2 = sharing.create_numbering(items2)
+    assert not n1.prev
+    assert n2.prev == n1
+    assert len(n2.code) < 20
+    assert unpack_numbering(n1) == items1
+    assert unpack_numbering(n2) == items2
+    r = Reader(n2)
+    assert r.next_item() == 60
+    r.jump(2)
+    assert r.items_read == 3
+    assert r.peek() == 101
+    r.jump(28)
+    assert r.next_item() == 129
+    assert r.next_item() == -7
+    assert r.items_read == 33
+    assert sharing.numberings == 2
+    assert sharing.total_bytes == len(n1.code) + len(n2.code)
+    assert sharing.unshared_bytes > sharing.total_bytes + 50
+
+def test_prefix_sharing_new_base():
+    sharing = PrefixSharing()
+    items1 = [50, 3] + range(100, 140)
+    items2 = [50, 3] + range(100, 105) + range(200, 240)
+    items3 = [50, 3] + range(100, 105) + range(200, 230)
+    n1 = sharing.create_numbering(items1)
+    n2 = sharing.create_numbering(items2)    # shares too little
+    n3 = sharing.create_numbering(items3)
+    assert not n2.prev
+    assert n3.prev == n2
+    for n, items in [(n1, items1), (n2, items2), (n3, items3)]:
+        assert unpack_numbering(n) == items
+    assert sharing.total_bytes < sharing.unshared_bytes
+
+@hypothesis_and_examples
+def test_prefix_sharing_roundtrip(l):
+    sharing = PrefixSharing()
+    numbs = []
+    for i in range(len(l)):
+        items = [i, len(l)] + l[:i] + [i] * i
+        numbs.append((sharing.create_numbering(items), items))
+    for n, items in numbs:
+        assert unpack_numbering(n) == items
+
+def test_prefix_sharing_same_and_set_base():
+    parent = create_numbering([50, 3] + range(100, 140))
+    sharing = PrefixSharing()
+    sharing.set_base(parent)
+    n1 = sharing.create_numbering([50, 3] + range(100, 140))
+    assert n1 == parent     # not stored again
+    n2 = sharing.create_numbering([51, 3] + range(100, 130))
+    assert n2.prev == parent
+    assert unpack_numbering(n2) == [51, 3] + range(100, 130)
+    sharing2 = PrefixSharing()
+    sharing2.set_base(n2)   # ignored, n2 is not stored in full
+    assert not sharing2.base
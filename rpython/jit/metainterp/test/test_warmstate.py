@@ -212,3 +212,55 @@ def test_make_jitdriver_callbacks_5():
     state.make_jitdriver_callbacks()
     res = state.can_never_inline(5, 42.5)
     assert res is True
+
+def test_pause_limit():
+    class FakeWarmRunnerDesc:
+        cpu = None
+        memory_manager = None
+        jitcounter = DeterministicJitCounter()
+    state = WarmEnterState(FakeWarmRunnerDesc(), None)
+    now = [100.0]
+    state.timer = lambda: now[0]
+    state.set_param_trace_limit(6000)
+    # off by default: no timing at all
+    assert state.pause_limit == 0
+    assert state.start_pause() == 0.0
+    state.end_pause(0.0)
+    assert state.trace_limit == 6000
+    #
+    state.set_param_pause_limit(50)
+    start = state.start_pause()
+    assert start == 100.0
+    now[0] = 100.04
+    state.end_pause(start)
+    assert state.trace_limit == 6000      # 40ms, below the limit
+    for expected in [3000, 1500, 750, 750]:
+        start = state.start_pause()
+        now[0] += 0.06
+        state.end_pause(start)
+        assert state.trace_limit == expected
+    #
+    # short pauses bring it back, doubling after 'pause_recovery' of them
+    def short_pauses(n):
+        for i in range(n):
+            start = state.start_pause()
+            now[0] += 0.01
+            state.end_pause(start)
+    short_pauses(state.pause_recovery - 1)
+    assert state.trace_limit == 750
+    # a long pause starts the count again
+    start = state.start_pause()
+    now[0] += 0.06
+    state.end_pause(start)
+    assert state.trace_limit == 750
+    short_pauses(state.pause_recovery - 1)
+    assert state.trace_limit == 750
+    short_pauses(1)
+    assert state.trace_limit == 1500
+    for expected in [3000, 6000, 6000]:
+        short_pauses(state.pause_recovery)
+        assert state.trace_limit == expected
+    assert state.short_pauses == 0
+    # setting the trace_limit again starts from the new value
+    state.set_param_trace_limit(800)
+    assert state.trace_limit == 800
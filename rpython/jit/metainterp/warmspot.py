@@ -92,7 +92,7 @@ def jittify_and_run(interp, graph, args, repeat=1, graph_and_interp_only=False,
                     disable_unrolling=sys.maxint,
                     enable_opts=ALL_OPTS_NAMES, max_retrace_guards=15,
                     max_unroll_recursion=7, vec=0, vec_all=0, vec_cost=0,
-                    **kwds):
+                    jit_code_max_bytes=0, pause_limit=0, **kwds):
     from rpython.config.config import ConfigError
     translator = interp.typer.annotator.translator
     try:
@@ -109,8 +109,10 @@ def jittify_and_run(interp, graph, args, repeat=1, graph_and_interp_only=False,
         jd.warmstate.set_param_function_threshold(function_threshold)
         jd.warmstate.set_param_trace_eagerness(2)    # for tests
         jd.warmstate.set_param_trace_limit(trace_limit)
+        jd.warmstate.set_param_pause_limit(pause_limit)
         jd.warmstate.set_param_inlining(inline)
         jd.warmstate.set_param_loop_longevity(loop_longevity)
+        jd.warmstate.set_param_jit_code_max_bytes(jit_code_max_bytes)
         jd.warmstate.set_param_retrace_limit(retrace_limit)
         jd.warmstate.set_param_max_retrace_guards(max_retrace_guards)
         jd.warmstate.set_param_enable_opts(enable_opts)
@@ -209,6 +211,8 @@ def reset_jit():
     """Helper for some tests (see micronumpy/test/test_zjit.py)"""
     reset_stats()
     pyjitpl._warmrunnerdesc.memory_manager.alive_loops.clear()
+    pyjitpl._warmrunnerdesc.memory_manager.loop_sizes.clear()
+    pyjitpl._warmrunnerdesc.memory_manager.code_bytes = 0
     pyjitpl._warmrunnerdesc.jitcounter._clear_all()
 
 def get_translator():
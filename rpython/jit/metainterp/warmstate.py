@@ -1,4 +1,5 @@
 import sys
+import time
 import weakref
 
 from rpython.jit.codewriter import support, heaptracker, longlong
@@ -138,6 +139,7 @@ JC_TRACING         = 0x01
 JC_DONT_TRACE_HERE = 0x02
 JC_TEMPORARY       = 0x04
 JC_TRACING_OCCURRED= 0x08
+JC_SPLIT_TRACE_HERE= 0x10
 
 class BaseJitCell(object):
     """Subclasses of BaseJitCell are used in tandem with the single
@@ -184,6 +186,11 @@ class BaseJitCell(object):
         this particular function.  (We only set this flag when aborting
         due to a trace too long, so we use the same flag as a hint to
         also mean "please trace from here as soon as possible".)
+
+        JC_SPLIT_TRACE_HERE: a trace of the function containing this
+        greenkey got too long without inlining any other function.
+        When tracing reaches this greenkey again, end the trace here
+        with a CALL_ASSEMBLER that runs the rest of the function.
     """
     flags = 0     # JC_xxx flags
     wref_procedure_token = None
@@ -215,8 +222,8 @@ class BaseJitCell(object):
             return False    # don't remove JitCells with a procedure_token
         if self.flags & JC_TRACING:
             return False    # don't remove JitCells that are being traced
-        if self.flags & JC_DONT_TRACE_HERE:
-            # if we have this flag, and we *had* a procedure_token but
+        if self.flags & (JC_DONT_TRACE_HERE | JC_SPLIT_TRACE_HERE):
+            # if we have one of these flags, and we *had* a procedure_token but
             # we no longer have one, then remove me.  this prevents this
             # JitCell from being immortal.
             return self.has_seen_a_procedure_token()     # i.e. dead weakref
@@ -226,6 +233,10 @@ class BaseJitCell(object):
 
 
 class WarmEnterState(object):
+    timer = staticmethod(time.time)
+    # after a 'trace_limit' was halved by 'pause_limit', the number of
+    # pauses in a row below 'pause_limit' that double it again
+    pause_recovery = 16
 
     def __init__(self, warmrunnerdesc, jitdriver_sd):
         "NOT_RPYTHON"
@@ -258,6 +269,51 @@ class WarmEnterState(object):
 
     def set_param_trace_limit(self, value):
         self.trace_limit = value
+        self.configured_trace_limit = value
+        self.short_pauses = 0
+
+    def set_param_pause_limit(self, value):
+        self.pause_limit = value
+
+    def start_pause(self):
+        """Called before tracing a loop or a bridge.  Returns the time,
+        to be passed to end_pause(), or 0.0 if 'pause_limit' is off."""
+        if self.pause_limit <= 0:
+            return 0.0
+        return self.timer()
+
+    def end_pause(self, starttime):
+        """Called after tracing and compiling a loop or a bridge.  If
+        that paused the program for longer than 'pause_limit'
+        milliseconds, halve the 'trace_limit' so that the following
+        traces, and so the following pauses, are shorter.  It does not
+        go below 1/8 of the configured 'trace_limit'.  After
+        'pause_recovery' pauses in a row below 'pause_limit', double it
+        again, up to the configured value."""
+        if self.pause_limit <= 0:
+            return
+        pause = self.timer() - starttime
+        if pause * 1000.0 <= self.pause_limit:
+            if self.trace_limit < self.configured_trace_limit:
+                self.short_pauses += 1
+                if self.short_pauses >= self.pause_recovery:
+                    self.short_pauses = 0
+                    self._set_trace_limit_after_pause(pause,
+                        min(self.trace_limit * 2,
+                            self.configured_trace_limit))
+            return
+        self.short_pauses = 0
+        new_limit = max(self.trace_limit // 2,
+                        self.configured_trace_limit // 8)
+        if new_limit < self.trace_limit:
+            self._set_trace_limit_after_pause(pause, new_limit)
+
+    def _set_trace_limit_after_pause(self, pause, new_limit):
+        debug_start("jit-pause-limit")
+        debug_print("pause of", int(pause * 1000.0), "ms, trace_limit",
+                    self.trace_limit, "->", new_limit)
+        debug_stop("jit-pause-limit")
+        self.trace_limit = new_limit
 
     def set_param_decay(self, decay):
         self.warmrunnerdesc.jitcounter.set_decay(decay)
@@ -289,6 +345,12 @@ class WarmEnterState(object):
             self.warmrunnerdesc.memory_manager is not None):   # all for tests
             self.warmrunnerdesc.memory_manager.set_max_age(value)
 
+    def set_param_jit_code_max_bytes(self, value):
+        # note: it's a global parameter, not a per-jitdriver one
+        if (self.warmrunnerdesc is not None and
+            self.warmrunnerdesc.memory_manager is not None):   # all for tests
+            self.warmrunnerdesc.memory_manager.set_max_bytes(value)
+
     def set_param_retrace_limit(self, value):
         if self.warmrunnerdesc:
             if self.warmrunnerdesc.memory_manager:
@@ -326,6 +388,18 @@ class WarmEnterState(object):
         debug_print("disabled inlining", loc)
         debug_stop("jit-disableinlining")
 
+    def split_trace_here(self, greenkey):
+        cell = self.JitCell.ensure_jit_cell_at_key(greenkey)
+        cell.flags |= JC_SPLIT_TRACE_HERE
+        debug_start("jit-splittrace")
+        loc = self.get_location_str(greenkey)
+        debug_print("split traces at", loc)
+        debug_stop("jit-splittrace")
+
+    def should_split_trace_here(self, greenkey):
+        cell = self.JitCell.get_jit_cell_at_key(greenkey)
+        return cell is not None and (cell.flags & JC_SPLIT_TRACE_HERE) != 0
+
     def attach_procedure_to_interp(self, greenkey, procedure_token):
         cell = self.JitCell.ensure_jit_cell_at_key(greenkey)
         old_token = cell.get_procedure_token()
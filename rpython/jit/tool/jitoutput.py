@@ -24,9 +24,13 @@ REGEXES = [
     (('abort.vable_escape',), '^abort: vable escape:\s+(\d+)$'),
     (('abort.bad_loop',), '^abort: bad loop:\s+(\d+)$'),
     (('abort.force_quasiimmut',), '^abort: force quasi-immut:\s+(\d+)$'),
+    (('trace_splits',), '^trace splits:\s+(\d+)$'),
     (('nvirtuals',), '^nvirtuals:\s+(\d+)$'),
     (('nvholes',), '^nvholes:\s+(\d+)$'),
     (('nvreused',), '^nvreused:\s+(\d+)$'),
+    (('resume_data',), '^resume data:\s+(\d+)$'),
+    (('resume_bytes',), '^resume bytes:\s+(\d+)$'),
+    (('resume_bytes_unshared',), '^resume bytes unshared:\s+(\d+)$'),
     (('vecopt_tried',), '^vecopt tried:\s+(\d+)$'),
     (('vecopt_success',), '^vecopt success:\s+(\d+)$'),
     (('total_compiled_loops',),   '^Total # of loops:\s+(\d+)$'),
@@ -57,9 +61,13 @@ class OutputInfo(object):
     opt_ops = 0
     opt_guards = 0
     forcings = 0
+    trace_splits = 0
     nvirtuals = 0
     nvholes = 0
     nvreused = 0
+    resume_data = 0
+    resume_bytes = 0
+    resume_bytes_unshared = 0
     vecopt_tried = 0
     vecopt_success = 0
 
@@ -59,9 +59,13 @@ abort: compiling:       11
 abort: vable escape:    12
 abort: bad loop:        135
 abort: force quasi-immut: 3
+trace splits:           7
 nvirtuals:              13
 nvholes:                14
 nvreused:               15
+resume data:            16
+resume bytes:           500
+resume bytes unshared:  1200
 vecopt tried:           12
 vecopt success:         4
 Total # of loops:       100
@@ -88,8 +92,12 @@ def test_parse():
     assert info.abort.vable_escape == 12
     assert info.abort.bad_loop == 135
     assert info.abort.force_quasiimmut == 3
+    assert info.trace_splits == 7
     assert info.nvirtuals == 13
     assert info.nvholes == 14
     assert info.nvreused == 15
+    assert info.resume_data == 16
+    assert info.resume_bytes == 500
+    assert info.resume_bytes_unshared == 1200
     assert info.vecopt_tried == 12
     assert info.vecopt_success == 4
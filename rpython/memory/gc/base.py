@@ -25,7 +25,7 @@ class GCBase(object):
     _totalroots_rpy = 0   # for inspector.py
 
     def __init__(self, config, chunk_size=DEFAULT_CHUNK_SIZE,
-                 translated_to_c=True):
+                 translated_to_c=True, hooks=None):
         self.gcheaderbuilder = GCHeaderBuilder(self.HDR)
         self.AddressStack = get_address_stack(chunk_size)
         self.AddressDeque = get_address_deque(chunk_size)
@@ -34,6 +34,10 @@ class GCBase(object):
         self.config = config
         assert isinstance(translated_to_c, bool)
         self.translated_to_c = translated_to_c
+        if hooks is None:
+            from rpython.memory.gc.hook import GcHooks
+            hooks = GcHooks()    # the default hooks are all disabled
+        self.hooks = hooks
 
     def setup(self):
         # all runtime mutable values' setup should happen here
@@ -200,6 +204,18 @@ class GCBase(object):
     def set_max_heap_size(self, size):
         raise NotImplementedError
 
+    def get_stats(self, stats_no):
+        # see rgc.get_stats().  GCs that don't track a value return 0
+        return 0
+
+    def set_gc_param(self, param_no, value):
+        # see rgc.set_gc_param()
+        return False
+
+    def get_gc_param(self, param_no):
+        # see rgc.get_gc_param()
+        return -1.0
+
     def trace(self, obj, callback, arg):
         """Enumerate the locations inside the given obj that can contain
         GC pointers.  For each such location, callback(pointer, arg) is
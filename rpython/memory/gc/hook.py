@@ -0,0 +1,110 @@
+from rpython.rlib import rgc
+
+# WARNING: at the moment of writing, gc hooks are implemented only for
+# incminimark.  Please add calls to hooks to the other GCs if you need it.
+class GcHooks(object):
+    """
+    Base class to write your own GC hooks.
+
+    Subclasses are expected to override the on_* methods.  Note that such
+    methods can do only simple stuff such as updating statistics and/or
+    setting a flag: in particular, they cannot do anything which can
+    possibly trigger a GC collection.  Typically, they record the event
+    and ask the interpreter to do the real work later, e.g. with an
+    AsyncAction in PyPy.
+
+    The durations are expressed in ticks, as returned by
+    rpython.rlib.rtimer.read_timestamp().
+    """
+
+    def is_gc_minor_enabled(self):
+        return False
+
+    def is_gc_collect_step_enabled(self):
+        return False
+
+    def is_gc_collect_enabled(self):
+        return False
+
+    def is_gc_alloc_sample_enabled(self):
+        return False
+
+    def on_gc_minor(self, duration, total_memory_used, pinned_objects,
+                    surviving_size):
+        """
+        Called after a minor collection.  'surviving_size' is the
+        number of bytes of the objects that were moved out of the nursery.
+        """
+
+    def on_gc_collect_step(self, duration, oldstate, newstate):
+        """
+        Called after each individual step of a major collection, in case
+        the GC is incremental.
+
+        'oldstate' and 'newstate' are integers which indicate the GC
+        state; for incminimark, see incminimark.STATE_* and
+        incminimark.GC_STATES.
+        """
+
+    def on_gc_collect(self, num_major_collects,
+                      arenas_count_before, arenas_count_after,
+                      arenas_bytes, rawmalloc_bytes_before,
+                      rawmalloc_bytes_after):
+        """
+        Called after a major collection is fully done.
+        """
+
+    def on_gc_alloc_sample(self, size, weight):
+        """
+        Called when allocation sampling is enabled (see
+        rgc.PARAM_ALLOC_SAMPLE_INTERVAL) and an object is picked as a
+        sample, from inside the malloc: the stack of the caller is the
+        stack of the allocation.  'size' is the size of the object and
+        'weight' is the number of allocated bytes which this sample
+        stands for.  The type of the object is not known yet at this
+        point (the header is not written); it is passed later to
+        on_gc_alloc_sample_type().
+        """
+
+    def on_gc_alloc_sample_type(self, type_index):
+        """
+        Called with the type of the object of the previous call to
+        on_gc_alloc_sample(), at the latest at the next minor collection.
+        'type_index' is the same as returned by rgc.get_rpy_type_index().
+        """
+
+    # the fire_* methods are meant to be called from the GC and should
+    # NOT be overridden
+
+    @rgc.no_collect
+    def fire_gc_minor(self, duration, total_memory_used, pinned_objects,
+                      surviving_size):
+        if self.is_gc_minor_enabled():
+            self.on_gc_minor(duration, total_memory_used, pinned_objects,
+                             surviving_size)
+
+    @rgc.no_collect
+    def fire_gc_collect_step(self, duration, oldstate, newstate):
+        if self.is_gc_collect_step_enabled():
+            self.on_gc_collect_step(duration, oldstate, newstate)
+
+    @rgc.no_collect
+    def fire_gc_collect(self, num_major_collects,
+                        arenas_count_before, arenas_count_after,
+                        arenas_bytes, rawmalloc_bytes_before,
+                        rawmalloc_bytes_after):
+        if self.is_gc_collect_enabled():
+            self.on_gc_collect(num_major_collects,
+                               arenas_count_before, arenas_count_after,
+                               arenas_bytes, rawmalloc_bytes_before,
+                               rawmalloc_bytes_after)
+
+    @rgc.no_collect
+    def fire_gc_alloc_sample(self, size, weight):
+        if self.is_gc_alloc_sample_enabled():
+            self.on_gc_alloc_sample(size, weight)
+
+    @rgc.no_collect
+    def fire_gc_alloc_sample_type(self, type_index):
+        if self.is_gc_alloc_sample_enabled():
+            self.on_gc_alloc_sample_type(type_index)
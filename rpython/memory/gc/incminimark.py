@@ -69,7 +69,9 @@ from rpython.memory.gc.base import GCBase, MovingGCBase
 from rpython.memory.gc import env
 from rpython.memory.support import mangle_hash
 from rpython.rlib.rarithmetic import ovfcheck, LONG_BIT, intmask, r_uint
-from rpython.rlib.rarithmetic import LONG_BIT_SHIFT
+from rpython.rlib.rarithmetic import LONG_BIT_SHIFT, r_longlong
+from rpython.rlib.rtimer import read_timestamp
+from rpython.rlib import rgc
 from rpython.rlib.debug import ll_assert, debug_print, debug_start, debug_stop
 from rpython.rlib.objectmodel import specialize
 from rpython.memory.gc.minimarkpage import out_of_memory
@@ -291,12 +293,42 @@ class IncrementalMiniMarkGC(MovingGCBase):
         self.small_request_threshold = small_request_threshold
         self.major_collection_threshold = major_collection_threshold
         self.growth_rate_max = growth_rate_max
+        #
+        # the size of the FIFO of _visit_all_objects_step_prefetch(),
+        # rounded up to a power of two; 0 if disabled
+        depth = 0
+        if config is not None:      # None in some tests
+            depth = config.gcmarkprefetch
+        self.mark_prefetch_depth = 0
+        if depth > 0:
+            self.mark_prefetch_depth = 1
+            while self.mark_prefetch_depth < depth:
+                self.mark_prefetch_depth *= 2
+        self.mark_prefetch_fifo = lltype.nullptr(self._ADDRARRAY)
+        #
+        # if True, free the large rawmalloced objects and the empty arenas
+        # with llarena.arena_free_background()
+        self.background_free = False
+        if config is not None:
+            self.background_free = config.gcbackgroundfree
+        #
+        # if True, the large objects are allocated in the LargeObjectSpace
+        # 'self.los' instead of with llarena.arena_malloc()
+        self.use_large_object_space = False
+        if config is not None and os.name == 'posix':
+            self.use_large_object_space = config.gclargeobjectspace
         self.num_major_collects = 0
+        self.num_minor_collects = 0
+        self.total_gc_time = r_longlong(0)   # in ticks, see rtimer
+        self.stat_ac_arenas_count = 0
+        self.stat_rawmalloced_total_size = r_uint(0)
         self.min_heap_size = 0.0
         self.max_heap_size = 0.0
         self.max_heap_size_already_raised = False
         self.max_delta = float(r_uint(-1))
         self.max_number_of_pinned_objects = 0      # computed later
+        self.max_pinned_from_env = False
+        self.pending_nursery_size = 0   # see set_gc_param(PARAM_NURSERY_SIZE)
         #
         self.card_page_indices = card_page_indices
         if self.card_page_indices > 0:
@@ -312,6 +344,18 @@ class IncrementalMiniMarkGC(MovingGCBase):
         self.nursery_free = llmemory.NULL
         self.nursery_top  = llmemory.NULL
         self.debug_tiny_nursery = -1
+        #
+        # Allocation sampling, see set_gc_param(PARAM_ALLOC_SAMPLE_INTERVAL).
+        # When it is on, 'nursery_top' is lowered to the next sample point
+        # and the real end of the current nursery area is 'nursery_real_top'
+        # (NULL if 'nursery_top' is not lowered).  'alloc_sample_left' is
+        # the number of bytes that can still be allocated from
+        # 'alloc_sample_base' before we reach the next sample point.
+        self.alloc_sample_interval = 0
+        self.alloc_sample_left = 0
+        self.alloc_sample_base = llmemory.NULL
+        self.alloc_sample_pending = llmemory.NULL
+        self.nursery_real_top = llmemory.NULL
         self.debug_rotating_nurseries = lltype.nullptr(NURSARRAY)
         self.extra_threshold = 0
         #
@@ -321,6 +365,14 @@ class IncrementalMiniMarkGC(MovingGCBase):
             ArenaCollectionClass = minimarkpage.ArenaCollection
         self.ac = ArenaCollectionClass(arena_size, page_size,
                                        small_request_threshold)
+        self.ac.background_free = self.background_free
+        #
+        # The LargeObjectSpace(), used if 'use_large_object_space'.
+        from rpython.memory.gc import largeobjspace
+        self.los = largeobjspace.LargeObjectSpace(
+            largeobjspace.CHUNK_SIZE, largeobjspace.UNIT_SIZE,
+            self.LARGE_OBJECT_SPACE_MIN_SIZE)
+        self.los.hugepages = True
         #
         # Used by minor collection: a list of (mostly non-young) objects that
         # (may) contain a pointer to a young object.  Populated by
@@ -383,6 +435,10 @@ class IncrementalMiniMarkGC(MovingGCBase):
         p = lltype.malloc(self._ADDRARRAY, 1, flavor='raw',
                           track_allocation=False)
         self.singleaddr = llmemory.cast_ptr_to_adr(p)
+        if self.mark_prefetch_depth > 0:
+            self.mark_prefetch_fifo = lltype.malloc(
+                self._ADDRARRAY, self.mark_prefetch_depth, flavor='raw',
+                track_allocation=False)
         #
         # Two lists of all objects with destructors.
         self.young_objects_with_destructors = self.AddressStack()
@@ -489,6 +545,15 @@ class IncrementalMiniMarkGC(MovingGCBase):
                 self.gc_nursery_debug = True
             else:
                 self.gc_nursery_debug = False
+            #
+            release_pages = os.environ.get('PYPY_GC_RELEASE_PAGES')
+            if release_pages == 'yes':
+                self.ac.release_free_pages = 4     # MADV_FREE
+            elif release_pages == 'now':
+                self.ac.release_free_pages = 5     # MADV_DONTNEED
+            #
+            if os.environ.get('PYPY_GC_HUGE_PAGES') == 'no':
+                self.los.hugepages = False
             self._minor_collection()    # to empty the nursery
             llarena.arena_free(self.nursery)
             self.nursery_size = newsize
@@ -503,10 +568,14 @@ class IncrementalMiniMarkGC(MovingGCBase):
             #
             if env_max_number_of_pinned_objects >= 0: # 0 allows to disable pinning completely
                 self.max_number_of_pinned_objects = env_max_number_of_pinned_objects
-        else:
-            # Estimate this number conservatively
-            bigobj = self.nonlarge_max + 1
-            self.max_number_of_pinned_objects = self.nursery_size / (bigobj * 2)
+                self.max_pinned_from_env = True
+        if not self.max_pinned_from_env:
+            self._estimate_max_number_of_pinned_objects()
+
+    def _estimate_max_number_of_pinned_objects(self):
+        # Estimate this number conservatively
+        bigobj = self.nonlarge_max + 1
+        self.max_number_of_pinned_objects = self.nursery_size / (bigobj * 2)
 
     def _nursery_memory_size(self):
         extra = self.nonlarge_max + 1
@@ -529,7 +598,7 @@ class IncrementalMiniMarkGC(MovingGCBase):
         # the current position in the nursery:
         self.nursery_free = self.nursery
         # the end of the nursery:
-        self.nursery_top = self.nursery + self.nursery_size
+        self._set_nursery_top(self.nursery + self.nursery_size)
         # initialize the threshold
         self.min_heap_size = max(self.min_heap_size, self.nursery_size *
                                               self.major_collection_threshold)
@@ -602,7 +671,7 @@ class IncrementalMiniMarkGC(MovingGCBase):
             #
             llarena.arena_protect(newnurs, self._nursery_memory_size(), False)
             self.nursery = newnurs
-            self.nursery_top = self.nursery + self.nursery_size
+            self._set_nursery_top(self.nursery + self.nursery_size)
             debug_print("switching from nursery", oldnurs,
                         "to nursery", self.nursery,
                         "size", self.nursery_size)
@@ -795,7 +864,78 @@ class IncrementalMiniMarkGC(MovingGCBase):
         jump over the pinned object and try again to reserve totalsize.
         Otherwise do a minor collection, and possibly some steps of a
         major collection, and finally reserve totalsize bytes.
+        If allocation sampling is on, we may also come here because
+        nursery_top was lowered to the next sample point.
         """
+        if self.alloc_sample_interval > 0:
+            return self._collect_and_reserve_sampling(totalsize)
+        result = self._collect_and_reserve(totalsize)
+        if self.alloc_sample_interval > 0:
+            # a hook turned allocation sampling on during the collection
+            self._alloc_sample_lower()
+        return result
+    collect_and_reserve._dont_inline_ = True
+
+    def _collect_and_reserve_sampling(self, totalsize):
+        # 'nursery_free' was already increased by 'totalsize'
+        result = self.nursery_free - totalsize
+        self._alloc_sample_report_type()
+        self._alloc_sample_unlower(result)
+        if self.nursery_free > self.nursery_top:
+            result = self._collect_and_reserve(totalsize)
+            if self.alloc_sample_interval <= 0:
+                return result     # a hook turned allocation sampling off
+        # else: we only stopped at the sample point, and the object
+        # fits in the current nursery area
+        rawtotalsize = raw_malloc_usage(totalsize)
+        if rawtotalsize > self.alloc_sample_left:
+            # the sample point is inside this object.  Its weight is the
+            # number of sampling intervals that it covers
+            weight = 0
+            while rawtotalsize > self.alloc_sample_left:
+                self.alloc_sample_left += self.alloc_sample_interval
+                weight += self.alloc_sample_interval
+            self.alloc_sample_pending = result
+            self.hooks.fire_gc_alloc_sample(rawtotalsize, weight)
+        self.alloc_sample_left -= rawtotalsize
+        self._alloc_sample_lower()
+        return result
+
+    def _set_nursery_top(self, top):
+        # every change of the real end of the current nursery area goes
+        # through here; a 'nursery_real_top' saved by allocation sampling
+        # is stale afterwards.  The caller lowers 'nursery_top' again.
+        self.nursery_top = top
+        self.nursery_real_top = llmemory.NULL
+
+    def _alloc_sample_lower(self):
+        # lower 'nursery_top' to the next sample point if it is in the
+        # current nursery area
+        self._alloc_sample_unlower(self.nursery_free)
+        self.alloc_sample_base = self.nursery_free
+        self.nursery_real_top = self.nursery_top
+        if self.alloc_sample_left < self.nursery_top - self.nursery_free:
+            self.nursery_top = self.nursery_free + self.alloc_sample_left
+
+    def _alloc_sample_unlower(self, free):
+        # count the bytes allocated until 'free' and restore the real
+        # 'nursery_top'
+        if self.nursery_real_top:
+            self.alloc_sample_left -= free - self.alloc_sample_base
+            self.nursery_top = self.nursery_real_top
+            self.nursery_real_top = llmemory.NULL
+
+    def _alloc_sample_report_type(self):
+        # the header of the last sampled object is written by now
+        if self.alloc_sample_pending:
+            size_gc_header = self.gcheaderbuilder.size_gc_header
+            typeid = self.get_type_id(self.alloc_sample_pending +
+                                      size_gc_header)
+            self.alloc_sample_pending = llmemory.NULL
+            self.hooks.fire_gc_alloc_sample_type(
+                self.get_member_index(typeid))
+
+    def _collect_and_reserve(self, totalsize):
 
         minor_collection_count = 0
         while True:
@@ -834,7 +974,7 @@ class IncrementalMiniMarkGC(MovingGCBase):
                 #
                 # update used nursery space to allocate objects
                 self.nursery_free = self.nursery_top + pinned_obj_size
-                self.nursery_top = self.nursery_barriers.popleft()
+                self._set_nursery_top(self.nursery_barriers.popleft())
             else:
                 minor_collection_count += 1
                 if minor_collection_count == 1:
@@ -858,6 +998,9 @@ class IncrementalMiniMarkGC(MovingGCBase):
                               "Calling minor_collection() twice is not "
                               "enough. Too many pinned objects?")
                     self._minor_collection()
+                # the minor collection lowered 'nursery_top' again if
+                # allocation sampling is on; work with the real one here
+                self._alloc_sample_unlower(self.nursery_free)
             #
             # Tried to do something about nursery_free overflowing
             # nursery_top before this point. Try to reserve totalsize now.
@@ -874,7 +1017,6 @@ class IncrementalMiniMarkGC(MovingGCBase):
                 self.nursery_free = self.nursery_top - self.debug_tiny_nursery
         #
         return result
-    collect_and_reserve._dont_inline_ = True
 
 
     # XXX kill alloc_young and make it always True
@@ -975,8 +1117,13 @@ class IncrementalMiniMarkGC(MovingGCBase):
             # Allocate the object using arena_malloc(), which we assume here
             # is just the same as raw_malloc(), but allows the extra
             # flexibility of saying that we have extra words in the header.
-            # The memory returned is not cleared.
-            arena = llarena.arena_malloc(allocsize, 0)
+            # The memory returned is not cleared.  Or, for the largest
+            # objects, allocate it in the LargeObjectSpace.
+            if self._in_large_object_space(
+                    cardheadersize + raw_malloc_usage(totalsize)):
+                arena = self.los.malloc(allocsize)
+            else:
+                arena = llarena.arena_malloc(allocsize, 0)
             if not arena:
                 raise MemoryError("cannot allocate large object")
             #
@@ -1023,6 +1170,110 @@ class IncrementalMiniMarkGC(MovingGCBase):
             if self.max_heap_size < self.next_major_collection_threshold:
                 self.next_major_collection_threshold = self.max_heap_size
 
+    def set_gc_param(self, param_no, value):
+        """Change one of the tuning parameters that are otherwise read
+        from the PYPY_GC_* environment variables at startup.  Returns
+        False if 'value' is out of bounds; in that case nothing changes.
+        """
+        if param_no == rgc.PARAM_NURSERY_SIZE:
+            if not (0.0 <= value < float(sys.maxint)):
+                return False
+            newsize = int(value) & ~(WORD-1)
+            if newsize < 2 * (self.nonlarge_max + 1):
+                return False
+            if self.debug_rotating_nurseries:
+                return False     # PYPY_GC_DEBUG: the nurseries have a fixed size
+            if newsize != self.nursery_size:
+                self.pending_nursery_size = newsize
+                # the new nursery is normally installed by this minor
+                # collection, or else by the first one that finds no
+                # pinned object
+                self._minor_collection()
+            return True
+        elif param_no == rgc.PARAM_MAJOR_COLLECT:
+            if not (1.0 < value < 100.0):
+                return False
+            self.major_collection_threshold = value
+        elif param_no == rgc.PARAM_GROWTH:
+            if not (1.0 < value < 100.0):
+                return False
+            self.growth_rate_max = value
+        elif param_no == rgc.PARAM_MIN_HEAP_SIZE:
+            if not (0.0 <= value < float(r_uint(-1))):
+                return False
+            self.min_heap_size = value
+            if self.next_major_collection_threshold < value:
+                self.next_major_collection_initial = value
+                self.next_major_collection_threshold = value
+        elif param_no == rgc.PARAM_MAX_HEAP_SIZE:
+            if not (0.0 <= value < float(sys.maxint)):
+                return False
+            self.set_max_heap_size(int(value))
+        elif param_no == rgc.PARAM_MAX_DELTA:
+            if not (0.0 < value <= float(r_uint(-1))):
+                return False
+            self.max_delta = value
+        elif param_no == rgc.PARAM_INCREMENT_STEP:
+            if not (0.0 < value < float(sys.maxint)):
+                return False
+            self.gc_increment_step = r_uint(int(value))
+        elif param_no == rgc.PARAM_ALLOC_SAMPLE_INTERVAL:
+            if not (0.0 <= value < float(sys.maxint // 2)):
+                return False
+            self._alloc_sample_report_type()
+            self._alloc_sample_unlower(self.nursery_free)
+            self.alloc_sample_interval = (int(value) + WORD-1) & ~(WORD-1)
+            self.alloc_sample_left = int(value)
+            if self.alloc_sample_interval > 0:
+                self._alloc_sample_lower()
+        else:
+            return False
+        return True
+
+    def get_gc_param(self, param_no):
+        if param_no == rgc.PARAM_NURSERY_SIZE:
+            if self.pending_nursery_size > 0:
+                return float(self.pending_nursery_size)
+            return float(self.nursery_size)
+        elif param_no == rgc.PARAM_MAJOR_COLLECT:
+            return self.major_collection_threshold
+        elif param_no == rgc.PARAM_GROWTH:
+            return self.growth_rate_max
+        elif param_no == rgc.PARAM_MIN_HEAP_SIZE:
+            return self.min_heap_size
+        elif param_no == rgc.PARAM_MAX_HEAP_SIZE:
+            return self.max_heap_size
+        elif param_no == rgc.PARAM_MAX_DELTA:
+            return self.max_delta
+        elif param_no == rgc.PARAM_INCREMENT_STEP:
+            return float(self.gc_increment_step)
+        elif param_no == rgc.PARAM_ALLOC_SAMPLE_INTERVAL:
+            return float(self.alloc_sample_interval)
+        return -1.0
+
+    def _resize_nursery(self):
+        # called at the end of a minor collection that left no pinned
+        # object: the nursery is empty, so we can replace it
+        ll_assert(not self.nursery_barriers.non_empty(),
+                  "resizing the nursery with nursery barriers")
+        newsize = self.pending_nursery_size
+        self.pending_nursery_size = 0
+        oldsize = self.nursery_size
+        self.nursery_size = newsize
+        nursery = llarena.arena_malloc(self._nursery_memory_size(), 0)
+        if not nursery:
+            self.nursery_size = oldsize    # out of memory: keep the old one
+            return
+        debug_start("gc-set-nursery-size")
+        debug_print("nursery size:", self.nursery_size)
+        llarena.arena_free(self.nursery)
+        self.nursery = nursery
+        self.nursery_free = nursery
+        self._set_nursery_top(nursery + newsize)
+        if not self.max_pinned_from_env:
+            self._estimate_max_number_of_pinned_objects()
+        debug_stop("gc-set-nursery-size")
+
     def raw_malloc_memory_pressure(self, sizehint):
         # Decrement by 'sizehint' plus a very little bit extra.  This
         # is needed e.g. for _rawffi, which may allocate a lot of tiny
@@ -1030,8 +1281,13 @@ class IncrementalMiniMarkGC(MovingGCBase):
         self.next_major_collection_threshold -= (sizehint + 2 * WORD)
         if self.next_major_collection_threshold < 0:
             # cannot trigger a full collection now, but we can ensure
-            # that one will occur very soon
+            # that one will occur very soon.  The bytes that we skip
+            # are not allocated, so allocation sampling must not count
+            # them: it starts again from the new 'nursery_free'
+            self._alloc_sample_unlower(self.nursery_free)
             self.nursery_free = self.nursery_top
+            if self.alloc_sample_interval > 0:
+                self._alloc_sample_lower()
 
     def can_optimize_clean_setarrayitems(self):
         if self.card_page_indices > 0:
@@ -1183,6 +1439,31 @@ class IncrementalMiniMarkGC(MovingGCBase):
         """
         return self.ac.total_memory_used + self.rawmalloced_total_size
 
+    def get_stats(self, stats_no):
+        if stats_no == rgc.TOTAL_MEMORY:
+            return intmask(self.get_total_memory_used())
+        elif stats_no == rgc.TOTAL_ARENA_MEMORY:
+            return intmask(self.ac.total_memory_used)
+        elif stats_no == rgc.TOTAL_RAWMALLOCED:
+            return intmask(self.rawmalloced_total_size)
+        elif stats_no == rgc.ARENAS_COUNT:
+            return self.ac.arenas_count
+        elif stats_no == rgc.ARENA_SIZE:
+            return self.ac.arena_size
+        elif stats_no == rgc.NURSERY_SIZE:
+            return self.nursery_size
+        elif stats_no == rgc.NURSERY_USED:
+            return self.nursery_free - self.nursery
+        elif stats_no == rgc.MINOR_COLLECTIONS:
+            return self.num_minor_collects
+        elif stats_no == rgc.MAJOR_COLLECTIONS:
+            return self.num_major_collects
+        elif stats_no == rgc.TOTAL_GC_TIME:
+            return intmask(self.total_gc_time)
+        elif stats_no == rgc.GC_STATE:
+            return self.gc_state
+        return 0
+
     def threshold_reached(self, extra=0):
         return (self.next_major_collection_threshold -
                 float(self.get_total_memory_used())) < float(extra)
@@ -1619,8 +1900,15 @@ class IncrementalMiniMarkGC(MovingGCBase):
         """Perform a minor collection: find the objects from the nursery
         that remain alive and move them out."""
         #
+        start = read_timestamp()
         debug_start("gc-minor")
         #
+        # Restore the real 'nursery_top' before it is replaced below.
+        # If we come from collect_and_reserve(), this was already done.
+        if self.nursery_real_top:
+            self._alloc_sample_report_type()
+            self._alloc_sample_unlower(self.nursery_free)
+        #
         # All nursery barriers are invalid from this point on.  They
         # are evaluated anew as part of the minor collection.
         self.nursery_barriers.delete()
@@ -1796,7 +2084,7 @@ class IncrementalMiniMarkGC(MovingGCBase):
         self.surviving_pinned_objects.delete()
         #
         self.nursery_free = self.nursery
-        self.nursery_top = self.nursery_barriers.popleft()
+        self._set_nursery_top(self.nursery_barriers.popleft())
         #
         # clear GCFLAG_PINNED_OBJECT_PARENT_KNOWN from all parents in the list.
         self.old_objects_pointing_to_pinned.foreach(
@@ -1815,7 +2103,21 @@ class IncrementalMiniMarkGC(MovingGCBase):
         #
         self.root_walker.finished_minor_collection()
         #
+        if self.pending_nursery_size > 0 and self.pinned_objects_in_nursery == 0:
+            self._resize_nursery()
+        #
+        if self.alloc_sample_interval > 0:
+            self._alloc_sample_lower()
+        #
         debug_stop("gc-minor")
+        duration = read_timestamp() - start
+        self.num_minor_collects += 1
+        self.total_gc_time += duration
+        self.hooks.fire_gc_minor(
+            duration=duration,
+            total_memory_used=self.get_total_memory_used(),
+            pinned_objects=self.pinned_objects_in_nursery,
+            surviving_size=self.nursery_surviving_size)
 
     def _reset_flag_old_objects_pointing_to_pinned(self, obj, ignore):
         ll_assert(self.header(obj).tid & GCFLAG_PINNED_OBJECT_PARENT_KNOWN != 0,
@@ -2148,7 +2450,10 @@ class IncrementalMiniMarkGC(MovingGCBase):
         ll_assert(raw_malloc_usage(totalsize) & (WORD-1) == 0,
                   "misaligned totalsize in _malloc_out_of_nursery_nonsmall")
         #
-        arena = llarena.arena_malloc(raw_malloc_usage(totalsize), False)
+        if self._in_large_object_space(raw_malloc_usage(totalsize)):
+            arena = self.los.malloc(raw_malloc_usage(totalsize))
+        else:
+            arena = llarena.arena_malloc(raw_malloc_usage(totalsize), False)
         if not arena:
             out_of_memory("out of memory: couldn't allocate a few KB more")
         llarena.arena_reserve(arena, totalsize)
@@ -2216,7 +2521,9 @@ class IncrementalMiniMarkGC(MovingGCBase):
     # Note - minor collections seem fast enough so that one
     # is done before every major collection step
     def major_collection_step(self, reserving_size=0):
+        start = read_timestamp()
         debug_start("gc-collect-step")
+        oldstate = self.gc_state
         debug_print("starting gc state: ", GC_STATES[self.gc_state])
         # Debugging checks
         if self.pinned_objects_in_nursery == 0:
@@ -2354,6 +2661,9 @@ class IncrementalMiniMarkGC(MovingGCBase):
                 if self.rrc_enabled:
                     self.rrc_major_collection_free()
                 #
+                # for the hooks: the memory before sweeping
+                self.stat_ac_arenas_count = self.ac.arenas_count
+                self.stat_rawmalloced_total_size = self.rawmalloced_total_size
                 self.gc_state = STATE_SWEEPING
             #END MARKING
         elif self.gc_state == STATE_SWEEPING:
@@ -2383,6 +2693,9 @@ class IncrementalMiniMarkGC(MovingGCBase):
                 # We also need to reset the GCFLAG_VISITED on prebuilt GC objects.
                 self.prebuilt_root_objects.foreach(self._reset_gcflag_visited, None)
                 #
+                if self.use_large_object_space:
+                    self.los.free_empty_chunks()
+                #
                 # Set the threshold for the next major collection to be when we
                 # have allocated 'major_collection_threshold' times more than
                 # we currently have -- but no more than 'max_delta' more than
@@ -2413,6 +2726,13 @@ class IncrementalMiniMarkGC(MovingGCBase):
                     raise MemoryError
 
                 self.gc_state = STATE_FINALIZING
+                self.hooks.fire_gc_collect(
+                    num_major_collects=self.num_major_collects,
+                    arenas_count_before=self.stat_ac_arenas_count,
+                    arenas_count_after=self.ac.arenas_count,
+                    arenas_bytes=self.ac.total_memory_used,
+                    rawmalloc_bytes_before=self.stat_rawmalloced_total_size,
+                    rawmalloc_bytes_after=self.rawmalloced_total_size)
             # FINALIZING not yet incrementalised
             # but it seems safe to allow mutator to run after sweeping and
             # before finalizers are called. This is because run_finalizers
@@ -2433,6 +2753,9 @@ class IncrementalMiniMarkGC(MovingGCBase):
 
         debug_print("stopping, now in gc state: ", GC_STATES[self.gc_state])
         debug_stop("gc-collect-step")
+        duration = read_timestamp() - start
+        self.total_gc_time += duration
+        self.hooks.fire_gc_collect_step(duration, oldstate, self.gc_state)
 
     def _sweep_old_objects_pointing_to_pinned(self, obj, new_list):
         if self.header(obj).tid & GCFLAG_VISITED:
@@ -2449,6 +2772,20 @@ class IncrementalMiniMarkGC(MovingGCBase):
     def _reset_gcflag_visited(self, obj, ignored):
         self.header(obj).tid &= ~GCFLAG_VISITED
 
+    # with 'background_free', the rawmalloced objects smaller than this are
+    # still freed directly: free() is cheap for them
+    BACKGROUND_FREE_MIN_SIZE = 65536
+
+    # with 'use_large_object_space', the rawmalloced objects of at least
+    # this size are allocated in the LargeObjectSpace
+    LARGE_OBJECT_SPACE_MIN_SIZE = 65536
+
+    def _in_large_object_space(self, size):
+        # 'size' is the size of the object plus its card marks, not
+        # rounded up: it is computed in the same way when we allocate
+        # and when we free the object
+        return self.use_large_object_space and size >= self.los.min_size
+
     def free_rawmalloced_object_if_unvisited(self, obj, check_flag):
         if self.header(obj).tid & check_flag:
             self.header(obj).tid &= ~check_flag   # survives
@@ -2473,7 +2810,13 @@ class IncrementalMiniMarkGC(MovingGCBase):
                 arena -= extra_words * WORD
                 allocsize += extra_words * WORD
             #
-            llarena.arena_free(arena)
+            if self._in_large_object_space(allocsize):
+                self.los.free(arena)
+            elif (self.background_free and
+                    allocsize >= self.BACKGROUND_FREE_MIN_SIZE):
+                llarena.arena_free_background(arena)
+            else:
+                llarena.arena_free(arena)
             self.rawmalloced_total_size -= r_uint(allocsize)
 
     def start_free_rawmalloc_objects(self):
@@ -2556,6 +2899,8 @@ class IncrementalMiniMarkGC(MovingGCBase):
     TEST_VISIT_SINGLE_STEP = False    # for tests
 
     def visit_all_objects_step(self, size_to_track):
+        if self.mark_prefetch_depth > 0:
+            return self._visit_all_objects_step_prefetch(size_to_track)
         # Objects can be added to pending by visit
         pending = self.objects_to_trace
         while pending.non_empty():
@@ -2565,6 +2910,38 @@ class IncrementalMiniMarkGC(MovingGCBase):
                 return 0
         return size_to_track
 
+    def _visit_all_objects_step_prefetch(self, size_to_track):
+        # Same as visit_all_objects_step(), but the objects popped from
+        # 'objects_to_trace' first wait in a small FIFO, and we ask the
+        # CPU to prefetch their header when they enter it.  On large heaps
+        # marking spends most of its time in cache misses on the headers;
+        # this lets several of these misses overlap.  The FIFO is emptied
+        # back into 'objects_to_trace' at the end of the step.
+        pending = self.objects_to_trace
+        fifo = self.mark_prefetch_fifo
+        mask = self.mark_prefetch_depth - 1
+        size_gc_header = self.gcheaderbuilder.size_gc_header
+        head = 0
+        count = 0
+        while True:
+            while count <= mask and pending.non_empty():
+                obj = pending.pop()
+                llop.raw_prefetch(lltype.Void, obj - size_gc_header)
+                fifo[(head + count) & mask] = obj
+                count += 1
+            if count == 0:
+                return size_to_track
+            obj = fifo[head]
+            head = (head + 1) & mask
+            count -= 1
+            size_to_track -= self.visit(obj)
+            if size_to_track < 0 or self.TEST_VISIT_SINGLE_STEP:
+                # put back the remaining objects, the oldest on top
+                while count > 0:
+                    count -= 1
+                    pending.append(fifo[(head + count) & mask])
+                return 0
+
     def visit(self, obj):
         #
         # 'obj' is a live object.  Check GCFLAG_VISITED to know if we
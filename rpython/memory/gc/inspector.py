@@ -4,6 +4,7 @@ Utility RPython functions to inspect objects in the GC.
 from rpython.rtyper.lltypesystem import lltype, llmemory, rffi, llgroup
 from rpython.rlib.objectmodel import free_non_gc_object
 from rpython.rlib import rposix, rgc, jit
+from rpython.rlib.rarithmetic import r_uint, intmask, LONG_BIT
 
 from rpython.memory.support import AddressDict, get_address_stack
 
@@ -144,6 +145,9 @@ class HeapDumper(object):
         self.write(0)
         self.write(-1)
 
+    def write_end(self):
+        pass
+
     def writeobj(self, obj):
         gc = self.gc
         typeid = gc.get_type_id(obj)
@@ -211,16 +215,119 @@ class HeapDumper(object):
         while pending.non_empty():
             self.unwriteobj(pending.pop())
 
+
+# The compact format of the heap dumps, written as we go in blocks of
+# BUFSIZE words like the format above, and read by pypy/tool/gcdump.py.
+# After the header, all numbers are unsigned varints (7 bits per byte,
+# least significant first, the high bit set on all bytes but the last).
+# The records start with a 'kind' number:
+#
+#   [typeindex + COMPACT_FIRST_TYPE] [addr delta] [size] [ref1]..[refn] [0]
+#   [COMPACT_END_OF_ROOTS]
+#   [COMPACT_END_OF_DUMP]
+#
+# where [addr delta] is the zigzag-encoded difference with the address
+# of the previous object, and every [ref] is 1 + the zigzag-encoded
+# difference between the address of the referenced object and the
+# address of this object.  Objects tend to be close to the ones they
+# reference, so most of these numbers fit in one or two bytes.
+
+COMPACT_MAGIC = 'RPYHEAP\x01'
+COMPACT_END_OF_ROOTS = 0
+COMPACT_END_OF_DUMP = 1
+COMPACT_FIRST_TYPE = 2
+
+class CompactHeapDumper(HeapDumper):
+    _alloc_flavor_ = "raw"
+
+    def __init__(self, gc, fd):
+        HeapDumper.__init__(self, gc, fd)
+        self.bytebuffer = rffi.cast(rffi.CCHARP, self.writebuffer)
+        self.bytebuffer_size = self.BUFSIZE * rffi.sizeof(rffi.LONG)
+        self.byte_count = 0
+        self.prev_addr = 0
+        self.cur_addr = 0
+        for c in COMPACT_MAGIC:
+            self.write_byte(ord(c))
+        self.write_byte(rffi.sizeof(rffi.LONG))
+
+    @jit.dont_look_inside
+    def flush(self):
+        if self.byte_count > 0:
+            count = raw_os_write(self.fd,
+                                 rffi.cast(llmemory.Address, self.bytebuffer),
+                                 rffi.cast(rffi.SIZE_T, self.byte_count))
+            if rffi.cast(lltype.Signed, count) != self.byte_count:
+                raise OSError(rffi.cast(lltype.Signed, rposix._get_errno()),
+                              "raw_os_write failed")
+            self.byte_count = 0
+    flush._dont_inline_ = True
+
+    def write_byte(self, value):
+        x = self.byte_count
+        self.bytebuffer[x] = chr(value)
+        x += 1
+        self.byte_count = x
+        if x == self.bytebuffer_size:
+            self.flush()
+    write_byte._always_inline_ = True
+
+    def write_uvarint(self, uvalue):
+        # 'uvalue' must be an r_uint at every call site
+        while uvalue >= 0x80:
+            self.write_byte(intmask(uvalue & 0x7F) | 0x80)
+            uvalue >>= 7
+        self.write_byte(intmask(uvalue))
+
+    def write_svarint(self, value):
+        self.write_uvarint(_zigzag(value))
+
+    def write_marker(self):
+        self.write_uvarint(r_uint(COMPACT_END_OF_ROOTS))
+
+    def write_end(self):
+        self.write_uvarint(r_uint(COMPACT_END_OF_DUMP))
+
+    def writeobj(self, obj):
+        gc = self.gc
+        typeid = gc.get_type_id(obj)
+        addr = llmemory.cast_adr_to_int(obj)
+        self.write_uvarint(r_uint(gc.get_member_index(typeid) +
+                                  COMPACT_FIRST_TYPE))
+        self.write_svarint(addr - self.prev_addr)
+        self.write_uvarint(r_uint(llmemory.raw_malloc_usage(
+            gc.get_size_incl_hash(obj))))
+        self.prev_addr = addr
+        self.cur_addr = addr
+        # not called _writeref(), which must stay a constant in the
+        # HeapDumper.writeobj() of the parent class
+        gc.trace(obj, self._writecompactref, None)
+        self.write_uvarint(r_uint(0))
+
+    def _writecompactref(self, pointer, _):
+        obj = pointer.address[0]
+        delta = llmemory.cast_adr_to_int(obj) - self.cur_addr
+        self.write_uvarint(_zigzag(delta) + 1)
+        self.add(obj)
+
+def _zigzag(value):
+    # zigzag encoding: 0, -1, 1, -2, 2... become 0, 1, 2, 3, 4...
+    return (r_uint(value) << 1) ^ r_uint(value >> (LONG_BIT-1))
+
 def _hd_add_root(obj, heap_dumper):
     heap_dumper.add(obj)
 
 def _hd_unadd_root(obj, heap_dumper):
     heap_dumper.unadd(obj)
 
-def dump_rpy_heap(gc, fd):
-    heapdumper = HeapDumper(gc, fd)
+def dump_rpy_heap(gc, fd, compact=False):
+    if compact:
+        heapdumper = CompactHeapDumper(gc, fd)
+    else:
+        heapdumper = HeapDumper(gc, fd)
     heapdumper.add_roots()
     heapdumper.walk(heapdumper.pending)
+    heapdumper.write_end()
     heapdumper.flush()
     if heapdumper.gcflag != 0:
         heapdumper.clear_gcflag_again()
@@ -0,0 +1,216 @@
+"""
+The space of the large objects of incminimark, used if translated with
+--gclargeobjectspace.
+
+Without it, every object that doesn't fit in the ArenaCollection is
+allocated with its own malloc().  With it, the objects of at least
+'min_size' bytes come instead from "chunks" of 2MB, obtained with mmap()
+at an address that is a multiple of 2MB, so that the OS can back them
+with transparent huge pages.  A chunk is divided into "units" of 4KB.
+A "block" is a number of consecutive units of a chunk, and contains one
+object (with its card marks, if any).  An object too big for a chunk gets
+a dedicated chunk of its own, of the size that it needs, also aligned
+to 2MB.
+
+The first unit(s) of every chunk contain a CHUNK_HEADER, which is the
+side table of the blocks in the chunk: 'blockunits[i]' is the number of
+units of the block starting at unit 'i', or 0 if no block starts there.
+The entries of the units inside a block are always 0 too, so that we can
+find free units by walking the table and jumping over the blocks.  To
+free a block we only need its address: rounding it down to a multiple
+of 2MB gives the chunk header.
+"""
+
+from rpython.rtyper.lltypesystem import lltype, llmemory, llarena, rffi
+from rpython.rlib.rarithmetic import r_uint
+from rpython.rlib.objectmodel import we_are_translated
+from rpython.rlib.debug import ll_assert
+
+NULL = llmemory.NULL
+
+CHUNK_SIZE = 2 * 1024 * 1024
+UNIT_SIZE = 4096
+MAX_UNITS_PER_CHUNK = 512
+
+
+CHUNK_PTR = lltype.Ptr(lltype.ForwardReference())
+CHUNK_HEADER = lltype.Struct('LargeObjectChunk',
+    # -- The doubly-linked list of the chunks that are not full, rooted
+    #    in 'chunks_with_free_units'.  Dedicated chunks are never in it.
+    ('prevchunk', CHUNK_PTR),
+    ('nextchunk', CHUNK_PTR),
+    # -- The number of bytes obtained from arena_mmap().
+    ('mapsize', lltype.Signed),
+    # -- The number of free units, or -1 for a dedicated chunk.
+    ('nfreeunits', lltype.Signed),
+    # -- The side table described above.
+    ('blockunits', lltype.FixedSizeArray(rffi.USHORT, MAX_UNITS_PER_CHUNK)),
+    )
+CHUNK_PTR.TO.become(CHUNK_HEADER)
+CHUNK_NULL = lltype.nullptr(CHUNK_HEADER)
+
+# ----------
+
+
+class LargeObjectSpace(object):
+    _alloc_flavor_ = "raw"
+
+    def __init__(self, chunk_size, unit_size, min_size):
+        assert chunk_size & (chunk_size - 1) == 0
+        assert chunk_size % unit_size == 0
+        self.chunk_size = chunk_size
+        self.unit_size = unit_size
+        self.units_per_chunk = chunk_size // unit_size
+        assert self.units_per_chunk <= MAX_UNITS_PER_CHUNK
+        hdrsize = llmemory.raw_malloc_usage(llmemory.sizeof(CHUNK_HEADER))
+        self.header_units = (hdrsize + unit_size - 1) // unit_size
+        assert self.header_units < self.units_per_chunk
+        #
+        # the objects smaller than this are not allocated here; see
+        # IncrementalMiniMarkGC._in_large_object_space()
+        self.min_size = min_size
+        # if True, ask for transparent huge pages when mapping chunks
+        self.hugepages = False
+        #
+        self.chunks_with_free_units = CHUNK_NULL
+        self.total_memory_used = r_uint(0)      # in the blocks
+        self.total_memory_mapped = r_uint(0)    # in the chunks
+
+
+    def malloc(self, nbytes):
+        """Return the address of a new block of at least 'nbytes' bytes.
+        It is not zero-filled.  Returns NULL if out of memory."""
+        nunits = (nbytes + self.unit_size - 1) // self.unit_size
+        if nunits > self.units_per_chunk - self.header_units:
+            return self._malloc_dedicated(nunits)
+        #
+        # first fit, in the chunks that have enough free units in total
+        chunk = self.chunks_with_free_units
+        while chunk:
+            if chunk.nfreeunits >= nunits:
+                i = self._find_free_units(chunk, nunits)
+                if i >= 0:
+                    return self._allocate_block(chunk, i, nunits)
+            chunk = chunk.nextchunk
+        #
+        chunk = self._new_chunk()
+        if not chunk:
+            return NULL
+        return self._allocate_block(chunk, self.header_units, nunits)
+
+    def _find_free_units(self, chunk, nunits):
+        i = self.header_units
+        start = i
+        while i < self.units_per_chunk:
+            n = rffi.cast(lltype.Signed, chunk.blockunits[i])
+            if n > 0:
+                i += n              # jump over this block
+                start = i
+            else:
+                i += 1
+                if i - start == nunits:
+                    return start
+        return -1
+
+    def _allocate_block(self, chunk, i, nunits):
+        chunk.blockunits[i] = rffi.cast(rffi.USHORT, nunits)
+        chunk.nfreeunits -= nunits
+        if chunk.nfreeunits == 0:
+            self._unlink_chunk(chunk)
+        self.total_memory_used += r_uint(nunits * self.unit_size)
+        return self._chunk_base(chunk) + i * self.unit_size
+
+    def _new_chunk(self):
+        base = llarena.arena_mmap(self.chunk_size, self.chunk_size,
+                                  self.hugepages)
+        if not base:
+            return CHUNK_NULL
+        # the memory is zero-filled, so 'blockunits' is already all zeroes
+        llarena.arena_reserve(base, llmemory.sizeof(CHUNK_HEADER))
+        chunk = llmemory.cast_adr_to_ptr(base, CHUNK_PTR)
+        chunk.mapsize = self.chunk_size
+        chunk.nfreeunits = self.units_per_chunk - self.header_units
+        chunk.prevchunk = CHUNK_NULL
+        chunk.nextchunk = self.chunks_with_free_units
+        if chunk.nextchunk:
+            chunk.nextchunk.prevchunk = chunk
+        self.chunks_with_free_units = chunk
+        self.total_memory_mapped += r_uint(self.chunk_size)
+        return chunk
+
+    def _malloc_dedicated(self, nunits):
+        mapsize = (self.header_units + nunits) * self.unit_size
+        base = llarena.arena_mmap(mapsize, self.chunk_size, self.hugepages)
+        if not base:
+            return NULL
+        llarena.arena_reserve(base, llmemory.sizeof(CHUNK_HEADER))
+        chunk = llmemory.cast_adr_to_ptr(base, CHUNK_PTR)
+        chunk.mapsize = mapsize
+        chunk.nfreeunits = -1
+        self.total_memory_used += r_uint(nunits * self.unit_size)
+        self.total_memory_mapped += r_uint(mapsize)
+        return base + self.header_units * self.unit_size
+
+
+    def free(self, block):
+        """Free a block returned by malloc()."""
+        base = self._start_of_chunk(block)
+        chunk = llmemory.cast_adr_to_ptr(base, CHUNK_PTR)
+        if chunk.nfreeunits < 0:
+            # a dedicated chunk
+            mapsize = chunk.mapsize
+            nunits = mapsize // self.unit_size - self.header_units
+            self.total_memory_used -= r_uint(nunits * self.unit_size)
+            self.total_memory_mapped -= r_uint(mapsize)
+            llarena.arena_munmap(base, mapsize)
+            return
+        i = (block - base) // self.unit_size
+        nunits = rffi.cast(lltype.Signed, chunk.blockunits[i])
+        ll_assert(nunits > 0, "LargeObjectSpace.free(): not a block")
+        llarena.arena_reset(block, nunits * self.unit_size, 0)
+        chunk.blockunits[i] = rffi.cast(rffi.USHORT, 0)
+        if chunk.nfreeunits == 0:
+            # the chunk was full: put it back in the list
+            chunk.prevchunk = CHUNK_NULL
+            chunk.nextchunk = self.chunks_with_free_units
+            if chunk.nextchunk:
+                chunk.nextchunk.prevchunk = chunk
+            self.chunks_with_free_units = chunk
+        chunk.nfreeunits += nunits
+        self.total_memory_used -= r_uint(nunits * self.unit_size)
+
+    def free_empty_chunks(self):
+        """Give the chunks that became entirely free back to the OS.
+        Called at the end of major collections: in-between, they are
+        kept for the next large objects."""
+        chunk = self.chunks_with_free_units
+        while chunk:
+            nextchunk = chunk.nextchunk
+            if chunk.nfreeunits == self.units_per_chunk - self.header_units:
+                self._unlink_chunk(chunk)
+                self.total_memory_mapped -= r_uint(self.chunk_size)
+                llarena.arena_munmap(self._chunk_base(chunk), self.chunk_size)
+            chunk = nextchunk
+
+    def _unlink_chunk(self, chunk):
+        if chunk.prevchunk:
+            chunk.prevchunk.nextchunk = chunk.nextchunk
+        else:
+            self.chunks_with_free_units = chunk.nextchunk
+        if chunk.nextchunk:
+            chunk.nextchunk.prevchunk = chunk.prevchunk
+        chunk.prevchunk = CHUNK_NULL
+        chunk.nextchunk = CHUNK_NULL
+
+    def _chunk_base(self, chunk):
+        return llarena.getfakearenaaddress(llmemory.cast_ptr_to_adr(chunk))
+
+    def _start_of_chunk(self, addr):
+        if we_are_translated():
+            offset = llmemory.cast_adr_to_int(addr) & (self.chunk_size - 1)
+            return addr - offset
+        else:
+            # for testing: each chunk is its own fake arena
+            assert isinstance(addr, llarena.fakearenaaddress)
+            assert addr.offset < self.chunk_size
+            return llarena.fakearenaaddress(addr.arena, 0)
@@ -17,6 +17,7 @@ assert 1 << WORD_POWER_2 == WORD
 # into pages.  For each arena we allocate one of the following structures:
 
 ARENA_PTR = lltype.Ptr(lltype.ForwardReference())
+PAGE_ADDRESSES = lltype.Array(llmemory.Address, hints={'nolength': True})
 ARENA = lltype.Struct('ArenaReference',
     # -- The address of the arena, as returned by malloc()
     ('base', llmemory.Address),
@@ -25,6 +26,12 @@ ARENA = lltype.Struct('ArenaReference',
     ('totalpages', lltype.Signed),
     # -- A chained list of free pages in the arena.  Ends with NULL.
     ('freepages', llmemory.Address),
+    # -- The free pages whose memory was given back to the OS by
+    #    _release_free_pages().  They are not in 'freepages', but they
+    #    are counted in 'nfreepages'.  'releasedpages' is allocated the
+    #    first time, with room for 'totalpages' addresses.
+    ('nreleasedpages', lltype.Signed),
+    ('releasedpages', lltype.Ptr(PAGE_ADDRESSES)),
     # -- A linked list of arenas.  See below.
     ('nextarena', ARENA_PTR),
     )
@@ -40,6 +47,12 @@ ARENA_NULL = lltype.nullptr(ARENA)
 # arenas that have 'nfreepages == i'.  We allocate pages out of the
 # arena in 'current_arena'; when it is exhausted we pick another arena
 # with the smallest value for nfreepages (but > 0).
+#
+# If enabled, at the end of a major collection the memory of the pages
+# that are free in the arenas not entirely freed is also given back to
+# the OS with madvise().  As their content is lost, these pages are moved
+# from the chained list 'freepages' to the array 'releasedpages'.  Pages
+# are taken from 'freepages' first.
 
 # ____________________________________________________________
 #
@@ -134,12 +147,24 @@ class ArenaCollection(object):
         # guarantee that 'arenas_lists[1:min_empty_nfreepages]' are all empty
         self.min_empty_nfreepages = self.max_pages_per_arena
         #
+        # set by the GC: free the empty arenas from a helper thread
+        self.background_free = False
+        #
+        # how to give the memory of the free pages back to the OS after
+        # a major collection, see _release_free_pages(): 0 to keep them,
+        # otherwise the 'zero' argument of llarena.arena_reset(), i.e. 4
+        # for MADV_FREE or 5 for MADV_DONTNEED.  Set by the GC.
+        self.release_free_pages = 0
+        #
         # part of current_arena might still contain uninitialized pages
         self.num_uninitialized_pages = 0
         #
         # the total memory used, counting every block in use, without
         # the additional bookkeeping stuff.
         self.total_memory_used = r_uint(0)
+        #
+        # the number of arenas currently allocated, for statistics
+        self.arenas_count = 0
 
 
     def _new_page_ptr_list(self, length):
@@ -201,7 +226,7 @@ class ArenaCollection(object):
         # The result is simply 'current_arena.freepages'.
         arena = self.current_arena
         result = arena.freepages
-        if arena.nfreepages > 0:
+        if arena.nfreepages > arena.nreleasedpages:
             #
             # The 'result' was part of the chained list; read the next.
             arena.nfreepages -= 1
@@ -210,6 +235,15 @@ class ArenaCollection(object):
                                 llmemory.sizeof(llmemory.Address),
                                 0)
             #
+        elif arena.nreleasedpages > 0:
+            #
+            # Take a released page; its memory comes back from the OS
+            # when it is touched.
+            arena.nfreepages -= 1
+            arena.nreleasedpages -= 1
+            result = arena.releasedpages[arena.nreleasedpages]
+            freepages = arena.freepages
+            #
         else:
             # The 'result' is part of the uninitialized pages.
             ll_assert(self.num_uninitialized_pages > 0,
@@ -221,7 +255,7 @@ class ArenaCollection(object):
                 freepages = NULL
         #
         arena.freepages = freepages
-        if freepages == NULL:
+        if freepages == NULL and arena.nreleasedpages == 0:
             # This was the last page, so put the arena away into
             # arenas_lists[0].
             ll_assert(arena.nfreepages == 0, 
@@ -309,8 +343,11 @@ class ArenaCollection(object):
         arena.nfreepages = 0        # they are all uninitialized pages
         arena.totalpages = npages
         arena.freepages = firstpage
+        arena.nreleasedpages = 0
+        arena.releasedpages = lltype.nullptr(PAGE_ADDRESSES)
         self.num_uninitialized_pages = npages
         self.current_arena = arena
+        self.arenas_count += 1
         #
     allocate_new_arena._dont_inline_ = True
 
@@ -359,6 +396,8 @@ class ArenaCollection(object):
         #
         if size_class >= 0:
             self._rehash_arenas_lists()
+            if self.release_free_pages:
+                self._release_free_pages()
             self.size_class_with_old_pages = -1
         #
         return True
@@ -396,8 +435,15 @@ class ArenaCollection(object):
                     #
                     # The whole arena is empty.  Free it.
                     llarena.arena_reset(arena.base, self.arena_size, 4)
-                    llarena.arena_free(arena.base)
+                    if self.background_free:
+                        llarena.arena_free_background(arena.base)
+                    else:
+                        llarena.arena_free(arena.base)
+                    if arena.releasedpages:
+                        lltype.free(arena.releasedpages, flavor='raw',
+                                    track_allocation=False)
                     lltype.free(arena, flavor='raw', track_allocation=False)
+                    self.arenas_count -= 1
                     #
                 else:
                     # Insert 'arena' in the correct arenas_lists[n]
@@ -413,6 +459,48 @@ class ArenaCollection(object):
         self.min_empty_nfreepages = 1
 
 
+    def _release_free_pages(self):
+        # Give back to the OS the memory of the free pages in all arenas
+        # (the entirely free arenas were already freed by
+        # _rehash_arenas_lists()).  Returns the number of pages released.
+        count = 0
+        if self.current_arena != ARENA_NULL:
+            count += self._release_free_pages_in_arena(self.current_arena)
+        i = 1
+        while i < self.max_pages_per_arena:
+            arena = self.arenas_lists[i]
+            while arena != ARENA_NULL:
+                count += self._release_free_pages_in_arena(arena)
+                arena = arena.nextarena
+            i += 1
+        return count
+
+    def _release_free_pages_in_arena(self, arena):
+        # Move all the pages of 'freepages' to 'releasedpages', and release
+        # them entirely: a page is a multiple of the OS page size
+        count = arena.nfreepages - arena.nreleasedpages
+        if count == 0:
+            return 0
+        if not arena.releasedpages:
+            arena.releasedpages = lltype.malloc(PAGE_ADDRESSES,
+                                                arena.totalpages,
+                                                flavor='raw',
+                                                track_allocation=False)
+        pageaddr = arena.freepages
+        i = count
+        while i > 0:
+            nextpage = pageaddr.address[0]
+            llarena.arena_reset(pageaddr, self.page_size,
+                                self.release_free_pages)
+            arena.releasedpages[arena.nreleasedpages] = pageaddr
+            arena.nreleasedpages += 1
+            pageaddr = nextpage
+            i -= 1
+        # what remains is NULL, or the uninitialized pages of current_arena
+        arena.freepages = pageaddr
+        return count
+
+
     def mass_free_in_pages(self, size_class, ok_to_free_func, max_pages):
         nblocks = self.nblocks_for_size[size_class]
         block_size = size_class * WORD
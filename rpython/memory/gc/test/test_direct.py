@@ -13,6 +13,7 @@ from rpython.rlib.rarithmetic import LONG_BIT, is_valid_int
 from rpython.memory.gc import minimark, incminimark
 from rpython.memory.gctypelayout import zero_gc_pointers_inside, zero_gc_pointers
 from rpython.rlib.debug import debug_print
+from rpython.rlib import rgc
 import pdb
 WORD = LONG_BIT // 8
 
@@ -78,6 +79,8 @@ class BaseDirectGCTest(object):
         if hasattr(meth, 'GC_PARAMS'):
             GC_PARAMS.update(meth.GC_PARAMS)
         GC_PARAMS['translated_to_c'] = False
+        for name, value in getattr(meth, 'GC_CONFIG', {}).items():
+            setattr(config, name, value)
         self.gc = self.GCClass(config, **GC_PARAMS)
         self.gc.DEBUG = True
         self.rootwalker = DirectRootWalker(self)
@@ -671,6 +674,160 @@ class TestIncrementalMiniMarkGCSimple(TestMiniMarkGCSimple):
         self.gc.debug_gc_step_until(incminimark.STATE_SCANNING)
         assert self.stackroots[1].x == 13
 
+    def test_mark_prefetch_fifo(self):
+        gc = self.gc
+        assert gc.mark_prefetch_depth == 8     # 5 rounded up
+        for i in range(20):
+            self.stackroots.append(self.malloc(S))
+        gc.debug_gc_step_until(incminimark.STATE_MARKING)
+        before = gc.objects_to_trace.tolist()
+        assert len(before) >= 20
+        # visit a single object: the ones that went through the FIFO must
+        # be back in 'objects_to_trace', in the same order
+        assert gc.visit_all_objects_step(1) == 0
+        assert gc.objects_to_trace.tolist() == before[1:]    # top first
+        gc.debug_gc_step_until(incminimark.STATE_SCANNING)
+        for i in range(20):
+            assert not gc.is_in_nursery(
+                llmemory.cast_ptr_to_adr(self.stackroots[i]))
+    test_mark_prefetch_fifo.GC_CONFIG = {"gcmarkprefetch": 5}
+
+    def test_mark_prefetch_disabled_by_default(self, monkeypatch):
+        gc = self.gc
+        assert gc.mark_prefetch_depth == 0
+        assert not gc.mark_prefetch_fifo
+        # the FIFO code is never entered, but the objects are marked
+        def no_prefetch(size_to_track):
+            raise AssertionError("prefetch FIFO used")
+        monkeypatch.setattr(gc, '_visit_all_objects_step_prefetch',
+                            no_prefetch)
+        steps = []
+        orig_step = gc.visit_all_objects_step
+        def visit_all_objects_step(size_to_track):
+            steps.append(gc.objects_to_trace.length())
+            return orig_step(size_to_track)
+        monkeypatch.setattr(gc, 'visit_all_objects_step',
+                            visit_all_objects_step)
+        for i in range(20):
+            self.stackroots.append(self.malloc(S))
+        gc._minor_collection()
+        for i in range(20):
+            assert not gc.is_in_nursery(
+                llmemory.cast_ptr_to_adr(self.stackroots[i]))
+        gc.debug_gc_step_until(incminimark.STATE_MARKING)
+        gc.debug_gc_step_until(incminimark.STATE_SCANNING)
+        assert sum(steps) >= 20
+
+    def test_background_free(self, monkeypatch):
+        from rpython.rtyper.lltypesystem import llarena
+        gc = self.gc
+        assert not gc.background_free     # the default
+        gc.background_free = gc.ac.background_free = True
+        freed = []
+        def arena_free_background(arena):
+            freed.append(arena)
+            llarena.arena_free(arena)
+        monkeypatch.setattr(llarena, 'arena_free_background',
+                            arena_free_background)
+        self.stackroots.append(self.malloc(VAR, 10))
+        self.stackroots.append(
+            self.malloc(VAR, gc.BACKGROUND_FREE_MIN_SIZE // WORD))
+        gc.collect()
+        del self.stackroots[:]
+        gc.collect()
+        # only the large object is freed in the background
+        assert len(freed) == 1
+        assert not gc.old_rawmalloced_objects.non_empty()
+
+    def test_large_object_space(self):
+        from rpython.memory.gc.largeobjspace import LargeObjectSpace
+        gc = self.gc
+        assert not gc.use_large_object_space     # the default
+        gc.use_large_object_space = True
+        gc.los = LargeObjectSpace(64 * 256, 256, 50 * WORD)
+        # arrays of 5 items are not in the large object space, arrays of
+        # 60 items are, each in a block of 2 units with their card marks
+        self.stackroots.append(self.malloc(VAR, 5))
+        for i in range(3):
+            self.stackroots.append(self.malloc(VAR, 60))
+        assert gc.los.total_memory_used == 3 * 2 * 256
+        for j in range(1, 4):
+            for i in range(60):
+                p = self.malloc(S)
+                p.x = i * j
+                self.writearray(self.stackroots[j], i, p)
+        gc.collect()
+        del self.stackroots[2]
+        gc.collect()
+        assert gc.los.total_memory_used == 2 * 2 * 256
+        for j in range(1, 3):
+            for i in range(60):
+                assert self.stackroots[j][i].x == i * (2 * j - 1)
+        del self.stackroots[:]
+        gc.collect()
+        assert gc.los.total_memory_used == 0
+        assert gc.los.total_memory_mapped == 0
+    test_large_object_space.GC_PARAMS = {"card_page_indices": 4}
+
+    def test_set_gc_param_nursery_size(self):
+        gc = self.gc
+        oldsize = gc.nursery_size
+        obj = self.malloc(S)
+        obj.x = 42
+        self.stackroots.append(obj)
+        assert gc.set_gc_param(rgc.PARAM_NURSERY_SIZE, oldsize * 2 + 3.5)
+        newsize = oldsize * 2     # rounded down to a multiple of WORD
+        assert gc.nursery_size == newsize
+        assert gc.get_gc_param(rgc.PARAM_NURSERY_SIZE) == newsize
+        assert gc.nursery_top == gc.nursery + newsize
+        assert gc.nursery_free == gc.nursery
+        assert self.stackroots[0].x == 42     # survived, moved out
+        assert not gc.is_in_nursery(llmemory.cast_ptr_to_adr(
+            self.stackroots[0]))
+        for i in range(100):
+            self.malloc(S)
+        #
+        minsize = 2 * (gc.nonlarge_max + 1)
+        assert not gc.set_gc_param(rgc.PARAM_NURSERY_SIZE, minsize - WORD)
+        assert not gc.set_gc_param(rgc.PARAM_NURSERY_SIZE, -1.0)
+        assert not gc.set_gc_param(rgc.PARAM_NURSERY_SIZE, 1e300)
+        assert not gc.set_gc_param(rgc.PARAM_NURSERY_SIZE, float('nan'))
+        assert gc.nursery_size == newsize
+        assert gc.set_gc_param(rgc.PARAM_NURSERY_SIZE, minsize)
+        assert gc.nursery_size == minsize
+
+    def test_set_gc_param_bounds(self):
+        gc = self.gc
+        assert gc.set_gc_param(rgc.PARAM_MAJOR_COLLECT, 1.5)
+        assert gc.get_gc_param(rgc.PARAM_MAJOR_COLLECT) == 1.5
+        assert not gc.set_gc_param(rgc.PARAM_MAJOR_COLLECT, 1.0)
+        assert not gc.set_gc_param(rgc.PARAM_MAJOR_COLLECT, float('nan'))
+        assert gc.major_collection_threshold == 1.5
+        #
+        assert gc.set_gc_param(rgc.PARAM_GROWTH, 2.0)
+        assert gc.growth_rate_max == 2.0
+        assert not gc.set_gc_param(rgc.PARAM_GROWTH, 0.5)
+        #
+        assert gc.set_gc_param(rgc.PARAM_INCREMENT_STEP, 4096.0)
+        assert gc.gc_increment_step == 4096
+        assert not gc.set_gc_param(rgc.PARAM_INCREMENT_STEP, 0.0)
+        #
+        assert gc.set_gc_param(rgc.PARAM_MAX_DELTA, 1e6)
+        assert gc.max_delta == 1e6
+        assert not gc.set_gc_param(rgc.PARAM_MAX_DELTA, -5.0)
+        #
+        assert gc.set_gc_param(rgc.PARAM_MAX_HEAP_SIZE, 1e9)
+        assert gc.max_heap_size == 1e9
+        assert gc.next_major_collection_threshold <= 1e9
+        assert gc.set_gc_param(rgc.PARAM_MAX_HEAP_SIZE, 0.0)   # no limit
+        #
+        assert gc.set_gc_param(rgc.PARAM_MIN_HEAP_SIZE, 1e8)
+        assert gc.get_gc_param(rgc.PARAM_MIN_HEAP_SIZE) == 1e8
+        assert gc.next_major_collection_threshold >= 1e8
+        #
+        assert not gc.set_gc_param(-1, 1.0)
+        assert gc.get_gc_param(-1) == -1.0
+
 class TestIncrementalMiniMarkGCFull(DirectGCTest):
     from rpython.memory.gc.incminimark import IncrementalMiniMarkGC as GCClass
     def test_malloc_fixedsize_no_cleanup(self):
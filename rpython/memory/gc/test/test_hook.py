@@ -0,0 +1,266 @@
+from rpython.rlib import rgc
+from rpython.rtyper.lltypesystem import llmemory
+from rpython.rtyper.lltypesystem.llmemory import raw_malloc_usage
+from rpython.memory.gc.hook import GcHooks
+from rpython.memory.gc import incminimark
+from rpython.memory.gc.test.test_direct import BaseDirectGCTest, S, VAR
+from rpython.memory.gc.test.test_direct import WORD
+
+
+class MyGcHooks(GcHooks):
+
+    def __init__(self):
+        self.gc_minor_enabled = False
+        self.gc_collect_step_enabled = False
+        self.gc_collect_enabled = False
+        self.gc_alloc_sample_enabled = False
+
+    def is_gc_minor_enabled(self):
+        return self.gc_minor_enabled
+
+    def is_gc_collect_step_enabled(self):
+        return self.gc_collect_step_enabled
+
+    def is_gc_collect_enabled(self):
+        return self.gc_collect_enabled
+
+    def is_gc_alloc_sample_enabled(self):
+        return self.gc_alloc_sample_enabled
+
+    def reset(self):
+        self.minors = []
+        self.steps = []
+        self.collects = []
+        self.durations = []
+        self.samples = []
+        self.sample_types = []
+
+    def on_gc_minor(self, duration, total_memory_used, pinned_objects,
+                    surviving_size):
+        self.durations.append(duration)
+        self.minors.append({
+            'total_memory_used': total_memory_used,
+            'pinned_objects': pinned_objects,
+            'surviving_size': surviving_size})
+
+    def on_gc_collect_step(self, duration, oldstate, newstate):
+        self.durations.append(duration)
+        self.steps.append({
+            'oldstate': oldstate,
+            'newstate': newstate})
+
+    def on_gc_collect(self, num_major_collects,
+                      arenas_count_before, arenas_count_after,
+                      arenas_bytes, rawmalloc_bytes_before,
+                      rawmalloc_bytes_after):
+        self.collects.append({
+            'num_major_collects': num_major_collects,
+            'arenas_count_before': arenas_count_before,
+            'arenas_count_after': arenas_count_after,
+            'arenas_bytes': arenas_bytes,
+            'rawmalloc_bytes_before': rawmalloc_bytes_before,
+            'rawmalloc_bytes_after': rawmalloc_bytes_after})
+
+    def on_gc_alloc_sample(self, size, weight):
+        self.samples.append((size, weight))
+
+    def on_gc_alloc_sample_type(self, type_index):
+        self.sample_types.append(type_index)
+
+
+class TestIncMiniMarkHooks(BaseDirectGCTest):
+    from rpython.memory.gc.incminimark import IncrementalMiniMarkGC as GCClass
+
+    def setup_method(self, m):
+        BaseDirectGCTest.setup_method(self, m)
+        size = self.gc.fixed_size(self.get_type_id(S))
+        self.size_of_S = raw_malloc_usage(
+            size + self.gc.gcheaderbuilder.size_gc_header)
+
+    def get_hooks(self):
+        hooks = self.gc.hooks
+        assert isinstance(hooks, MyGcHooks)
+        hooks.reset()
+        return hooks
+
+    def test_default_hooks(self):
+        assert type(self.gc.hooks) is GcHooks
+        self.stackroots.append(self.malloc(S))
+        self.gc.collect()      # nothing is called
+
+    def test_on_gc_minor(self):
+        hooks = self.get_hooks()
+        hooks.gc_minor_enabled = True
+        self.malloc(S)
+        self.gc._minor_collection()
+        assert hooks.minors == [
+            {'total_memory_used': 0, 'pinned_objects': 0,
+             'surviving_size': 0}]
+        assert hooks.durations[0] >= 0
+        #
+        self.stackroots.append(self.malloc(S))
+        self.stackroots.append(self.malloc(S))
+        self.gc._minor_collection()
+        assert hooks.minors[1]['surviving_size'] == 2 * self.size_of_S
+        assert (hooks.minors[1]['total_memory_used'] ==
+                self.gc.get_total_memory_used())
+        #
+        hooks.gc_minor_enabled = False
+        self.gc._minor_collection()
+        assert len(hooks.minors) == 2
+    test_on_gc_minor.GC_PARAMS = {'hooks': MyGcHooks()}
+
+    def test_on_gc_collect(self):
+        hooks = self.get_hooks()
+        hooks.gc_collect_step_enabled = True
+        hooks.gc_collect_enabled = True
+        self.stackroots.append(self.malloc(S))
+        self.malloc(S)
+        self.gc.collect()
+        assert hooks.steps == [
+            {'oldstate': incminimark.STATE_SCANNING,
+             'newstate': incminimark.STATE_MARKING},
+            {'oldstate': incminimark.STATE_MARKING,
+             'newstate': incminimark.STATE_SWEEPING},
+            {'oldstate': incminimark.STATE_SWEEPING,
+             'newstate': incminimark.STATE_FINALIZING},
+            {'oldstate': incminimark.STATE_FINALIZING,
+             'newstate': incminimark.STATE_SCANNING}]
+        assert hooks.collects == [
+            {'num_major_collects': 1,
+             'arenas_count_before': 1,    # the survivors of the minor
+             'arenas_count_after': 1,
+             'arenas_bytes': self.size_of_S,
+             'rawmalloc_bytes_before': 0,
+             'rawmalloc_bytes_after': 0}]
+        self.gc.collect()
+        assert hooks.collects[1]['num_major_collects'] == 2
+        assert hooks.collects[1]['arenas_count_before'] == 1
+        assert hooks.collects[1]['arenas_count_after'] == 1
+    test_on_gc_collect.GC_PARAMS = {'hooks': MyGcHooks()}
+
+    def test_on_gc_alloc_sample(self):
+        hooks = self.get_hooks()
+        hooks.gc_alloc_sample_enabled = True
+        gc = self.gc
+        interval = 10 * self.size_of_S
+        assert gc.set_gc_param(rgc.PARAM_ALLOC_SAMPLE_INTERVAL, interval)
+        assert gc.get_gc_param(rgc.PARAM_ALLOC_SAMPLE_INTERVAL) == interval
+        for i in range(95):
+            self.malloc(S)
+        assert hooks.samples == [(self.size_of_S, interval)] * 9
+        # the type of the last sample is reported at the next sample
+        type_index = gc.get_member_index(self.get_type_id(S))
+        assert hooks.sample_types == [type_index] * 8
+        #
+        # the countdown goes on across minor collections
+        gc._minor_collection()
+        assert hooks.sample_types == [type_index] * 9
+        for i in range(6):
+            self.malloc(S)
+        assert len(hooks.samples) == 10
+        #
+        assert gc.set_gc_param(rgc.PARAM_ALLOC_SAMPLE_INTERVAL, 0)
+        assert hooks.sample_types == [type_index] * 10
+        for i in range(100):
+            self.malloc(S)
+        assert len(hooks.samples) == 10
+        assert gc.nursery_real_top == llmemory.NULL
+    test_on_gc_alloc_sample.GC_PARAMS = {'hooks': MyGcHooks()}
+
+    def test_alloc_sample_weight(self):
+        # objects bigger than the interval stand for several intervals
+        hooks = self.get_hooks()
+        hooks.gc_alloc_sample_enabled = True
+        gc = self.gc
+        interval = 2 * WORD
+        assert gc.set_gc_param(rgc.PARAM_ALLOC_SAMPLE_INTERVAL, interval)
+        for i in range(50):
+            self.malloc(VAR, 5)
+        assert len(hooks.samples) == 50
+        size_of_VAR = hooks.samples[0][0]
+        assert size_of_VAR > 2 * interval
+        total = 0
+        for size, weight in hooks.samples:
+            assert size == size_of_VAR
+            assert weight % interval == 0
+            assert size_of_VAR - interval < weight < size_of_VAR + interval
+            total += weight
+        assert 50 * size_of_VAR - interval <= total <= 50 * size_of_VAR
+    test_alloc_sample_weight.GC_PARAMS = {'hooks': MyGcHooks()}
+
+    def test_alloc_sample_nursery_changes(self):
+        # the lowered 'nursery_top' follows every change of the nursery
+        hooks = self.get_hooks()
+        hooks.gc_alloc_sample_enabled = True
+        gc = self.gc
+        size_of_S = self.size_of_S
+        interval = 10 * size_of_S
+        assert gc.set_gc_param(rgc.PARAM_ALLOC_SAMPLE_INTERVAL, interval)
+        for i in range(5):
+            self.malloc(S)
+        gc._minor_collection()
+        assert gc.nursery_real_top == gc.nursery + gc.nursery_size
+        assert gc.nursery_top == gc.nursery_free + 5 * size_of_S
+        for i in range(6):
+            self.malloc(S)
+        assert len(hooks.samples) == 1
+        #
+        newsize = gc.nursery_size * 2
+        assert gc.set_gc_param(rgc.PARAM_NURSERY_SIZE, newsize)
+        assert gc.nursery_size == newsize
+        assert gc.nursery_real_top == gc.nursery + newsize
+        assert gc.nursery_top == gc.nursery + 9 * size_of_S
+        for i in range(9):
+            self.malloc(S)
+        assert len(hooks.samples) == 1
+        self.malloc(S)
+        assert len(hooks.samples) == 2
+        #
+        # turning sampling off leaves the real 'nursery_top'
+        assert gc.set_gc_param(rgc.PARAM_ALLOC_SAMPLE_INTERVAL, 0)
+        assert gc.nursery_real_top == llmemory.NULL
+        assert gc.nursery_top == gc.nursery + newsize
+        gc._minor_collection()
+        assert gc.nursery_real_top == llmemory.NULL
+        assert gc.set_gc_param(rgc.PARAM_NURSERY_SIZE, newsize // 2)
+        assert gc.nursery_real_top == llmemory.NULL
+        assert gc.nursery_top == gc.nursery + newsize // 2
+        for i in range(100):
+            self.malloc(S)
+        assert len(hooks.samples) == 2
+        #
+        # the bytes skipped by raw_malloc_memory_pressure() are not counted
+        assert gc.set_gc_param(rgc.PARAM_ALLOC_SAMPLE_INTERVAL, interval)
+        for i in range(5):
+            self.malloc(S)
+        gc.raw_malloc_memory_pressure(gc.next_major_collection_threshold + 1)
+        assert gc.nursery_free == gc.nursery_real_top
+        for i in range(5):
+            self.malloc(S)
+        assert len(hooks.samples) == 2
+        self.malloc(S)
+        assert len(hooks.samples) == 3
+    test_alloc_sample_nursery_changes.GC_PARAMS = {'hooks': MyGcHooks()}
+
+    def test_get_stats(self):
+        gc = self.gc
+        assert gc.get_stats(rgc.MINOR_COLLECTIONS) == 0
+        assert gc.get_stats(rgc.MAJOR_COLLECTIONS) == 0
+        assert gc.get_stats(rgc.NURSERY_SIZE) == gc.nursery_size
+        self.stackroots.append(self.malloc(S))
+        assert gc.get_stats(rgc.NURSERY_USED) == self.size_of_S
+        gc._minor_collection()
+        assert gc.get_stats(rgc.NURSERY_USED) == 0
+        assert gc.get_stats(rgc.MINOR_COLLECTIONS) == 1
+        assert gc.get_stats(rgc.TOTAL_MEMORY) == self.size_of_S
+        assert gc.get_stats(rgc.TOTAL_ARENA_MEMORY) == self.size_of_S
+        assert gc.get_stats(rgc.TOTAL_RAWMALLOCED) == 0
+        assert gc.get_stats(rgc.ARENAS_COUNT) == 1
+        assert gc.get_stats(rgc.ARENA_SIZE) == gc.ac.arena_size
+        gc.debug_gc_step_until(incminimark.STATE_MARKING)
+        assert gc.get_stats(rgc.GC_STATE) == incminimark.STATE_MARKING
+        gc.collect()     # finishes the current major collection, too
+        assert gc.get_stats(rgc.MAJOR_COLLECTIONS) == 2
+        assert gc.get_stats(rgc.TOTAL_GC_TIME) >= 0
+        assert gc.get_stats(-1) == 0
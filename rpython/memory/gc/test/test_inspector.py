@@ -1,8 +1,8 @@
-import os
+import os, py
 from rpython.tool.udir import udir
 from rpython.memory.gc.test.test_direct import BaseDirectGCTest, S
 from rpython.memory.gc import inspector
-from rpython.rtyper.lltypesystem import llmemory
+from rpython.rtyper.lltypesystem import llmemory, rffi
 
 
 class InspectorTest(BaseDirectGCTest):
@@ -37,6 +37,54 @@ class InspectorTest(BaseDirectGCTest):
                     adr_q, 1, ASize(), -1]
         assert expected == seen
 
+    def test_dump_rpy_heap_compact(self):
+        p = self.malloc(S)
+        q = self.malloc(S)
+        self.write(p, 'next', q)
+        self.stackroots.append(p)
+        #
+        saved = inspector.CompactHeapDumper.flush.im_func
+        try:
+            seen = []
+            def my_flush(self):
+                for i in range(self.byte_count):
+                    seen.append(ord(self.bytebuffer[i]))
+                self.byte_count = 0
+            inspector.CompactHeapDumper.flush = my_flush
+            inspector.dump_rpy_heap(self.gc, -123456, compact=True)
+        finally:
+            inspector.CompactHeapDumper.flush = saved
+        #
+        magic = inspector.COMPACT_MAGIC
+        assert seen[:len(magic)] == [ord(c) for c in magic]
+        assert seen[len(magic)] == rffi.sizeof(rffi.LONG)
+        data = iter(seen[len(magic) + 1:])
+        def read():
+            result = shift = 0
+            while True:
+                b = data.next()
+                result |= (b & 0x7F) << shift
+                if b < 0x80:
+                    return result
+                shift += 7
+        def unzigzag(x):
+            return (x >> 1) ^ -(x & 1)
+        size_of_S = llmemory.raw_malloc_usage(
+            self.gc.fixed_size(self.get_type_id(S)))
+        first = inspector.COMPACT_FIRST_TYPE
+        assert read() == 1 + first            # p
+        adr_p = unzigzag(read())
+        assert read() == size_of_S
+        adr_q = adr_p + unzigzag(read() - 1)
+        assert read() == 0
+        assert read() == inspector.COMPACT_END_OF_ROOTS
+        assert read() == 1 + first            # q
+        assert adr_p + unzigzag(read()) == adr_q
+        assert read() == size_of_S
+        assert read() == 0
+        assert read() == inspector.COMPACT_END_OF_DUMP
+        py.test.raises(StopIteration, data.next)
+
 
 class TestHybridGC(InspectorTest):
     from rpython.memory.gc.hybrid import HybridGC as GCClass
@@ -46,3 +94,14 @@ class TestMiniMarkGCSimple(InspectorTest):
     from rpython.memory.gc.minimarktest import SimpleArenaCollection
     GC_PARAMS = {'ArenaCollectionClass': SimpleArenaCollection,
                  "card_page_indices": 4}
+
+
+def test_translate_dump_rpy_heap_with_other_gcs():
+    # dump_rpy_heap() is always annotated by the framework GC transformer,
+    # with sizes that are not known to be nonneg for these GCs
+    from rpython.translator.interactive import Translation
+    def f():
+        return 0
+    for gc in ['semispace', 'hybrid']:
+        t = Translation(f, [], gc=gc)
+        t.source_c()
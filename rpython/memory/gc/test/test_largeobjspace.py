@@ -0,0 +1,100 @@
+from rpython.memory.gc.largeobjspace import LargeObjectSpace
+from rpython.memory.gc.largeobjspace import CHUNK_HEADER, CHUNK_NULL
+from rpython.rtyper.lltypesystem import lltype, llmemory, llarena
+
+NULL = llmemory.NULL
+UNIT = 256
+CHUNK = 64 * UNIT
+hdrsize = llmemory.raw_malloc_usage(llmemory.sizeof(CHUNK_HEADER))
+HDRUNITS = (hdrsize + UNIT - 1) // UNIT
+FREEUNITS = 64 - HDRUNITS
+
+
+def chunk_of(block):
+    assert isinstance(block, llarena.fakearenaaddress)
+    return block.arena
+
+def reserve(block, nbytes):
+    # put an object in the block, like the GC does
+    llarena.arena_reserve(block, llmemory.sizeof(lltype.Char) * nbytes)
+
+
+def test_malloc_in_one_chunk():
+    los = LargeObjectSpace(CHUNK, UNIT, UNIT)
+    assert los.header_units == HDRUNITS
+    a = los.malloc(UNIT)
+    b = los.malloc(3 * UNIT - 5)
+    c = los.malloc(UNIT + 1)
+    assert chunk_of(a) is chunk_of(b) is chunk_of(c)
+    assert a.offset == HDRUNITS * UNIT
+    assert b.offset == a.offset + UNIT
+    assert c.offset == b.offset + 3 * UNIT
+    assert los.total_memory_used == 6 * UNIT
+    assert los.total_memory_mapped == CHUNK
+    chunk = los.chunks_with_free_units
+    assert chunk.nfreeunits == FREEUNITS - 6
+    assert chunk.nextchunk == CHUNK_NULL
+
+def test_free_and_reuse_first_fit():
+    los = LargeObjectSpace(CHUNK, UNIT, UNIT)
+    a = los.malloc(2 * UNIT)
+    b = los.malloc(3 * UNIT)
+    c = los.malloc(UNIT)
+    reserve(b, 3 * UNIT)
+    los.free(b)
+    assert los.total_memory_used == 3 * UNIT
+    d = los.malloc(4 * UNIT)      # doesn't fit in the hole
+    assert d.offset == c.offset + UNIT
+    e = los.malloc(2 * UNIT)      # fits in the hole left by 'b'
+    assert e.offset == b.offset
+    f = los.malloc(UNIT)          # fits in the rest of the hole
+    assert f.offset == b.offset + 2 * UNIT
+    g = los.malloc(UNIT)
+    assert g.offset == d.offset + 4 * UNIT
+
+def test_full_chunks_and_free_empty_chunks():
+    los = LargeObjectSpace(CHUNK, UNIT, UNIT)
+    a = los.malloc(FREEUNITS * UNIT)
+    assert los.chunks_with_free_units == CHUNK_NULL    # full
+    b = los.malloc(UNIT)
+    assert chunk_of(b) is not chunk_of(a)
+    assert los.total_memory_mapped == 2 * CHUNK
+    los.free(a)
+    assert los.chunks_with_free_units.nextchunk     # both chunks in the list
+    c = los.malloc(2 * UNIT)
+    assert chunk_of(c) is chunk_of(a)      # most recently freed first
+    los.free(b)
+    los.free(c)
+    assert los.total_memory_used == 0
+    assert los.total_memory_mapped == 2 * CHUNK
+    los.free_empty_chunks()
+    assert los.total_memory_mapped == 0
+    assert los.chunks_with_free_units == CHUNK_NULL
+    assert chunk_of(a).freed and chunk_of(b).freed
+
+def test_dedicated_chunk():
+    los = LargeObjectSpace(CHUNK, UNIT, UNIT)
+    a = los.malloc(FREEUNITS * UNIT + 1)
+    assert a.offset == HDRUNITS * UNIT
+    assert chunk_of(a).nbytes == (HDRUNITS + FREEUNITS + 1) * UNIT
+    assert los.chunks_with_free_units == CHUNK_NULL
+    assert los.total_memory_used == (FREEUNITS + 1) * UNIT
+    reserve(a, FREEUNITS * UNIT + 1)
+    los.free(a)
+    assert chunk_of(a).freed
+    assert los.total_memory_used == 0
+    assert los.total_memory_mapped == 0
+
+def test_hugepages_and_out_of_memory(monkeypatch):
+    seen = []
+    def arena_mmap(nbytes, alignment, hugepages):
+        seen.append((nbytes, alignment, hugepages))
+        return NULL
+    monkeypatch.setattr(llarena, 'arena_mmap', arena_mmap)
+    los = LargeObjectSpace(CHUNK, UNIT, UNIT)
+    los.hugepages = True
+    assert los.malloc(UNIT) == NULL
+    assert los.malloc(CHUNK) == NULL
+    assert seen == [(CHUNK, CHUNK, True),
+                    (CHUNK + HDRUNITS * UNIT, CHUNK, True)]
+    assert los.total_memory_used == los.total_memory_mapped == 0
@@ -402,11 +402,49 @@ def test_mass_free_half_page_becomes_more_free():
 
 # ____________________________________________________________
 
-def test_random(incremental=False):
+def test_release_free_pages(monkeypatch):
+    released = []
+    def arena_reset(addr, size, zero):
+        if zero >= 4:
+            assert size == pagesize      # the whole page
+            released.append(addr)
+        prev_arena_reset(addr, size, zero)
+    prev_arena_reset = llarena.arena_reset
+    monkeypatch.setattr(llarena, 'arena_reset', arena_reset)
+    #
+    pagesize = hdrsize + 7*WORD
+    ac = arena_collection_for_test(pagesize, "#.2.", fill_with_objects=2)
+    assert ac.release_free_pages == 0     # off by default
+    ac.release_free_pages = 4
+    arena = ac.current_arena
+    ac.mass_free(OkToFree(ac, False))
+    assert released == [pagenum(ac, 1), pagenum(ac, 3)]
+    assert arena.nreleasedpages == arena.nfreepages == 2
+    assert freepages(ac) == NULL
+    del released[:]
+    ac.mass_free(OkToFree(ac, False))
+    assert released == []      # already done
+    #
+    ac.mass_free(OkToFree(ac, True))
+    assert sorted(released) == [pagenum(ac, 0), pagenum(ac, 2)]
+    assert arena.nreleasedpages == arena.nfreepages == 4
+    #
+    page = ac.allocate_new_page(2)
+    assert arena.nreleasedpages == arena.nfreepages == 3
+    assert llmemory.cast_ptr_to_adr(page) == released[-1]
+    del released[:]
+    ac.release_free_pages = 0
+    ac.mass_free(OkToFree(ac, True))
+    assert released == []
+    assert arena.nfreepages == 4
+    assert arena.nreleasedpages == 3
+
+def test_random(incremental=False, release_free_pages=0):
     import random
     pagesize = hdrsize + 24*WORD
     num_pages = 3
     ac = arena_collection_for_test(pagesize, " " * num_pages)
+    ac.release_free_pages = release_free_pages
     live_objects = {}
     #
     # Run the test until three arenas are freed.  This is a quick test
@@ -477,3 +515,7 @@ def test_random(incremental=False):
 
 def test_random_incremental():
     test_random(incremental=True)
+
+def test_random_release_free_pages():
+    test_random(release_free_pages=4)
+    test_random(incremental=True, release_free_pages=5)
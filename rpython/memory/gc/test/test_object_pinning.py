@@ -2,6 +2,7 @@ import py
 from rpython.rtyper.lltypesystem import lltype, llmemory, llarena
 from rpython.memory.gc.incminimark import IncrementalMiniMarkGC, WORD
 from rpython.memory.gc.incminimark import GCFLAG_VISITED
+from rpython.rlib import rgc
 from test_direct import BaseDirectGCTest
 
 T = lltype.GcForwardReference()
@@ -115,6 +116,32 @@ class TestIncminimark(PinningGCTest):
         assert not self.gc.pin(old_adr)
         assert self.gc.pinned_objects_in_nursery == 0
 
+    def test_set_nursery_size_with_pinned_object(self):
+        # scenario: a new nursery size is requested while an object is
+        # pinned.  The nursery is replaced only after the object is unpinned
+        # and a minor collection moved it out.
+        ptr = self.malloc(T)
+        ptr.someInt = 100
+        self.stackroots.append(ptr)
+        adr = llmemory.cast_ptr_to_adr(ptr)
+        assert self.gc.pin(adr)
+        oldsize = self.gc.nursery_size
+        newsize = oldsize * 2
+        assert self.gc.set_gc_param(rgc.PARAM_NURSERY_SIZE, newsize)
+        assert self.gc.nursery_size == oldsize      # not yet
+        assert self.gc.pending_nursery_size == newsize
+        assert self.gc.get_gc_param(rgc.PARAM_NURSERY_SIZE) == newsize
+        assert self.gc.is_in_nursery(adr)
+        assert self.stackroots[0].someInt == 100
+        #
+        self.gc.unpin(adr)
+        self.gc.minor_collection()
+        assert self.gc.nursery_size == newsize
+        assert self.gc.pending_nursery_size == 0
+        assert self.stackroots[0].someInt == 100
+        assert not self.gc.is_in_nursery(
+            llmemory.cast_ptr_to_adr(self.stackroots[0]))
+
     
     def pin_pin_pinned_object_count(self, collect_func):
         # scenario: pin two objects that are referenced from stackroots. Check
@@ -116,7 +116,7 @@ def find_clean_setarrayitems(collect_analyzer, graph):
 class BaseFrameworkGCTransformer(GCTransformer):
     root_stack_depth = None    # for tests to override
 
-    def __init__(self, translator):
+    def __init__(self, translator, gchooks=None):
         from rpython.memory.gc.base import choose_gc_from_config
 
         super(BaseFrameworkGCTransformer, self).__init__(translator,
@@ -162,7 +162,8 @@ class BaseFrameworkGCTransformer(GCTransformer):
         self.finalizer_queue_indexes = {}
         self.finalizer_handlers = []
 
-        gcdata.gc = GCClass(translator.config.translation, **GC_PARAMS)
+        gcdata.gc = GCClass(translator.config.translation, hooks=gchooks,
+                            **GC_PARAMS)
         root_walker = self.build_root_walker()
         root_walker.finished_minor_collection_func = finished_minor_collection
         self.root_walker = root_walker
@@ -447,7 +448,8 @@ class BaseFrameworkGCTransformer(GCTransformer):
                                          annmodel.SomeBool(),
                                          minimal_transform=False)
         self.dump_rpy_heap_ptr = getfn(inspector.dump_rpy_heap,
-                                       [s_gc, annmodel.SomeInteger()],
+                                       [s_gc, annmodel.SomeInteger(),
+                                        annmodel.s_Bool],
                                        annmodel.s_Bool,
                                        minimal_transform=False)
         self.get_typeids_z_ptr = getfn(inspector.get_typeids_z,
@@ -465,6 +467,17 @@ class BaseFrameworkGCTransformer(GCTransformer):
                                             annmodel.SomeInteger(nonneg=True)],
                                            annmodel.s_None)
 
+        self.get_stats_ptr = getfn(GCClass.get_stats.im_func,
+                                   [s_gc, annmodel.SomeInteger()],
+                                   annmodel.SomeInteger())
+        self.set_gc_param_ptr = getfn(GCClass.set_gc_param.im_func,
+                                      [s_gc, annmodel.SomeInteger(),
+                                       annmodel.SomeFloat()],
+                                      annmodel.s_Bool)
+        self.get_gc_param_ptr = getfn(GCClass.get_gc_param.im_func,
+                                      [s_gc, annmodel.SomeInteger()],
+                                      annmodel.SomeFloat())
+
         if hasattr(GCClass, 'rawrefcount_init'):
             self.rawrefcount_init_ptr = getfn(
                 GCClass.rawrefcount_init,
@@ -1129,6 +1142,27 @@ class BaseFrameworkGCTransformer(GCTransformer):
                                   self.c_const_gc,
                                   v_size])
 
+    def gct_gc_get_stats(self, hop):
+        [v_stat_no] = hop.spaceop.args
+        hop.genop("direct_call", [self.get_stats_ptr, self.c_const_gc,
+                                  v_stat_no],
+                  resultvar=hop.spaceop.result)
+
+    def gct_gc_set_param(self, hop):
+        # may do a minor collection, to install a new nursery
+        [v_param_no, v_value] = hop.spaceop.args
+        livevars = self.push_roots(hop)
+        hop.genop("direct_call", [self.set_gc_param_ptr, self.c_const_gc,
+                                  v_param_no, v_value],
+                  resultvar=hop.spaceop.result)
+        self.pop_roots(hop, livevars)
+
+    def gct_gc_get_param(self, hop):
+        [v_param_no] = hop.spaceop.args
+        hop.genop("direct_call", [self.get_gc_param_ptr, self.c_const_gc,
+                                  v_param_no],
+                  resultvar=hop.spaceop.result)
+
     def gct_gc_pin(self, hop):
         if not hasattr(self, 'pin_ptr'):
             c_false = rmodel.inputconst(lltype.Bool, False)
@@ -1249,9 +1283,9 @@ class BaseFrameworkGCTransformer(GCTransformer):
 
     def gct_gc_dump_rpy_heap(self, hop):
         livevars = self.push_roots(hop)
-        [v_fd] = hop.spaceop.args
+        [v_fd, v_compact] = hop.spaceop.args
         hop.genop("direct_call",
-                  [self.dump_rpy_heap_ptr, self.c_const_gc, v_fd],
+                  [self.dump_rpy_heap_ptr, self.c_const_gc, v_fd, v_compact],
                   resultvar=hop.spaceop.result)
         self.pop_roots(hop, livevars)
 
@@ -534,6 +534,18 @@ class GCTransformer(BaseGCTransformer):
         assert meth, "%s has no support for malloc_varsize with flavor %r" % (self, flavor)
         return self.varsize_malloc_helper(hop, flags, meth, [])
 
+    def gct_gc_get_stats(self, hop):
+        # overridden by the framework GCs
+        return hop.cast_result(rmodel.inputconst(lltype.Signed, 0))
+
+    def gct_gc_set_param(self, hop):
+        # overridden by the framework GCs
+        return hop.cast_result(rmodel.inputconst(lltype.Bool, False))
+
+    def gct_gc_get_param(self, hop):
+        # overridden by the framework GCs
+        return hop.cast_result(rmodel.inputconst(lltype.Float, -1.0))
+
     def gct_gc_add_memory_pressure(self, hop):
         if hasattr(self, 'raw_malloc_memory_pressure_ptr'):
             op = hop.spaceop
@@ -87,6 +87,15 @@ class GCManagedHeap(object):
         if hasattr(self.gc, 'raw_malloc_memory_pressure'):
             self.gc.raw_malloc_memory_pressure(size)
 
+    def get_stats(self, stat_no):
+        return self.gc.get_stats(stat_no)
+
+    def set_gc_param(self, param_no, value):
+        return self.gc.set_gc_param(param_no, value)
+
+    def get_gc_param(self, param_no):
+        return self.gc.get_gc_param(param_no)
+
     def shrink_array(self, p, smallersize):
         if hasattr(self.gc, 'shrink_array'):
             addr = llmemory.cast_ptr_to_adr(p)
@@ -7,13 +7,15 @@ from rpython.annotator import model as annmodel
 from rpython.rtyper.llannotation import SomePtr
 from rpython.rtyper.lltypesystem import lltype, llmemory, rffi, llgroup
 from rpython.memory.gctransform import framework, shadowstack
+from rpython.memory.gc.hook import GcHooks
 from rpython.rtyper.lltypesystem.lloperation import llop, void
 from rpython.rlib.objectmodel import compute_unique_id, we_are_translated
 from rpython.rlib.debug import ll_assert
 from rpython.rlib import rgc
 from rpython.conftest import option
 from rpython.rlib.rstring import StringBuilder
-from rpython.rlib.rarithmetic import LONG_BIT
+from rpython.rlib.rarithmetic import LONG_BIT, r_uint
+from rpython.rlib.nonconst import NonConstant
 from rpython.rtyper.rtyper import llinterp_backend
 
 
@@ -46,6 +48,7 @@ ARGS = lltype.FixedSizeArray(lltype.Signed, 3)
 
 class GCTest(object):
     gcpolicy = None
+    gchooks = None
     GC_CAN_MOVE = False
     taggedpointers = False
 
@@ -112,7 +115,8 @@ class GCTest(object):
                 fixup(t)
 
         cbuild = CStandaloneBuilder(t, entrypoint, config=t.config,
-                                    gcpolicy=cls.gcpolicy)
+                                    gcpolicy=cls.gcpolicy,
+                                    gchooks=cls.gchooks)
         cbuild.make_entrypoint_wrapper = False
         db = cbuild.build_database()
         entrypointptr = cbuild.getentrypointptr()
@@ -1438,9 +1442,95 @@ class TestIncrementalMiniMarkGC(TestMiniMarkGC):
         res = run([])
         assert res
 
+    def define_set_gc_param(cls):
+        S = lltype.GcStruct('S', ('x', lltype.Signed))
+        def f():
+            s = lltype.malloc(S)
+            s.x = 42
+            oldsize = rgc.get_gc_param(rgc.PARAM_NURSERY_SIZE)
+            ok = rgc.set_gc_param(rgc.PARAM_NURSERY_SIZE, oldsize * 2)
+            newsize = rgc.get_gc_param(rgc.PARAM_NURSERY_SIZE)
+            bad = rgc.set_gc_param(rgc.PARAM_MAJOR_COLLECT, 0.5)
+            return (ok * 1000 + (newsize == oldsize * 2) * 100 +
+                    (not bad) * 10 + (s.x == 42))
+        return f
+
+    def test_set_gc_param(self):
+        run = self.runner("set_gc_param")
+        res = run([])
+        assert res == 1111
+
 # ________________________________________________________________
 # tagged pointers
 
+class CountingGcHooks(GcHooks):
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.minors = 0
+        self.steps = 0
+        self.collects = 0
+
+    def is_gc_minor_enabled(self):
+        return True
+
+    def is_gc_collect_step_enabled(self):
+        return True
+
+    def is_gc_collect_enabled(self):
+        return True
+
+    def on_gc_minor(self, duration, total_memory_used, pinned_objects,
+                    surviving_size):
+        self.minors += 1
+
+    def on_gc_collect_step(self, duration, oldstate, newstate):
+        self.steps += 1
+
+    def on_gc_collect(self, num_major_collects,
+                      arenas_count_before, arenas_count_after,
+                      arenas_bytes, rawmalloc_bytes_before,
+                      rawmalloc_bytes_after):
+        self.collects += 1
+
+
+class TestIncrementalMiniMarkGCHooks(GCTest):
+    gcname = "incminimark"
+    gcpolicy = TestIncrementalMiniMarkGC.gcpolicy
+    gchooks = CountingGcHooks()
+
+    def define_gc_hooks(cls):
+        gchooks = cls.gchooks
+        S = lltype.GcStruct('S', ('x', lltype.Signed))
+        def f():
+            if NonConstant(False):
+                # annotate the hooks now, before the GC is annotated
+                i = NonConstant(-42)
+                u = NonConstant(r_uint(42))
+                gchooks.fire_gc_minor(i, u, i, i)
+                gchooks.fire_gc_collect_step(i, i, i)
+                gchooks.fire_gc_collect(i, i, i, u, u, u)
+            gchooks.reset()
+            for i in range(100):
+                lltype.malloc(S)
+            rgc.collect()
+            minors = rgc.get_stats(rgc.MINOR_COLLECTIONS)
+            majors = rgc.get_stats(rgc.MAJOR_COLLECTIONS)
+            return ((gchooks.minors > 0) * 10000 +
+                    (gchooks.steps >= 4) * 1000 +
+                    (gchooks.collects == 1) * 100 +
+                    (minors > 0) * 10 +
+                    (majors > 0))
+        return f
+
+    def test_gc_hooks(self):
+        run = self.runner("gc_hooks")
+        res = run([])
+        assert res == 11111
+
+
 class TaggedPointerGCTests(GCTest):
     taggedpointers = True
 
@@ -547,8 +547,10 @@ PARAMETER_DOCS = {
     'trace_eagerness': 'number of times a guard has to fail before we start compiling a bridge',
     'decay': 'amount to regularly decay counters by (0=none, 1000=max)',
     'trace_limit': 'number of recorded operations before we abort tracing with ABORT_TOO_LONG',
+    'pause_limit': 'if tracing and compiling one loop or bridge takes longer than this many milliseconds, halve trace_limit, down to 1/8 of its value; it is doubled again after 16 shorter pauses in a row (0=off)',
     'inlining': 'inline python functions or not (1/0)',
     'loop_longevity': 'a parameter controlling how long loops will be kept before being freed, an estimate',
+    'jit_code_max_bytes': 'maximum size of the machine code kept for loops, the least recently used are freed first (0=no limit)',
     'retrace_limit': 'how many times we can try retracing before giving up',
     'max_retrace_guards': 'number of extra guards a retrace can cause',
     'max_unroll_loops': 'number of extra unrollings a loop can cause',
@@ -568,8 +570,10 @@ PARAMETERS = {'threshold': 1039, # just above 1024, prime
               'trace_eagerness': 200,
               'decay': 40,
               'trace_limit': 6000,
+              'pause_limit': 0,
               'inlining': 1,
               'loop_longevity': 1000,
+              'jit_code_max_bytes': 0,
               'retrace_limit': 0,
               'max_retrace_guards': 15,
               'max_unroll_loops': 0,
@@ -1102,7 +1106,8 @@ class JitHookInterface(object):
     def on_trace_too_long(self, jitdriver, greenkey, greenkey_repr):
         """ A hook called each time we abort the trace because it's too
         long with the greenkey being the one responsible for the
-        disabled function
+        disabled function, or the start of the trace that is going to
+        be split
         """
 
     #def before_optimize(self, debug_info):
@@ -1313,9 +1318,13 @@ class Counters(object):
     ABORT_BAD_LOOP
     ABORT_ESCAPE
     ABORT_FORCE_QUASIIMMUT
+    TRACE_SPLITS
     NVIRTUALS
     NVHOLES
     NVREUSED
+    RESUME_NUMBERINGS
+    RESUME_BYTES
+    RESUME_BYTES_UNSHARED
     TOTAL_COMPILED_LOOPS
     TOTAL_COMPILED_BRIDGES
     TOTAL_FREED_LOOPS
@@ -120,6 +120,10 @@ def stats_get_counter_value(warmrunnerdesc, no):
 def stats_get_times_value(warmrunnerdesc, no):
     return warmrunnerdesc.metainterp_sd.profiler.get_times(no)
 
+@register_helper(annmodel.SomeFloat())
+def stats_get_max_pause(warmrunnerdesc):
+    return warmrunnerdesc.metainterp_sd.profiler.get_max_pause()
+
 LOOP_RUN_CONTAINER = lltype.GcArray(lltype.Struct('elem',
                                                   ('type', lltype.Char),
                                                   ('number', lltype.Signed),
@@ -137,6 +141,22 @@ def stats_asmmemmgr_allocated(warmrunnerdesc):
 def stats_asmmemmgr_used(warmrunnerdesc):
     return warmrunnerdesc.metainterp_sd.cpu.asmmemmgr.get_stats()[1]
 
+@register_helper(annmodel.SomeInteger())
+def stats_memmgr_max_bytes(warmrunnerdesc):
+    return warmrunnerdesc.memory_manager.max_bytes
+
+@register_helper(annmodel.SomeInteger())
+def stats_memmgr_code_bytes(warmrunnerdesc):
+    return warmrunnerdesc.memory_manager.code_bytes
+
+@register_helper(annmodel.SomeInteger())
+def stats_memmgr_evicted_loops(warmrunnerdesc):
+    return warmrunnerdesc.memory_manager.evicted_loops
+
+@register_helper(annmodel.SomeInteger())
+def stats_memmgr_evicted_bytes(warmrunnerdesc):
+    return warmrunnerdesc.memory_manager.evicted_bytes
+
 # ---------------------- jitcell interface ----------------------
 
 def _new_hook(name, resulttype):
@@ -616,6 +616,94 @@ class AddMemoryPressureEntry(ExtRegistryEntry):
                          resulttype=lltype.Void)
 
 
+# the statistics returned by get_stats()
+TOTAL_MEMORY = 0            # bytes used by the objects outside the nursery
+TOTAL_ARENA_MEMORY = 1      # the part of TOTAL_MEMORY in the arenas
+TOTAL_RAWMALLOCED = 2       # the part of TOTAL_MEMORY that is raw-malloced
+ARENAS_COUNT = 3            # number of arenas currently allocated
+ARENA_SIZE = 4              # size of each arena, in bytes
+NURSERY_SIZE = 5            # size of the nursery, in bytes
+NURSERY_USED = 6            # bytes currently allocated in the nursery
+MINOR_COLLECTIONS = 7       # number of minor collections done so far
+MAJOR_COLLECTIONS = 8       # number of major collections done so far
+TOTAL_GC_TIME = 9           # ticks spent in the GC, see rtimer
+GC_STATE = 10               # incminimark: one of the STATE_xxx numbers
+
+def get_stats(stat_no):
+    """Return one of the statistics of the GC, as a cheap snapshot.  See
+    the constants above for the possible values of 'stat_no'.  The GCs
+    that don't track a value return 0 (and so does this function when
+    not translated).
+    """
+    return 0
+
+class GetStatsEntry(ExtRegistryEntry):
+    _about_ = get_stats
+
+    def compute_result_annotation(self, s_stat_no):
+        from rpython.annotator.model import SomeInteger
+        return SomeInteger()
+
+    def specialize_call(self, hop):
+        [v_stat_no] = hop.inputargs(lltype.Signed)
+        hop.exception_cannot_occur()
+        return hop.genop('gc_get_stats', [v_stat_no], resulttype=lltype.Signed)
+
+
+# the tuning parameters of set_gc_param() and get_gc_param(); by default
+# they come from the PYPY_GC_* environment variables (see gc/env.py)
+PARAM_NURSERY_SIZE = 0      # PYPY_GC_NURSERY, in bytes
+PARAM_MAJOR_COLLECT = 1     # PYPY_GC_MAJOR_COLLECT, a factor > 1.0
+PARAM_GROWTH = 2            # PYPY_GC_GROWTH, a factor > 1.0
+PARAM_MIN_HEAP_SIZE = 3     # PYPY_GC_MIN, in bytes
+PARAM_MAX_HEAP_SIZE = 4     # PYPY_GC_MAX, in bytes, 0 for no limit
+PARAM_MAX_DELTA = 5         # PYPY_GC_MAX_DELTA, in bytes
+PARAM_INCREMENT_STEP = 6    # PYPY_GC_INCREMENT_STEP, in bytes
+PARAM_ALLOC_SAMPLE_INTERVAL = 7  # in bytes, 0 for off; see GcHooks
+
+def set_gc_param(param_no, value):
+    """Change one of the tuning parameters of the GC while the program
+    runs.  Returns False if the GC doesn't support this parameter or if
+    'value' is out of bounds (and then nothing is changed).  A new
+    nursery size takes effect at the end of the next minor collection
+    that leaves no pinned object in the nursery, normally immediately.
+    """
+    return False
+
+def get_gc_param(param_no):
+    """Return the current value of one of the tuning parameters of the
+    GC, as a float, or -1.0 if the GC doesn't support it (and so does
+    this function when not translated).
+    """
+    return -1.0
+
+class SetGcParamEntry(ExtRegistryEntry):
+    _about_ = set_gc_param
+
+    def compute_result_annotation(self, s_param_no, s_value):
+        from rpython.annotator.model import s_Bool
+        return s_Bool
+
+    def specialize_call(self, hop):
+        v_param_no, v_value = hop.inputargs(lltype.Signed, lltype.Float)
+        hop.exception_cannot_occur()
+        return hop.genop('gc_set_param', [v_param_no, v_value],
+                         resulttype=lltype.Bool)
+
+class GetGcParamEntry(ExtRegistryEntry):
+    _about_ = get_gc_param
+
+    def compute_result_annotation(self, s_param_no):
+        from rpython.annotator.model import SomeFloat
+        return SomeFloat()
+
+    def specialize_call(self, hop):
+        [v_param_no] = hop.inputargs(lltype.Signed)
+        hop.exception_cannot_occur()
+        return hop.genop('gc_get_param', [v_param_no],
+                         resulttype=lltype.Float)
+
+
 @not_rpython
 def get_rpy_memory_usage(gcref):
     # approximate implementation using CPython's type info
@@ -641,7 +729,10 @@ def cast_gcref_to_int(gcref):
         return id(gcref._x)
 
 @not_rpython
-def dump_rpy_heap(fd):
+def dump_rpy_heap(fd, compact=False):
+    """Write a dump of the whole heap to the file descriptor 'fd'; see
+    gc.dump_rpy_heap() at app-level and memory/gc/inspector.py for the
+    two formats."""
     raise NotImplementedError
 
 @not_rpython
@@ -874,11 +965,16 @@ class Entry(ExtRegistryEntry):
 
 class Entry(ExtRegistryEntry):
     _about_ = dump_rpy_heap
-    def compute_result_annotation(self, s_fd):
+    def compute_result_annotation(self, s_fd, s_compact=None):
         from rpython.annotator.model import s_Bool
         return s_Bool
-    def specialize_call(self, hop):
-        vlist = hop.inputargs(lltype.Signed)
+    def specialize_call(self, hop, i_compact=None):
+        from rpython.flowspace.model import Constant
+        if hop.nb_args == 2:
+            vlist = hop.inputargs(lltype.Signed, lltype.Bool)
+        else:
+            vlist = hop.inputargs(lltype.Signed)
+            vlist.append(Constant(False, concretetype=lltype.Bool))
         hop.exception_is_here()
         return hop.genop('gc_dump_rpy_heap', vlist, resulttype = hop.r_result)
 
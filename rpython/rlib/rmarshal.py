@@ -284,6 +284,7 @@ class Loader(object):
     def __init__(self, buf):
         self.buf = buf
         self.pos = 0
+        self.wanted = 0     # hint for need_more_data(): size needed in buf
 
     def check_finished(self):
         if self.pos != len(self.buf):
@@ -303,6 +304,7 @@ def readstr(loader, count):
         end = ovfcheck(pos + count)
     except OverflowError:
         raise ValueError("cannot decode count: value too big")
+    loader.wanted = end
     while end > len(loader.buf):
         loader.need_more_data()
     loader.pos = end
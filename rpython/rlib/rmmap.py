@@ -77,6 +77,8 @@ if _POSIX:
         rffi_platform.DefinedConstantInteger('MADV_DONTNEED'))
     CConfig.MADV_FREE = (
         rffi_platform.DefinedConstantInteger('MADV_FREE'))
+    CConfig.MADV_HUGEPAGE = (
+        rffi_platform.DefinedConstantInteger('MADV_HUGEPAGE'))
 
 elif _MS_WINDOWS:
     constant_names = ['PAGE_READONLY', 'PAGE_READWRITE', 'PAGE_WRITECOPY',
@@ -298,6 +300,9 @@ class MMap(object):
         self.pos = 0
         self.access = access
         self.offset = offset
+        # True if the pages are anonymous or private and writable, i.e.
+        # memory of the process instead of the page cache of a file
+        self.private_memory = False
 
         if _MS_WINDOWS:
             self.map_handle = NULL_HANDLE
@@ -693,9 +698,11 @@ if _POSIX:
             m.fd = -1
 
             flags |= MAP_ANONYMOUS
+            m.private_memory = True
 
         else:
             m.fd = os.dup(fd)
+            m.private_memory = bool(flags & MAP_PRIVATE and prot & PROT_WRITE)
 
         # XXX if we use hintp below in alloc, the NonConstant
         #     is necessary since we want a general version of c_mmap
@@ -805,6 +812,55 @@ if _POSIX:
         def madvise_free(addr, map_size):
             "No madvise() on this platform"
 
+    if has_madvise and MADV_DONTNEED is not None:
+        def madvise_dontneed(addr, map_size):
+            # Unlike madvise_free(), which lets the OS take the pages
+            # back only when it runs short of memory, this gives them
+            # back immediately: the RSS of the process drops, but the
+            # next access to these pages is a bit slower.
+            c_madvise_safe(rffi.cast(PTR, addr),
+                           rffi.cast(size_t, map_size),
+                           rffi.cast(rffi.INT, MADV_DONTNEED))
+    else:
+        madvise_dontneed = madvise_free
+
+    if has_madvise and MADV_HUGEPAGE is not None:
+        def madvise_hugepage(addr, map_size):
+            # Ask for transparent huge pages.  Ignored by the kernel if
+            # they are not supported or disabled.
+            c_madvise_safe(rffi.cast(PTR, addr),
+                           rffi.cast(size_t, map_size),
+                           rffi.cast(rffi.INT, MADV_HUGEPAGE))
+    else:
+        def madvise_hugepage(addr, map_size):
+            "No transparent huge pages on this platform"
+
+    def alloc_aligned(map_size, alignment):
+        """Allocate zero-filled read-write memory, at an address that is
+        a multiple of 'alignment' (a power of two and a multiple of the
+        page size).  Returns NULL if it fails.  Free it with munmap().
+        """
+        flags = MAP_PRIVATE | MAP_ANONYMOUS
+        prot = PROT_READ | PROT_WRITE
+        if we_are_translated():
+            flags = NonConstant(flags)
+            prot = NonConstant(prot)
+        # map 'alignment' more bytes than needed, and unmap the extra
+        # memory at both ends
+        res = c_mmap_safe(rffi.cast(PTR, 0), map_size + alignment,
+                          prot, flags, -1, 0)
+        if res == rffi.cast(PTR, -1):
+            return rffi.cast(PTR, 0)
+        start = rffi.cast(lltype.Signed, res)
+        aligned = (start + alignment - 1) & ~(alignment - 1)
+        if aligned > start:
+            c_munmap_safe(res, aligned - start)
+        if start + alignment > aligned:
+            c_munmap_safe(rffi.cast(PTR, aligned + map_size),
+                          start + alignment - aligned)
+        return rffi.cast(PTR, aligned)
+    alloc_aligned._annenforceargs_ = (int, int)
+
 elif _MS_WINDOWS:
     def mmap(fileno, length, tagname="", access=_ACCESS_DEFAULT, offset=0):
         # XXX flags is or-ed into access by now.
@@ -868,6 +924,7 @@ elif _MS_WINDOWS:
         m = MMap(access, offset)
         m.file_handle = INVALID_HANDLE
         m.map_handle = INVALID_HANDLE
+        m.private_memory = not fh or access == ACCESS_COPY
         if fh:
             # it is necessary to duplicate the handle, so the
             # Python code can close it on us
@@ -965,3 +1022,5 @@ elif _MS_WINDOWS:
             rffi.cast(DWORD, PAGE_READWRITE))
         #from rpython.rlib import debug
         #debug.debug_print("madvise_free:", r)
+
+    madvise_dontneed = madvise_free
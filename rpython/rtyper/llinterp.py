@@ -727,6 +727,15 @@ class LLFrame(object):
     def op_gc_add_memory_pressure(self, size):
         self.heap.add_memory_pressure(size)
 
+    def op_gc_get_stats(self, stat_no):
+        return self.heap.get_stats(stat_no)
+
+    def op_gc_set_param(self, param_no, value):
+        return self.heap.set_gc_param(param_no, value)
+
+    def op_gc_get_param(self, param_no):
+        return self.heap.get_gc_param(param_no)
+
     def op_gc_fq_next_dead(self, fq_tag):
         return self.heap.gc_fq_next_dead(fq_tag)
 
@@ -327,6 +327,23 @@ def arena_free(arena_addr):
     assert not arena_addr.arena.objectptrs
     arena_addr.arena.mark_freed()
 
+def arena_free_background(arena_addr):
+    """Release an arena, possibly a bit later and from another thread.
+    Only worth it for arenas big enough that free() itself is costly."""
+    arena_free(arena_addr)
+
+def arena_mmap(nbytes, alignment, hugepages):
+    """Allocate and return a new zero-initialized arena with mmap(), at
+    an address that is a multiple of 'alignment' (a power of two and a
+    multiple of the page size).  If 'hugepages', ask the OS to use
+    transparent huge pages for it.  Returns NULL if it fails, or if it is
+    not supported on this platform.  Release it with arena_munmap()."""
+    return Arena(nbytes, True).getaddr(0)
+
+def arena_munmap(arena_addr, nbytes):
+    """Release an arena allocated with arena_mmap()."""
+    arena_free(arena_addr)
+
 def arena_reset(arena_addr, size, zero):
     """Free all objects in the arena, which can then be reused.
     This can also be used on a subrange of the arena.
@@ -337,6 +354,8 @@ def arena_reset(arena_addr, size, zero):
       * 3: fill with garbage
       * 4: large area of memory that can benefit from MADV_FREE
              (i.e. contains garbage, may be zero-filled or not)
+      * 5: same as 4, but give the memory back to the OS immediately
+             with MADV_DONTNEED
     """
     arena_addr = getfakearenaaddress(arena_addr)
     arena_addr.arena.reset(zero, arena_addr.offset, size)
@@ -454,7 +473,7 @@ else:
             return rmmap.PAGESIZE
     posixpagesize = PosixPageSize()
 
-def madvise_arena_free(baseaddr, size):
+def madvise_arena_free(baseaddr, size, dontneed=False):
     from rpython.rlib import rmmap
 
     pagesize = posixpagesize.get()
@@ -462,8 +481,12 @@ def madvise_arena_free(baseaddr, size):
     aligned_addr = (baseaddr + pagesize - 1) & ~(pagesize - 1)
     size -= (aligned_addr - baseaddr)
     if size >= pagesize:
-        rmmap.madvise_free(rffi.cast(rmmap.PTR, aligned_addr),
-                           size & ~(pagesize - 1))
+        if dontneed:
+            rmmap.madvise_dontneed(rffi.cast(rmmap.PTR, aligned_addr),
+                                   size & ~(pagesize - 1))
+        else:
+            rmmap.madvise_free(rffi.cast(rmmap.PTR, aligned_addr),
+                               size & ~(pagesize - 1))
 
 
 if os.name == "posix":
@@ -530,6 +553,54 @@ register_external(arena_free, [llmemory.Address], None, 'll_arena.arena_free',
                   llfakeimpl=arena_free,
                   sandboxsafe=True)
 
+if os.name == 'posix':
+    import py
+    from rpython.translator import cdir
+    _bgfree_eci = ExternalCompilationInfo(
+        includes=['src/background_free.h'],
+        include_dirs=[cdir],
+        separate_module_files=[py.path.local(cdir).join('src',
+                                                        'background_free.c')])
+    llimpl_background_free = rffi.llexternal('RPyBackgroundFree',
+                                             [llmemory.Address], lltype.Void,
+                                             compilation_info=_bgfree_eci,
+                                             sandboxsafe=True, _nowrapper=True)
+else:
+    llimpl_background_free = llimpl_free
+register_external(arena_free_background, [llmemory.Address], None,
+                  'll_arena.arena_free_background',
+                  llimpl=llimpl_background_free,
+                  llfakeimpl=arena_free_background,
+                  sandboxsafe=True)
+
+if os.name == 'posix':
+    def llimpl_arena_mmap(nbytes, alignment, hugepages):
+        from rpython.rlib import rmmap
+        p = rmmap.alloc_aligned(nbytes, alignment)
+        if p and hugepages:
+            rmmap.madvise_hugepage(p, nbytes)
+        return rffi.cast(llmemory.Address, p)
+
+    def llimpl_arena_munmap(arena_addr, nbytes):
+        from rpython.rlib import rmmap
+        rmmap.c_munmap_safe(rffi.cast(rmmap.PTR, arena_addr), nbytes)
+else:
+    def llimpl_arena_mmap(nbytes, alignment, hugepages):
+        return llmemory.NULL
+
+    def llimpl_arena_munmap(arena_addr, nbytes):
+        pass
+register_external(arena_mmap, [int, int, bool], llmemory.Address,
+                  'll_arena.arena_mmap',
+                  llimpl=llimpl_arena_mmap,
+                  llfakeimpl=arena_mmap,
+                  sandboxsafe=True)
+register_external(arena_munmap, [llmemory.Address, int], None,
+                  'll_arena.arena_munmap',
+                  llimpl=llimpl_arena_munmap,
+                  llfakeimpl=arena_munmap,
+                  sandboxsafe=True)
+
 def llimpl_arena_reset(arena_addr, size, zero):
     if zero:
         if zero == 1:
@@ -538,6 +609,8 @@ def llimpl_arena_reset(arena_addr, size, zero):
             llop.raw_memset(lltype.Void, arena_addr, ord('#'), size)
         elif zero == 4:
             madvise_arena_free(arena_addr, size)
+        elif zero == 5:
+            madvise_arena_free(arena_addr, size, dontneed=True)
         else:
             llmemory.raw_memclear(arena_addr, size)
 llimpl_arena_reset._always_inline_ = True
@@ -361,3 +361,49 @@ class TestStandalone(test_standalone.StandaloneTests):
             cbuilder.cmdexec('2', expect_crash=True)
             if sys.platform.startswith('win'):
                 ctypes.windll.kernel32.SetErrorMode(old_err_mode)
+
+    def test_compiled_arena_free_background(self):
+        if os.name != 'posix':
+            py.test.skip("posix only")
+        #
+        def free_many(n):
+            for i in range(n):
+                a = llarena.arena_malloc(100000 + 1000 * (i % 10), False)
+                llarena.arena_free_background(a)
+        #
+        def fn(argv):
+            free_many(1000)
+            pid = os.fork()
+            free_many(1000)     # the child must start its own thread
+            if pid == 0:
+                os._exit(0)
+            os.waitpid(pid, 0)
+            print 'ok'
+            return 0
+        #
+        t, cbuilder = self.compile(fn)
+        data = cbuilder.cmdexec('')
+        assert data == 'ok\n'
+
+    def test_compiled_arena_mmap(self):
+        if os.name != 'posix':
+            py.test.skip("posix only")
+        #
+        def fn(argv):
+            alignment = 2 * 1024 * 1024
+            size = 3 * alignment + 4096
+            for hugepages in [False, True]:
+                a = llarena.arena_mmap(size, alignment, hugepages)
+                assert a
+                assert llmemory.cast_adr_to_int(a) & (alignment - 1) == 0
+                assert a.signed[0] == 0
+                assert (a + (size - 1)).char[0] == '\x00'
+                a.signed[0] = 42
+                (a + (size - 1)).char[0] = 'x'
+                llarena.arena_munmap(a, size)
+            print 'ok'
+            return 0
+        #
+        t, cbuilder = self.compile(fn)
+        data = cbuilder.cmdexec('')
+        assert data == 'ok\n'
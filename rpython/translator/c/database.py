@@ -31,10 +31,12 @@ class LowLevelDatabase(object):
                  gcpolicyclass=None,
                  exctransformer=None,
                  thread_enabled=False,
-                 sandbox=False):
+                 sandbox=False,
+                 gchooks=None):
         self.translator = translator
         self.standalone = standalone
         self.sandbox    = sandbox
+        self.gchooks    = gchooks     # for the framework GCs, or None
         if gcpolicyclass is None:
             gcpolicyclass = gc.RefcountingGcPolicy
         self.gcpolicy = gcpolicyclass(self, thread_enabled)
@@ -64,7 +64,7 @@ class CBuilder(object):
     split = False
 
     def __init__(self, translator, entrypoint, config, gcpolicy=None,
-            secondary_entrypoints=()):
+            secondary_entrypoints=(), gchooks=None):
         self.translator = translator
         self.entrypoint = entrypoint
         self.entrypoint_name = getattr(self.entrypoint, 'func_name', None)
@@ -73,6 +73,7 @@ class CBuilder(object):
         self.gcpolicy = gcpolicy    # for tests only, e.g. rpython/memory/
         self.eci = self.get_eci()
         self.secondary_entrypoints = secondary_entrypoints
+        self.gchooks = gchooks
 
     def get_eci(self):
         pypy_include_dir = py.path.local(__file__).join('..')
@@ -93,7 +94,8 @@ class CBuilder(object):
                               gcpolicyclass=gcpolicyclass,
                               exctransformer=exctransformer,
                               thread_enabled=self.config.translation.thread,
-                              sandbox=self.config.translation.sandbox)
+                              sandbox=self.config.translation.sandbox,
+                              gchooks=self.gchooks)
         self.db = db
 
         # give the gc a chance to register interest in the start-up functions it
@@ -0,0 +1,95 @@
+#include "src/background_free.h"
+#include <stdlib.h>
+#include <pthread.h>
+#include <signal.h>
+
+/* The blocks to free are pushed on a lock-free stack, linked by their
+   first word.  The helper thread always takes the whole stack at once,
+   so there is no ABA problem.  The mutex and the condition variable are
+   only used to let the helper thread sleep while the stack is empty. */
+
+static void *volatile pending_blocks = NULL;
+static pthread_mutex_t bgfree_mutex = PTHREAD_MUTEX_INITIALIZER;
+static pthread_cond_t bgfree_cond = PTHREAD_COND_INITIALIZER;
+static int bgfree_state = 0;     /* 0: not started, 1: running, -1: failed */
+static int bgfree_atfork_done = 0;
+
+static void *bgfree_thread(void *arg)
+{
+    void *p, *next;
+    while (1) {
+        pthread_mutex_lock(&bgfree_mutex);
+        while (pending_blocks == NULL)
+            pthread_cond_wait(&bgfree_cond, &bgfree_mutex);
+        pthread_mutex_unlock(&bgfree_mutex);
+
+        p = __sync_lock_test_and_set(&pending_blocks, NULL);
+        while (p != NULL) {
+            next = *(void **)p;
+            free(p);
+            p = next;
+        }
+    }
+    return NULL;
+}
+
+static void bgfree_after_fork_child(void)
+{
+    /* the helper thread does not exist in the child.  The blocks still
+       in 'pending_blocks' are freed by the next thread we start. */
+    pthread_mutex_init(&bgfree_mutex, NULL);
+    pthread_cond_init(&bgfree_cond, NULL);
+    bgfree_state = 0;
+}
+
+static int bgfree_start_thread(void)
+{
+    pthread_t th;
+    pthread_attr_t attr;
+    sigset_t all_signals, old_signals;
+    int state;
+
+    pthread_mutex_lock(&bgfree_mutex);
+    if (bgfree_state == 0) {
+        if (!bgfree_atfork_done) {
+            pthread_atfork(NULL, NULL, bgfree_after_fork_child);
+            bgfree_atfork_done = 1;
+        }
+        /* the signals must be delivered to the other threads */
+        sigfillset(&all_signals);
+        pthread_sigmask(SIG_SETMASK, &all_signals, &old_signals);
+        pthread_attr_init(&attr);
+        pthread_attr_setdetachstate(&attr, PTHREAD_CREATE_DETACHED);
+        pthread_attr_setstacksize(&attr, 65536);
+        if (pthread_create(&th, &attr, bgfree_thread, NULL) == 0)
+            bgfree_state = 1;
+        else
+            bgfree_state = -1;
+        pthread_attr_destroy(&attr);
+        pthread_sigmask(SIG_SETMASK, &old_signals, NULL);
+    }
+    state = bgfree_state;
+    pthread_mutex_unlock(&bgfree_mutex);
+    return state > 0;
+}
+
+void RPyBackgroundFree(void *p)
+{
+    void *old;
+
+    if (bgfree_state <= 0 && !bgfree_start_thread()) {
+        free(p);
+        return;
+    }
+    do {
+        old = pending_blocks;
+        *(void **)p = old;
+    } while (!__sync_bool_compare_and_swap(&pending_blocks, old, p));
+
+    if (old == NULL) {
+        /* the stack was empty: the helper thread may be sleeping */
+        pthread_mutex_lock(&bgfree_mutex);
+        pthread_cond_signal(&bgfree_cond);
+        pthread_mutex_unlock(&bgfree_mutex);
+    }
+}
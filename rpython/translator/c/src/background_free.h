@@ -0,0 +1,10 @@
+#ifndef _PYPY_BACKGROUND_FREE_H
+#define _PYPY_BACKGROUND_FREE_H
+#include "precommondefs.h"
+
+/* Like free(), but the block is released later by a helper thread.  The
+   block must be at least one pointer in size.  Used by the GC for large
+   blocks, for which free() can be costly (e.g. it calls munmap()). */
+RPY_EXTERN void RPyBackgroundFree(void *p);
+
+#endif
@@ -23,6 +23,7 @@ class UsingFrameworkTest(object):
     should_be_moving = False
     removetypeptr = False
     taggedpointers = False
+    largeobjectspace = False
     GC_CAN_MOVE = False
     GC_CAN_SHRINK_ARRAY = False
 
@@ -44,7 +45,8 @@ class UsingFrameworkTest(object):
 
         t = Translation(main, gc=cls.gcpolicy,
                         taggedpointers=cls.taggedpointers,
-                        gcremovetypeptr=cls.removetypeptr)
+                        gcremovetypeptr=cls.removetypeptr,
+                        gclargeobjectspace=cls.largeobjectspace)
         t.disable(['backendopt'])
         t.set_backend_extra_options(c_debug_defines=True)
         t.rtype()
@@ -1191,6 +1193,42 @@ class UsingFrameworkTest(object):
         f.close()
         assert data1 == data2
 
+    filename_compact_dump = str(udir.join('test_dump_rpy_heap.compact'))
+    filename_full_dump = str(udir.join('test_dump_rpy_heap.full'))
+    def define_dump_rpy_heap_compact(self):
+        S = lltype.GcStruct('S', ('x', lltype.Signed))
+        A = lltype.GcArray(lltype.Ptr(S))
+        filename = self.filename_compact_dump
+        filename_full = self.filename_full_dump
+
+        def fn():
+            a = lltype.malloc(A, 1000)
+            for i in range(1000):
+                a[i] = lltype.malloc(S)
+            fd = os.open(filename, os.O_WRONLY | os.O_CREAT, 0666)
+            fd_full = os.open(filename_full, os.O_WRONLY | os.O_CREAT, 0666)
+            gc.collect()
+            rgc.dump_rpy_heap(fd, compact=True)
+            rgc.dump_rpy_heap(fd_full)
+            keepalive_until_here(a)
+            os.close(fd)
+            os.close(fd_full)
+            return 0
+
+        return fn
+
+    def test_dump_rpy_heap_compact(self):
+        self.run("dump_rpy_heap_compact")
+        from rpython.memory.gc.inspector import COMPACT_MAGIC
+        f = open(self.filename_compact_dump, 'rb')
+        data = f.read()
+        f.close()
+        assert data.startswith(COMPACT_MAGIC)
+        assert len(data) > 1000 * 3
+        # much less than one word per field and per reference
+        full_size = os.path.getsize(self.filename_full_dump)
+        assert len(data) * 2 < full_size
+
     filename_dump_typeids_z = str(udir.join('test_typeids_z'))
     def define_write_typeids_z(self):
         U = lltype.GcForwardReference()
@@ -1777,6 +1815,10 @@ class TestIncrementalMiniMarkGC(TestMiniMarkGC):
         assert res == 1    # translated: x1 is removed from the list
 
 
+class TestIncrementalMiniMarkGCLargeObjectSpace(TestIncrementalMiniMarkGC):
+    largeobjectspace = True
+
+
 # ____________________________________________________________________
 
 class TaggedPointersTest(object):
@@ -0,0 +1,65 @@
+"""
+Measure the pauses of major collections on a large heap of small objects
+that point to each other at random, which is the worst case for the
+cache during marking.  Compare e.g.
+
+    rpython --gc=incminimark targetgcpause.py
+    rpython --gc=incminimark --gcmarkprefetch=8 targetgcpause.py
+
+and run both with the same arguments:
+
+    targetgcpause-c [num_objects] [num_collections]
+"""
+
+import time
+from rpython.rlib import rgc
+
+
+class Node(object):
+    def __init__(self, value):
+        self.value = value
+        self.left = None
+        self.right = None
+
+
+def make_heap(num_objects):
+    nodes = [Node(i) for i in range(num_objects)]
+    # a simple linear congruential generator, to get the same heap in
+    # every run
+    seed = 12345
+    for node in nodes:
+        seed = (seed * 1103515245 + 12345) & 0x7fffffff
+        node.left = nodes[seed % num_objects]
+        seed = (seed * 1103515245 + 12345) & 0x7fffffff
+        node.right = nodes[seed % num_objects]
+    return nodes
+
+
+def entry_point(argv):
+    num_objects = 2000000
+    num_collections = 10
+    if len(argv) > 1:
+        num_objects = int(argv[1])
+    if len(argv) > 2:
+        num_collections = int(argv[2])
+    nodes = make_heap(num_objects)
+    rgc.collect()
+    total = 0.0
+    worst = 0.0
+    for i in range(num_collections):
+        t0 = time.time()
+        rgc.collect()
+        pause = time.time() - t0
+        total += pause
+        if pause > worst:
+            worst = pause
+    print 'objects: %d  collections: %d' % (num_objects, num_collections)
+    print 'average pause: %d us' % int(total * 1e6 / num_collections)
+    print 'worst pause:   %d us' % int(worst * 1e6)
+    # keep the heap alive until the end
+    return int(nodes[0].value != 0)
+
+# _____ Define and setup target ___
+
+def target(*args):
+    return entry_point, None
@@ -0,0 +1,207 @@
+"""A fast, restricted marshal codec for sandlib.
+
+It only understands the subset of the marshal format that is produced
+and accepted by rpython.rlib.rmarshal for the arguments and results of
+sandboxed external functions: None, bools, 32- and 64-bit ints, floats,
+strings, tuples and lists.  Unlike the built-in marshal module, load()
+is safe to use on data sent by an untrusted subprocess: anything else
+is rejected with ValueError, truncated input raises EOFError, nesting
+is limited, and no memory is allocated in advance based on the lengths
+found in the input.
+
+dump() and dumps() fall back to the pure Python _marshal for values
+outside of the subset.
+"""
+
+import struct
+from cStringIO import StringIO
+from rpython.translator.sandbox import _marshal
+
+TYPE_NONE     = 'N'
+TYPE_FALSE    = 'F'
+TYPE_TRUE     = 'T'
+TYPE_INT      = 'i'
+TYPE_INT64    = 'I'
+TYPE_FLOAT    = 'f'
+TYPE_STRING   = 's'
+TYPE_TUPLE    = '('
+TYPE_LIST     = '['
+
+MAX_DEPTH = 64            # nesting of tuples and lists
+READ_CHUNK = 65536        # strings are read by chunks of this size at most
+
+_INT = struct.Struct('<ci')
+_INT64 = struct.Struct('<cq')
+_LONG = struct.Struct('<i')
+_LONG64 = struct.Struct('<q')
+
+
+class _Unsupported(Exception):
+    pass
+
+def _dump(x, parts):
+    tp = type(x)
+    if tp is str:
+        parts.append(_INT.pack(TYPE_STRING, len(x)))
+        parts.append(x)
+    elif tp is int or tp is long:
+        if -0x80000000 <= x <= 0x7fffffff:
+            parts.append(_INT.pack(TYPE_INT, x))
+        elif -0x8000000000000000 <= x <= 0x7fffffffffffffff:
+            parts.append(_INT64.pack(TYPE_INT64, x))
+        else:
+            raise _Unsupported
+    elif tp is tuple or tp is list:
+        if tp is tuple:
+            parts.append(_INT.pack(TYPE_TUPLE, len(x)))
+        else:
+            parts.append(_INT.pack(TYPE_LIST, len(x)))
+        for item in x:
+            _dump(item, parts)
+    elif x is None:
+        parts.append(TYPE_NONE)
+    elif tp is bool:
+        parts.append(TYPE_TRUE if x else TYPE_FALSE)
+    elif tp is float:
+        s = repr(x)
+        parts.append(TYPE_FLOAT + chr(len(s)))
+        parts.append(s)
+    else:
+        raise _Unsupported
+
+def dumps(x, version=None):
+    parts = []
+    try:
+        _dump(x, parts)
+    except _Unsupported:
+        return _marshal.dumps(x)
+    return ''.join(parts)
+
+def dump(x, f, version=None):
+    f.write(dumps(x))
+
+def dumped_size(x):
+    """Return len(dumps(x)) without building the string.  Only approximate
+    for values outside of the subset.
+    """
+    tp = type(x)
+    if tp is str:
+        return 5 + len(x)
+    elif tp is int or tp is long:
+        if -0x80000000 <= x <= 0x7fffffff:
+            return 5
+        return 9
+    elif tp is tuple or tp is list:
+        size = 5
+        for item in x:
+            size += dumped_size(item)
+        return size
+    elif tp is float:
+        return 2 + len(repr(x))
+    elif x is None or tp is bool:
+        return 1
+    else:
+        try:
+            return len(dumps(x))
+        except Exception:
+            return 0
+
+
+class Truncated(EOFError):
+    """The input ends before the value does.  At least 'missing' more
+    bytes are needed after the end of the input; load_prefix() also sets
+    'needed', the minimal length of the whole input."""
+
+    needed = -1
+
+    def __init__(self, missing):
+        EOFError.__init__(self)
+        self.missing = missing
+
+def _read(read, n):
+    if n <= READ_CHUNK:
+        data = read(n)
+        if len(data) < n:
+            raise Truncated(n - len(data))
+        return data
+    # don't trust 'n': only allocate memory for the data actually received
+    chunks = []
+    while n > 0:
+        data = read(min(n, READ_CHUNK))
+        if not data:
+            raise Truncated(n)
+        chunks.append(data)
+        n -= len(data)
+    return ''.join(chunks)
+
+def _read_length(read):
+    data = read(4)
+    if len(data) < 4:
+        raise Truncated(4 - len(data))
+    n, = _LONG.unpack(data)
+    if n < 0:
+        raise ValueError("negative length")
+    return n
+
+def _load(read, depth):
+    code = read(1)
+    if code == TYPE_STRING:
+        return _read(read, _read_length(read))
+    elif code == TYPE_INT:
+        data = read(4)
+        if len(data) < 4:
+            raise Truncated(4 - len(data))
+        return _LONG.unpack(data)[0]
+    elif code == TYPE_INT64:
+        return _LONG64.unpack(_read(read, 8))[0]
+    elif code == TYPE_TUPLE or code == TYPE_LIST:
+        if depth >= MAX_DEPTH:
+            raise ValueError("nesting too deep")
+        n = _read_length(read)
+        items = []
+        for i in xrange(n):
+            items.append(_load(read, depth + 1))
+        if code == TYPE_TUPLE:
+            return tuple(items)
+        return items
+    elif code == TYPE_NONE:
+        return None
+    elif code == TYPE_TRUE:
+        return True
+    elif code == TYPE_FALSE:
+        return False
+    elif code == TYPE_FLOAT:
+        s = _read(read, ord(_read(read, 1)))
+        try:
+            return float(s)
+        except ValueError:
+            raise ValueError("invalid float")
+    elif not code:
+        raise Truncated(1)
+    else:
+        raise ValueError("unsupported type code %r" % (code,))
+
+def load(f):
+    return _load(f.read, 0)
+
+def loads(s):
+    f = StringIO(s)
+    result = _load(f.read, 0)
+    if f.tell() != len(s):
+        raise ValueError("extra data")
+    return result
+
+def load_prefix(s, pos=0):
+    """Decode one value from the string 's' at the position 'pos'.
+    Returns (value, new position).  Raises Truncated, an EOFError, if 's'
+    doesn't contain the whole value yet; its 'needed' attribute is then
+    the length that 's' must at least have before trying again.
+    """
+    f = StringIO(s)
+    f.seek(pos)
+    try:
+        result = _load(f.read, 0)
+    except Truncated as e:
+        e.needed = f.tell() + e.missing
+        raise
+    return result, f.tell()
@@ -36,6 +36,12 @@ ll_write_not_sandboxed = rposix.external('write',
                                          sandboxsafe=True,
                                          _nowrapper=True)
 
+ll_getenv_not_sandboxed = rposix.external('getenv',
+                                          [rffi.CCHARP],
+                                          rffi.CCHARP,
+                                          sandboxsafe=True,
+                                          _nowrapper=True)
+
 
 @signature(types.int(), types.ptr(rffi.CCHARP.TO), types.int(),
     returns=types.none())
@@ -58,25 +64,47 @@ class FdLoader(rmarshal.Loader):
         self.buflen = 4096
 
     def need_more_data(self):
+        # read at least all the data needed by the current readstr(), and
+        # make a single string out of it: big strings are not copied again
+        # and again, nor character by character
+        missing = self.wanted - len(self.buf)
         buflen = self.buflen
-        with lltype.scoped_alloc(rffi.CCHARP.TO, buflen) as buf:
-            buflen = rffi.cast(rffi.SIZE_T, buflen)
-            fd = rffi.cast(rffi.INT, self.fd)
-            count = ll_read_not_sandboxed(fd, buf, buflen)
-            count = rffi.cast(lltype.Signed, count)
-            if count <= 0:
-                raise IOError
-            self.buf += ''.join([buf[i] for i in range(count)])
-            self.buflen *= 2
+        if missing > buflen:
+            buflen = missing
+        fd = rffi.cast(rffi.INT, self.fd)
+        with rffi.scoped_alloc_buffer(buflen) as buf:
+            got = 0
+            while True:
+                p = rffi.ptradd(buf.raw, got)
+                size = rffi.cast(rffi.SIZE_T, buflen - got)
+                count = ll_read_not_sandboxed(fd, p, size)
+                count = rffi.cast(lltype.Signed, count)
+                if count <= 0:
+                    raise IOError
+                got += count
+                if got >= missing:
+                    break
+            self.buf += buf.str(got)
+        self.buflen *= 2
 
-def sandboxed_io(buf):
-    STDIN = 0
+def sandboxed_send(buf):
     STDOUT = 1
     # send the buffer with the marshalled fnname and input arguments to STDOUT
     with lltype.scoped_alloc(rffi.CCHARP.TO, len(buf)) as p:
         for i in range(len(buf)):
             p[i] = buf[i]
         writeall_not_sandboxed(STDOUT, p, len(buf))
+
+@signature(types.str(), returns=types.none())
+def sandboxed_send_payload(payload):
+    STDOUT = 1
+    # send raw data to STDOUT, without copying it first
+    if payload:
+        with rffi.scoped_nonmovingbuffer(payload) as p:
+            writeall_not_sandboxed(STDOUT, p, len(payload))
+
+def sandboxed_answer():
+    STDIN = 0
     # build a Loader that will get the answer from STDIN
     loader = FdLoader(STDIN)
     # check for errors
@@ -87,6 +115,19 @@ def sandboxed_io(buf):
         # no exception; the caller will decode the actual result
         return loader
 
+def sandboxed_io(buf):
+    sandboxed_send(buf)
+    return sandboxed_answer()
+
+def dump_write_header(buf, fd, length):
+    # the marshalled form of the arguments (fd, data), but without the
+    # characters of 'data', which are sent separately
+    buf.append(rmarshal.TYPE_TUPLE)
+    rmarshal.w_long(buf, 2)
+    rmarshal.dump_int(buf, fd)
+    buf.append(rmarshal.TYPE_STRING)
+    rmarshal.w_long(buf, length)
+
 def reraise_error(error, loader):
     if error == 1:
         raise OSError(load_int(loader), "external error")
@@ -132,6 +173,56 @@ def sig_ll(fnobj):
 
 dump_string = rmarshal.get_marshaller(str)
 load_int = rmarshal.get_loader(int)
+dump_protocol_args = rmarshal.get_marshaller((int,))
+
+# ____________________________________________________________
+#
+# Protocol versions.  Version 1 is strictly one answer per call.  In
+# version 2, writes to stdout and stderr are pipelined: they are sent
+# without waiting for any answer, and assumed to fully succeed.  Version
+# 2 is only used if the controller asks for it in the real environment
+# of the subprocess, and confirms it in answer to a 'sandbox.protocol'
+# call.  Keep in sync with sandlib.SandboxedProc.
+
+PROTOCOL_VERSION = 2
+PROTOCOL_ENV_VAR = 'RPY_SANDBOX_PROTOCOL'
+
+class SandboxProtocol(object):
+    version = 0      # not negotiated yet
+sandbox_protocol = SandboxProtocol()
+
+def get_protocol_version():
+    if sandbox_protocol.version == 0:
+        sandbox_protocol.version = 1     # in case negotiation fails
+        sandbox_protocol.version = negotiate_protocol()
+    return sandbox_protocol.version
+
+def negotiate_protocol():
+    with rffi.scoped_str2charp(PROTOCOL_ENV_VAR) as name:
+        value = ll_getenv_not_sandboxed(name)
+        if not value:
+            return 1
+        value = rffi.charp2str(value)
+    try:
+        wanted = int(value)
+    except ValueError:
+        return 1
+    if wanted < 2:
+        return 1
+    buf = []
+    dump_string(buf, 'sandbox.protocol')
+    dump_protocol_args(buf, (PROTOCOL_VERSION,))
+    try:
+        loader = sandboxed_io(buf)
+        version = load_int(loader)
+        loader.check_finished()
+    except Exception:
+        # the controller doesn't know about protocol versions, or its
+        # answer makes no sense: stick to one answer per call
+        return 1
+    if version < 2:
+        return 1
+    return PROTOCOL_VERSION
 
 def get_sandbox_stub(fnobj, rtyper):
     fnname = fnobj._name
@@ -165,6 +256,28 @@ def make_sandbox_trampoline(fnname, args_s, s_result):
             result = load_result(loader)
             loader.check_finished()
             return result
+
+        if fnname == 'll_os.ll_os_write':
+            # special case: the data is sent without first copying it into
+            # 'buf', and writes to stdout/stderr may be pipelined
+            def execute(*args):
+                fd = args[0]
+                data = args[1]
+                # (this may first need to negotiate the protocol)
+                pipelined = ((fd == 1 or fd == 2) and
+                             get_protocol_version() >= 2)
+                buf = []
+                dump_string(buf, fnname)
+                dump_write_header(buf, fd, len(data))
+                sandboxed_send(buf)
+                sandboxed_send_payload(data)
+                if pipelined:
+                    # don't wait for the answer
+                    return len(data)
+                loader = sandboxed_answer()
+                result = load_result(loader)
+                loader.check_finished()
+                return result
         execute.__name__ = 'sandboxed_%s' % (fnname,)
     return execute
 
@@ -18,17 +18,20 @@ def create_log():
     from rpython.tool.ansi_print import AnsiLogger
     return AnsiLogger("sandlib")
 
-# Note: we use lib_pypy/marshal.py instead of the built-in marshal
+# Note: we use our own _fastmarshal instead of the built-in marshal
 # for two reasons.  The built-in module could be made to segfault
 # or be attackable in other ways by sending malicious input to
 # load().  Also, marshal.load(f) blocks with the GIL held when
 # f is a pipe with no data immediately avaialble, preventing the
-# _waiting_thread to run.
-from rpython.translator.sandbox import _marshal as marshal
+# _waiting_thread to run.  _fastmarshal only accepts the subset of
+# the format used by rmarshal, and falls back to the pure Python
+# _marshal (a copy of lib_pypy/_marshal.py) for dumping anything else.
+from rpython.translator.sandbox import _fastmarshal as marshal
 
 # Non-marshal result types
 RESULTTYPE_STATRESULT = object()
 RESULTTYPE_LONGLONG = object()
+_STATRESULT_FORMAT = "iIIiiiIfff"
 
 def read_message(f):
     return marshal.load(f)
@@ -45,7 +48,7 @@ def write_message(g, msg, resulttype=None):
         # on 64-bit ints at places, even when the value fits in 32 bits.
         import struct
         st = tuple(msg)
-        fmt = "iIIiiiIfff"
+        fmt = _STATRESULT_FORMAT
         buf = []
         buf.append(struct.pack("<ci", '(', len(st)))
         for c, v in zip(fmt, st):
@@ -64,6 +67,29 @@ def write_message(g, msg, resulttype=None):
     else:
         raise Exception("Can't marshal: %r (%r)" % (msg, resulttype))
 
+def message_size(msg, resulttype=None):
+    """Return the number of bytes that write_message() sends for 'msg'."""
+    if resulttype is None:
+        return marshal.dumped_size(msg)
+    elif resulttype is RESULTTYPE_STATRESULT:
+        size = 5
+        for c, v in zip(_STATRESULT_FORMAT, tuple(msg)):
+            if c == 'i':
+                size += 5
+            elif c == 'I':
+                size += 9
+            elif c == 'f':
+                size += 2 + len("%g" % v)
+        return size
+    elif resulttype is RESULTTYPE_LONGLONG:
+        return 9
+    else:
+        return 0
+
+# keep these in sync with rsandbox.PROTOCOL_VERSION and PROTOCOL_ENV_VAR
+PROTOCOL_VERSION = 2
+PROTOCOL_ENV_VAR = 'RPY_SANDBOX_PROTOCOL'
+
 # keep the table in sync with rsandbox.reraise_error()
 EXCEPTION_TABLE = [
     (1, OSError),
@@ -92,6 +118,21 @@ def write_exception(g, exception, tb=None):
         # just re-raise the exception
         raise exception.__class__, exception, tb
 
+def answer_size(answer, resulttype=None):
+    """Return the number of bytes that handle_request() sends back for
+    a successful call: the error code 0, then the answer."""
+    return message_size(0) + message_size(answer, resulttype)
+
+def exception_size(exception):
+    """Return the number of bytes that write_exception() sends."""
+    for i, excclass in EXCEPTION_TABLE:
+        if isinstance(exception, excclass):
+            size = message_size(i)
+            if excclass is OSError:
+                size += message_size(exception.errno or errno.EPERM)
+            return size
+    return 0
+
 def shortrepr(x):
     r = repr(x)
     if len(r) >= 80:
@@ -106,6 +147,32 @@ def signal_name(n):
     return 'signal %d' % (n,)
 
 
+def _rlimit_cpu_setter(seconds):
+    import math
+    limit = max(int(math.ceil(seconds)), 1)
+    def preexec_fn():
+        import resource
+        # SIGXCPU at the soft limit, SIGKILL one second later
+        resource.setrlimit(resource.RLIMIT_CPU, (limit, limit + 1))
+    return preexec_fn
+
+def _killed_by_cpu_limit(returncode, cpu_time, cpu_time_limit):
+    import signal
+    if hasattr(signal, 'SIGXCPU') and returncode == -signal.SIGXCPU:
+        return True
+    # the SIGKILL at the hard limit is only sent if the subprocess
+    # survives the SIGXCPU, but it is also what the OOM killer or an
+    # external 'kill -9' send: check that the CPU time was really used
+    return (hasattr(signal, 'SIGKILL') and returncode == -signal.SIGKILL and
+            cpu_time is not None and cpu_time >= cpu_time_limit)
+
+KILL_REASONS = {
+    'timeout':  'time limit exceeded',
+    'cpu-time': 'CPU time limit exceeded',
+    'syscalls': 'too many system calls',
+    }
+
+
 class SandboxedProc(object):
     """Base class to control a sandboxed subprocess.
     Inherit from this class and implement all the do_xxx() methods
@@ -114,20 +181,45 @@ class SandboxedProc(object):
     debug = False
     log = None
     os_level_sandboxing = False   # Linux only: /proc/PID/seccomp
+    # highest protocol version offered to the subprocess.  With version 2,
+    # writes to stdout and stderr are pipelined: no answer is sent, and
+    # errors raised by do_ll_os__ll_os_write() cannot be reported back.
+    protocol_version = PROTOCOL_VERSION
+    profile = None                # see enable_profiling()
+    # limits, or None: the CPU time of the subprocess in seconds (enforced
+    # by the OS with RLIMIT_CPU, posix only), and the number of requests
+    # that the subprocess can make
+    cpu_time_limit = None
+    max_syscalls = None
 
     def __init__(self, args, executable=None):
         """'args' should a sequence of argument for the subprocess,
         starting with the full path of the executable.
         """
+        env = {}
+        if self.protocol_version >= 2:
+            # only the real environment; the sandboxed program sees
+            # the one given by do_ll_os__ll_os_envitems(), if any
+            env[PROTOCOL_ENV_VAR] = str(self.protocol_version)
+        preexec_fn = None
+        if self.cpu_time_limit is not None:
+            preexec_fn = _rlimit_cpu_setter(self.cpu_time_limit)
         self.popen = subprocess.Popen(args, executable=executable,
                                       bufsize=-1,
                                       stdin=subprocess.PIPE,
                                       stdout=subprocess.PIPE,
                                       close_fds=False if WIN32 else True,
-                                      env={})
+                                      env=env,
+                                      preexec_fn=preexec_fn)
+        self.protocol = 1      # until the subprocess asks for more
+        self.syscall_count = 0
+        self.kill_reason = None   # 'timeout', 'cpu-time' or 'syscalls'
+        self.cpu_time = None      # in seconds, when known, once finished
         self.popenlock = None
         self.currenttimeout = None
         self.currentlyidlefrom = None
+        self.pending_request = None
+        self.os_level_sandboxing_started = False
 
         if self.debug:
             self.log = create_log()
@@ -151,17 +243,17 @@ class SandboxedProc(object):
         def _waiting_thread():
             while True:
                 while self.currentlyidlefrom is not None:
-                    time.sleep(1)   # can't timeout while idle
+                    time.sleep(0.1)   # can't timeout while idle
                 t = self.currenttimeout
                 if t is None:
                     return  # cancelled
                 delay = t - time.time()
                 if delay <= 0.0:
                     break   # expired!
-                time.sleep(min(delay*1.001, 1))
+                time.sleep(min(delay, 1))
             if self.log:
                 self.log.timeout("timeout!")
-            self.kill()
+            self.kill(reason='timeout')
             #if interrupt_main:
             #    if hasattr(os, 'kill'):
             #        import signal
@@ -192,24 +284,70 @@ class SandboxedProc(object):
             t = self.currentlyidlefrom
             if t is not None and self.currenttimeout is not None:
                 self.currenttimeout += time.time() - t
+        t = self.currentlyidlefrom
+        if t is not None and self.profile is not None:
+            self.profile.record_idle(time.time() - t)
         try:
             self.withlock(_postpone_timeout)
         finally:
             self.currentlyidlefrom = None
 
+    def enable_profiling(self):
+        """Start recording statistics about the requests of the subprocess
+        and the time spent handling them.  Returns the SandboxProfile,
+        also available as self.profile.
+        """
+        from rpython.translator.sandbox.sandprof import SandboxProfile
+        if self.profile is None:
+            self.profile = SandboxProfile()
+        return self.profile
+
+    def _reap(self, block):
+        # like self.popen.wait() or poll(), but if os.wait4() is available,
+        # it also records the CPU time used by the subprocess
+        popen = self.popen
+        if popen.returncode is None and hasattr(os, 'wait4'):
+            try:
+                pid, status, rusage = os.wait4(popen.pid,
+                                               0 if block else os.WNOHANG)
+            except OSError:
+                pass     # e.g. EINTR: leave it to the subprocess module
+            else:
+                if pid == popen.pid:
+                    self.cpu_time = rusage.ru_utime + rusage.ru_stime
+                    if os.WIFSIGNALED(status):
+                        popen.returncode = -os.WTERMSIG(status)
+                    else:
+                        popen.returncode = os.WEXITSTATUS(status)
+        if block:
+            return popen.wait()
+        else:
+            return popen.poll()
+
     def poll(self):
-        returncode = self.withlock(self.popen.poll)
+        returncode = self.withlock(self._reap, False)
         if returncode is not None:
             self.canceltimeout()
         return returncode
 
     def wait(self):
-        returncode = self.withlock(self.popen.wait)
+        returncode = self.withlock(self._reap, True)
         if returncode is not None:
             self.canceltimeout()
+            if self.profile is not None:
+                self.profile.finish()
+            if (self.kill_reason is None and self.cpu_time_limit is not None
+                    and _killed_by_cpu_limit(returncode, self.cpu_time,
+                                             self.cpu_time_limit)):
+                self.kill_reason = 'cpu-time'
         return returncode
 
-    def kill(self):
+    def kill(self, reason=None):
+        """Kill the subprocess.  'reason' is recorded in 'kill_reason',
+        unless the subprocess was already killed for another reason.
+        """
+        if reason is not None and self.kill_reason is None:
+            self.kill_reason = reason
         self.withlock(killsubprocess, self.popen)
 
     def handle_forever(self):
@@ -221,50 +359,142 @@ class SandboxedProc(object):
     def handle_until_return(self):
         child_stdin  = self.popen.stdin
         child_stdout = self.popen.stdout
+        self.start_os_level_sandboxing()
+        while True:
+            request = self.pending_request
+            if request is not None:
+                self.pending_request = None
+            else:
+                request = self.read_request(child_stdout)
+                if request is None:
+                    break
+            fnname, args = request
+            if not self.handle_request(child_stdin, fnname, args):
+                break
+        returncode = self.wait()
+        return returncode
+
+    def handle_until_ready(self):
+        """Serve the requests of the subprocess until it issues one for
+        which is_ready_request() returns True.  That request is not
+        answered; it is kept in 'pending_request' and will be the first
+        one handled by the next handle_until_return().  Returns False
+        if the subprocess exited before reaching that point.
+        """
+        child_stdin  = self.popen.stdin
+        child_stdout = self.popen.stdout
+        self.start_os_level_sandboxing()
+        while self.pending_request is None:
+            request = self.read_request(child_stdout)
+            if request is None:
+                return False
+            fnname, args = request
+            if self.is_ready_request(fnname, *args):
+                self.pending_request = request
+            elif not self.handle_request(child_stdin, fnname, args):
+                return False
+        return True
+
+    def is_ready_request(self, fnname, *args):
+        # by default, the subprocess is considered to have finished its
+        # startup when it first tries to read from its stdin
+        return fnname == 'll_os.ll_os_read' and args[0] == 0
+
+    def start_os_level_sandboxing(self):
+        if self.os_level_sandboxing_started:
+            return
+        self.os_level_sandboxing_started = True
         if self.os_level_sandboxing and sys.platform.startswith('linux'):
             # rationale: we wait until the child process started completely,
             # letting the C library do any system calls it wants for
             # initialization.  When the RPython code starts up, it quickly
             # does its first system call.  At this point we turn seccomp on.
             import select
-            select.select([child_stdout], [], [])
+            select.select([self.popen.stdout], [], [])
             f = open('/proc/%d/seccomp' % self.popen.pid, 'w')
             print >> f, 1
             f.close()
-        while True:
-            try:
-                fnname = read_message(child_stdout)
-                args   = read_message(child_stdout)
-            except EOFError as e:
-                break
-            if self.log and not self.is_spam(fnname, *args):
-                self.log.call('%s(%s)' % (fnname,
-                                     ', '.join([shortrepr(x) for x in args])))
+
+    def read_request(self, child_stdout):
+        """Read the next (fnname, args) request, or None at end-of-file."""
+        try:
+            fnname = read_message(child_stdout)
+            args   = read_message(child_stdout)
+        except EOFError as e:
+            return None
+        return fnname, args
+
+    def handle_request(self, child_stdin, fnname, args):
+        """Handle a single request and send the answer back.  Returns
+        False if the subprocess is gone and the answer could not be sent,
+        or if it was killed because it made too many requests.
+        """
+        self.syscall_count += 1
+        if (self.max_syscalls is not None and
+                self.syscall_count > self.max_syscalls):
+            if self.log:
+                self.log.timeout("too many system calls!")
+            self.kill(reason='syscalls')
+            return False
+        if self.log and not self.is_spam(fnname, *args):
+            self.log.call('%s(%s)' % (fnname,
+                                 ', '.join([shortrepr(x) for x in args])))
+        if self.protocol >= 2 and self.is_pipelined(fnname, *args):
+            # the subprocess doesn't wait for any answer
             try:
-                answer, resulttype = self.handle_message(fnname, *args)
+                self.call_handler(fnname, args, pipelined=True)
             except Exception as e:
-                tb = sys.exc_info()[2]
-                write_exception(child_stdin, e, tb)
                 if self.log:
-                    if str(e):
-                        self.log.exception('%s: %s' % (e.__class__.__name__, e))
-                    else:
-                        self.log.exception('%s' % (e.__class__.__name__,))
-            else:
-                if self.log and not self.is_spam(fnname, *args):
-                    self.log.result(shortrepr(answer))
-                try:
-                    write_message(child_stdin, 0)  # error code - 0 for ok
-                    write_message(child_stdin, answer, resulttype)
-                    child_stdin.flush()
-                except (IOError, OSError):
-                    # likely cause: subprocess is dead, child_stdin closed
-                    if self.poll() is not None:
-                        break
-                    else:
-                        raise
-        returncode = self.wait()
-        return returncode
+                    self.log.exception('%s: %s (not reported)' % (
+                        e.__class__.__name__, e))
+            return True
+        try:
+            answer, resulttype = self.call_handler(fnname, args)
+        except Exception as e:
+            tb = sys.exc_info()[2]
+            write_exception(child_stdin, e, tb)
+            if self.log:
+                if str(e):
+                    self.log.exception('%s: %s' % (e.__class__.__name__, e))
+                else:
+                    self.log.exception('%s' % (e.__class__.__name__,))
+        else:
+            if self.log and not self.is_spam(fnname, *args):
+                self.log.result(shortrepr(answer))
+            try:
+                write_message(child_stdin, 0)  # error code - 0 for ok
+                write_message(child_stdin, answer, resulttype)
+                child_stdin.flush()
+            except (IOError, OSError):
+                # likely cause: subprocess is dead, child_stdin closed
+                if self.poll() is not None:
+                    return False
+                else:
+                    raise
+        return True
+
+    def call_handler(self, fnname, args, pipelined=False):
+        profile = self.profile
+        if profile is None:
+            return self.handle_message(fnname, *args)
+        t0 = time.time()
+        try:
+            result = self.handle_message(fnname, *args)
+        except Exception as e:
+            profile.record(fnname, args, e, time.time() - t0, error=True,
+                           pipelined=pipelined)
+            raise
+        profile.record(fnname, args, result[0], time.time() - t0,
+                       resulttype=result[1], pipelined=pipelined)
+        return result
+
+    def is_pipelined(self, fnname, *args):
+        # keep in sync with rsandbox.make_sandbox_trampoline()
+        return fnname == 'll_os.ll_os_write' and args[0] in (1, 2)
+
+    def do_sandbox__protocol(self, version):
+        self.protocol = max(1, min(version, self.protocol_version))
+        return self.protocol
 
     def is_spam(self, fnname, *args):
         # To hide the spamming amounts of reads and writes to stdin and stdout
@@ -296,6 +526,11 @@ class SimpleIOSandboxedProc(SandboxedProc):
         """Send data to stdin. Read data from stdout and stderr,
         until end-of-file is reached. Wait for process to terminate.
         """
+        self.setup_communicate(input)
+        self.handle_forever()
+        return self.finish_communicate()
+
+    def setup_communicate(self, input=None):
         import cStringIO
         if input:
             if isinstance(input, str):
@@ -303,7 +538,8 @@ class SimpleIOSandboxedProc(SandboxedProc):
             self._input = input
         self._output = cStringIO.StringIO()
         self._error = cStringIO.StringIO()
-        self.handle_forever()
+
+    def finish_communicate(self):
         output = self._output.getvalue()
         self._output = None
         error = self._error.getvalue()
@@ -319,7 +555,10 @@ class SimpleIOSandboxedProc(SandboxedProc):
         self._error  = stderr or sys.stderr
         returncode = self.handle_until_return()
         if returncode != 0:
-            if os.name == 'posix' and returncode < 0:
+            if self.kill_reason is not None:
+                print >> self._error, "[Subprocess killed: %s]" % (
+                    KILL_REASONS[self.kill_reason],)
+            elif os.name == 'posix' and returncode < 0:
                 print >> self._error, "[Subprocess killed by %s]" % (
                     signal_name(-returncode),)
             else:
@@ -398,6 +637,7 @@ class VirtualizedSandboxedProc(SandboxedProc):
     virtual_cwd = '/tmp'
     virtual_console_isatty = False
     virtual_fd_range = range(3, 50)
+    max_read_size = 16 * 1024 * 1024    # per call to os.read()
 
     def __init__(self, *args, **kwds):
         super(VirtualizedSandboxedProc, self).__init__(*args, **kwds)
@@ -407,6 +647,21 @@ class VirtualizedSandboxedProc(SandboxedProc):
     def build_virtual_root(self):
         raise NotImplementedError("must be overridden")
 
+    def rebind(self, virtual_root=None, virtual_env=None, virtual_cwd=None):
+        """Give the subprocess a different view on the filesystem, a
+        different environment or a different current directory.  Meant
+        to be called on a process that was started and kept ready by a
+        SandboxPool, just before it is given its job.  Note that the
+        environment seen by the subprocess during its startup is not
+        changed by this.
+        """
+        if virtual_root is not None:
+            self.virtual_root = virtual_root
+        if virtual_env is not None:
+            self.virtual_env = virtual_env
+        if virtual_cwd is not None:
+            self.virtual_cwd = virtual_cwd
+
     def do_ll_os__ll_os_envitems(self):
         return self.virtual_env.items()
 
@@ -482,11 +737,31 @@ class VirtualizedSandboxedProc(SandboxedProc):
         return self.get_fd(fd, throw)[0]
 
     def do_ll_os__ll_os_open(self, vpathname, flags, mode):
-        node = self.get_node(vpathname)
-        if flags & (os.O_RDONLY|os.O_WRONLY|os.O_RDWR) != os.O_RDONLY:
-            raise OSError(errno.EPERM, "write access denied")
+        if flags & os.O_CREAT:
+            dirnode, name = self.translate_path(vpathname)
+            try:
+                node = self.get_node(vpathname)
+            except OSError as e:
+                if e.errno != errno.ENOENT:
+                    raise
+                node = dirnode.create(name)
+            else:
+                if flags & os.O_EXCL:
+                    raise OSError(errno.EEXIST, "file exists")
+        else:
+            node = self.get_node(vpathname)
+        accmode = flags & (os.O_RDONLY|os.O_WRONLY|os.O_RDWR)
+        if accmode == os.O_RDONLY:
+            f = node.open()
+        else:
+            # only the nodes of a writable vfs (e.g. vfs.MemDir) can be
+            # opened for writing
+            if node.read_only or stat.S_ISDIR(node.kind):
+                raise OSError(errno.EPERM, "write access denied")
+            f = node.open_writable(readable=(accmode == os.O_RDWR),
+                                   truncate=bool(flags & os.O_TRUNC),
+                                   append=bool(flags & os.O_APPEND))
         # all other flags are ignored
-        f = node.open()
         return self.allocate_fd(f, node)
 
     def do_ll_os__ll_os_close(self, fd):
@@ -494,16 +769,37 @@ class VirtualizedSandboxedProc(SandboxedProc):
         del self.open_fds[fd]
         f.close()
 
+    def _not_a_vfs_fd(self, name, *args):
+        # let the next class in the MRO handle the fd, e.g. stdin and stdout
+        # with SimpleIOSandboxedProc, or else report a bad fd
+        meth = getattr(super(VirtualizedSandboxedProc, self), name, None)
+        if meth is None:
+            raise OSError(errno.EBADF, "bad file descriptor")
+        return meth(*args)
+
     def do_ll_os__ll_os_read(self, fd, size):
         f = self.get_file(fd, throw=False)
         if f is None:
-            return super(VirtualizedSandboxedProc, self).do_ll_os__ll_os_read(
-                fd, size)
+            return self._not_a_vfs_fd('do_ll_os__ll_os_read', fd, size)
         else:
             if not (0 <= size <= sys.maxint):
                 raise OSError(errno.EINVAL, "invalid read size")
-            # don't try to read more than 256KB at once here
-            return f.read(min(size, 256*1024))
+            return f.read(min(size, self.max_read_size))
+
+    def do_ll_os__ll_os_write(self, fd, data):
+        f = self.get_file(fd, throw=False)
+        if f is None:
+            return self._not_a_vfs_fd('do_ll_os__ll_os_write', fd, data)
+        else:
+            if not getattr(f, 'writable', False):
+                raise OSError(errno.EBADF, "file not open for writing")
+            return f.write(data)
+
+    def do_ll_os__ll_os_ftruncate(self, fd, length):
+        f = self.get_file(fd)
+        if not getattr(f, 'writable', False):
+            raise OSError(errno.EINVAL, "file not open for writing")
+        f.truncate(length)
 
     def do_ll_os__ll_os_fstat(self, fd):
         f, node = self.get_fd(fd)
@@ -528,10 +824,22 @@ class VirtualizedSandboxedProc(SandboxedProc):
         return node.keys()
 
     def do_ll_os__ll_os_unlink(self, vpathname):
-        raise OSError(errno.EPERM, "write access denied")
+        dirnode, name = self.translate_path(vpathname)
+        if not name:
+            raise OSError(errno.EISDIR, vpathname)
+        dirnode.unlink(name)
 
     def do_ll_os__ll_os_mkdir(self, vpathname, mode=None):
-        raise OSError(errno.EPERM, "write access denied")
+        dirnode, name = self.translate_path(vpathname)
+        if not name:
+            raise OSError(errno.EEXIST, vpathname)
+        dirnode.mkdir(name)
+
+    def do_ll_os__ll_os_rmdir(self, vpathname):
+        dirnode, name = self.translate_path(vpathname)
+        if not name:
+            raise OSError(errno.EBUSY, vpathname)
+        dirnode.rmdir(name)
 
     def do_ll_os__ll_os_getuid(self):
         return UID
@@ -574,3 +882,67 @@ class VirtualizedSocketProc(VirtualizedSandboxedProc):
         return super(VirtualizedSocketProc, self).do_ll_os__ll_os_write(
             fd, data)
 
+
+class SandboxPool(object):
+    """A pool of sandboxed subprocesses that have already been started
+    and served until their 'ready' point (see handle_until_ready()),
+    typically after the interpreter finished starting up and waits for
+    input on its stdin.  'make_proc' is a callable that returns a new
+    SandboxedProc instance, usually a SimpleIOSandboxedProc subclass.
+    """
+
+    def __init__(self, make_proc, size=1):
+        if size < 1:
+            raise ValueError("the pool needs at least one process")
+        self.make_proc = make_proc
+        self.size = size
+        self.ready = []
+        self.fill()
+
+    def fill(self):
+        """Start new subprocesses until 'size' of them are ready."""
+        while len(self.ready) < self.size:
+            proc = self.make_proc()
+            if not proc.handle_until_ready():
+                returncode = proc.wait()
+                raise OSError("the sandboxed subprocess exited with code %d "
+                              "during startup" % (returncode,))
+            self.ready.append(proc)
+
+    def acquire(self, **kwds):
+        """Return a ready subprocess, removing it from the pool.  The
+        keyword arguments are passed to its rebind() method.
+        """
+        if not self.ready:
+            self.fill()
+        proc = self.ready.pop(0)
+        if kwds:
+            proc.rebind(**kwds)
+        return proc
+
+    def communicate(self, input=None, refill=True, **kwds):
+        """Run one job in a ready subprocess, giving it 'input' on stdin.
+        Returns (output, error) like SimpleIOSandboxedProc.communicate().
+        If 'refill' is True, a replacement subprocess is started and made
+        ready before returning.  If that fails, the pool stays smaller
+        until the next acquire() tries again.
+        """
+        proc = self.acquire(**kwds)
+        try:
+            result = proc.communicate(input)
+        finally:
+            proc.kill()
+            proc.wait()
+        if refill:
+            try:
+                self.fill()
+            except OSError:
+                pass
+        return result
+
+    def close(self):
+        """Kill all the subprocesses that are still waiting in the pool."""
+        while self.ready:
+            proc = self.ready.pop()
+            proc.kill()
+            proc.wait()
@@ -0,0 +1,260 @@
+"""
+Control many sandboxed subprocesses from a single thread.
+
+SandboxedProc.handle_until_return() blocks on one subprocess, and
+settimeout() starts one thread per subprocess.  The SandboxMultiplexer
+below instead waits on the stdout pipes of all its subprocesses with
+epoll/poll/select, decodes the requests as data arrives, and keeps all
+the timeouts in a single heap.
+
+The handlers (do_xxx() methods) are still called synchronously, so they
+should not block: e.g. a SimpleIOSandboxedProc should be given its input
+as a string (see add()) rather than reading from a terminal.  The answers
+are written to the stdin pipes without blocking either; a subprocess that
+does not read its answer is not served until it does.
+"""
+
+import os, time, heapq, select, errno, fcntl
+from rpython.translator.sandbox import _fastmarshal
+
+READ_SIZE = 65536
+
+
+class _Channel(object):
+    """The state of one subprocess: the data received but not decoded
+    yet, the answers not sent yet, and whether the multiplexer should
+    collect its output.  The channel is the file given to
+    handle_request() to write the answers into.
+    """
+
+    def __init__(self, proc, collect_output):
+        self.proc = proc
+        self.fd = proc.popen.stdout.fileno()
+        self.out_fd = proc.popen.stdin.fileno()
+        self.chunks = []
+        self.size = 0
+        self.needed = 0        # don't decode before having that much data
+        self.out_chunks = []
+        self.writing = False   # waiting for out_fd to become writable
+        self.collect_output = collect_output
+        self.finished = False
+
+    def write(self, data):
+        self.out_chunks.append(data)
+
+    def flush(self):
+        pass
+
+    def send(self):
+        """Write as much of the pending answers as the pipe accepts.
+        Returns True if everything was sent.
+        """
+        if not self.out_chunks:
+            return True
+        data = ''.join(self.out_chunks)
+        try:
+            count = os.write(self.out_fd, data)
+        except OSError as e:
+            if e.errno != errno.EAGAIN:
+                raise
+            count = 0
+        if count < len(data):
+            self.out_chunks = [data[count:]]
+            return False
+        self.out_chunks = []
+        return True
+
+    def feed(self, data):
+        self.chunks.append(data)
+        self.size += len(data)
+
+    def requests(self):
+        """Decode and return the complete requests received so far."""
+        # a large request arrives in many pieces; to avoid decoding it
+        # again and again, don't retry before we have at least as much
+        # data as the last attempt found to be missing
+        if self.size < self.needed:
+            return []
+        data = ''.join(self.chunks)
+        pos = 0
+        needed = 0
+        result = []
+        while pos < len(data):
+            try:
+                fnname, pos1 = _fastmarshal.load_prefix(data, pos)
+                args, pos1 = _fastmarshal.load_prefix(data, pos1)
+            except _fastmarshal.Truncated as e:
+                needed = e.needed - pos
+                break
+            if not isinstance(fnname, str) or not isinstance(args, tuple):
+                raise ValueError("malformed request")
+            result.append((fnname, args))
+            pos = pos1
+        data = data[pos:]
+        self.chunks = [data]
+        self.size = len(data)
+        self.needed = needed
+        return result
+
+
+class SandboxMultiplexer(object):
+    """Run many SandboxedProc instances concurrently in one thread.
+    Add the subprocesses with add(), then call run().
+    """
+
+    def __init__(self):
+        self.channels = {}     # {stdout fd: _Channel}
+        self.writers = {}      # {stdin fd: _Channel} with pending answers
+        self.timers = []       # heap of (deadline, fd, _Channel)
+        self.returncodes = {}  # {proc: returncode}
+        self.outputs = {}      # {proc: (output, error)}
+        if hasattr(select, 'epoll'):
+            self.poller = select.epoll()
+            self.poll_scale = 1.0             # epoll timeouts in seconds
+        elif hasattr(select, 'poll'):
+            self.poller = select.poll()
+            self.poll_scale = 1000.0          # poll timeouts in milliseconds
+        else:
+            self.poller = None
+
+    def add(self, proc, timeout=None, input=None):
+        """Add a subprocess.  If 'input' is not None, 'proc' must be a
+        SimpleIOSandboxedProc; it gets 'input' on its stdin, and its
+        (output, error) are stored in self.outputs when it finishes.
+        The subprocess is killed after 'timeout' seconds, if given.
+        """
+        if input is not None:
+            proc.setup_communicate(input)
+        channel = _Channel(proc, collect_output=input is not None)
+        flags = fcntl.fcntl(channel.out_fd, fcntl.F_GETFL)
+        fcntl.fcntl(channel.out_fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+        self.channels[channel.fd] = channel
+        if self.poller is not None:
+            self.poller.register(channel.fd, select.POLLIN)
+        if timeout is not None:
+            heapq.heappush(self.timers, (time.time() + timeout,
+                                         channel.fd, channel))
+        if proc.pending_request is not None:
+            # e.g. a process taken from a SandboxPool
+            fnname, args = proc.pending_request
+            proc.pending_request = None
+            if not proc.handle_request(channel, fnname, args):
+                self._finish(channel)
+            else:
+                self._send(channel)
+
+    def run(self):
+        """Serve all the subprocesses until they have all finished.
+        Returns the dictionary {proc: returncode}.
+        """
+        while self.channels:
+            for fd in self._wait(self._next_timeout()):
+                channel = self.writers.get(fd)
+                if channel is not None:
+                    self._send(channel)
+                    continue
+                channel = self.channels.get(fd)
+                if channel is not None and not channel.writing:
+                    self._serve(channel)
+            self._expire_timers()
+        return self.returncodes
+
+    def _next_timeout(self):
+        while self.timers and self.timers[0][2].finished:
+            heapq.heappop(self.timers)
+        if not self.timers:
+            return None
+        return max(self.timers[0][0] - time.time(), 0.0)
+
+    def _wait(self, timeout):
+        if self.poller is None:
+            readers = [fd for fd, channel in self.channels.items()
+                          if not channel.writing]
+            readable, writable, _ = select.select(readers,
+                                                  self.writers.keys(), [],
+                                                  timeout)
+            return writable + readable
+        if timeout is None:
+            timeout = -1
+        else:
+            timeout *= self.poll_scale
+        return [fd for fd, event in self.poller.poll(timeout)]
+
+    def _expire_timers(self):
+        now = time.time()
+        while self.timers and self.timers[0][0] <= now:
+            deadline, fd, channel = heapq.heappop(self.timers)
+            if not channel.finished:
+                if channel.proc.log:
+                    channel.proc.log.timeout("timeout!")
+                # the pipe will report end-of-file, and then we finish
+                channel.proc.kill(reason='timeout')
+
+    def _serve(self, channel):
+        proc = channel.proc
+        proc.start_os_level_sandboxing()
+        data = os.read(channel.fd, READ_SIZE)
+        if not data:
+            self._finish(channel)
+            return
+        channel.feed(data)
+        try:
+            requests = channel.requests()
+        except ValueError:
+            if proc.log:
+                proc.log.exception("malformed request, killing subprocess")
+            proc.kill()
+            self._finish(channel)
+            return
+        for fnname, args in requests:
+            if not proc.handle_request(channel, fnname, args):
+                self._finish(channel)
+                return
+        self._send(channel)
+
+    def _send(self, channel):
+        # while some answer is pending, wait for the stdin pipe of the
+        # subprocess instead of reading more requests from it: a
+        # subprocess that stops reading cannot block the other ones, nor
+        # make us buffer more than one answer for it
+        try:
+            done = channel.send()
+        except (IOError, OSError):
+            # likely cause: subprocess is dead, its stdin closed
+            if channel.proc.poll() is None:
+                channel.proc.kill()
+            self._finish(channel)
+            return
+        if done == (not channel.writing):
+            return
+        if done:
+            channel.writing = False
+            del self.writers[channel.out_fd]
+            if self.poller is not None:
+                self.poller.unregister(channel.out_fd)
+                self.poller.register(channel.fd, select.POLLIN)
+        else:
+            channel.writing = True
+            self.writers[channel.out_fd] = channel
+            if self.poller is not None:
+                self.poller.unregister(channel.fd)
+                self.poller.register(channel.out_fd, select.POLLOUT)
+
+    def _finish(self, channel):
+        if channel.finished:
+            return
+        channel.finished = True
+        del self.channels[channel.fd]
+        if channel.writing:
+            del self.writers[channel.out_fd]
+        if self.poller is not None:
+            if channel.writing:
+                self.poller.unregister(channel.out_fd)
+            else:
+                self.poller.unregister(channel.fd)
+        proc = channel.proc
+        proc.popen.stdin.close()
+        proc.popen.stdout.close()
+        self.returncodes[proc] = proc.wait()
+        if channel.collect_output:
+            self.outputs[proc] = proc.finish_communicate()
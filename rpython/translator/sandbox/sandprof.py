@@ -0,0 +1,124 @@
+"""
+Resource accounting for sandboxed subprocesses.
+
+A SandboxProfile attached to a SandboxedProc (see enable_profiling())
+records, for each external function called by the subprocess, the
+number of calls and of failed calls, the size of the marshalled
+requests and answers, and a histogram of the time spent in the
+controller to handle them.  It also measures the wall-clock time and
+the time spent idle, waiting at the interactive console.  report()
+returns all this as a dictionary that can be dumped as JSON with
+write(), at any time.
+"""
+
+import time
+from rpython.translator.sandbox._fastmarshal import dumped_size
+from rpython.translator.sandbox.sandlib import answer_size, exception_size
+
+# the upper bounds of the buckets of the latency histograms, in seconds:
+# 1us, 2us, 4us, ... about 8s, and the last bucket is unbounded
+HISTOGRAM_BOUNDS = [2.0 ** i / 1000000 for i in range(24)]
+
+# a misbehaving subprocess could send any number of different names
+MAX_FNNAMES = 256
+OTHER_FNNAME = '<other>'
+
+
+class FunctionStats(object):
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.histogram = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+
+    def add(self, bytes_in, bytes_out, elapsed, error):
+        self.calls += 1
+        if error:
+            self.errors += 1
+        self.bytes_in += bytes_in
+        self.bytes_out += bytes_out
+        self.total_time += elapsed
+        if elapsed > self.max_time:
+            self.max_time = elapsed
+        for i, bound in enumerate(HISTOGRAM_BOUNDS):
+            if elapsed <= bound:
+                break
+        else:
+            i = len(HISTOGRAM_BOUNDS)
+        self.histogram[i] += 1
+
+    def as_dict(self):
+        return {'calls': self.calls,
+                'errors': self.errors,
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'total_time': self.total_time,
+                'max_time': self.max_time,
+                'histogram': self.histogram[:]}
+
+
+class SandboxProfile(object):
+
+    def __init__(self):
+        self.starttime = time.time()
+        self.endtime = None
+        self.idle_time = 0.0
+        self.functions = {}      # {fnname: FunctionStats}
+
+    def record(self, fnname, args, answer, elapsed, error=False,
+               resulttype=None, pipelined=False):
+        """Record one request.  The sizes are those of the marshalled
+        'fnname' and 'args' (in) and of what is sent back (out): the
+        'answer' written with the given 'resulttype' (see
+        sandlib.write_message()), or if 'error' is true, the exception
+        in 'answer'.  Nothing is sent back for 'pipelined' requests.
+        """
+        try:
+            stats = self.functions[fnname]
+        except KeyError:
+            if len(self.functions) >= MAX_FNNAMES:
+                fnname = OTHER_FNNAME
+            stats = self.functions.setdefault(fnname, FunctionStats())
+        bytes_in = dumped_size(fnname) + dumped_size(args)
+        if pipelined:
+            bytes_out = 0
+        elif error:
+            bytes_out = exception_size(answer)
+        else:
+            bytes_out = answer_size(answer, resulttype)
+        stats.add(bytes_in, bytes_out, elapsed, error)
+
+    def record_idle(self, elapsed):
+        self.idle_time += elapsed
+
+    def finish(self):
+        if self.endtime is None:
+            self.endtime = time.time()
+
+    def report(self):
+        """Return a summary of everything recorded so far, as a dictionary
+        containing only numbers, strings, lists and dictionaries.
+        """
+        endtime = self.endtime
+        if endtime is None:
+            endtime = time.time()
+        functions = {}
+        handler_time = 0.0
+        for fnname, stats in self.functions.items():
+            functions[fnname] = stats.as_dict()
+            handler_time += stats.total_time
+        return {'wall_time': endtime - self.starttime,
+                'idle_time': self.idle_time,
+                'handler_time': handler_time,
+                'finished': self.endtime is not None,
+                'histogram_bounds': HISTOGRAM_BOUNDS[:],
+                'functions': functions}
+
+    def write(self, f):
+        import json
+        json.dump(self.report(), f, indent=1, sort_keys=True)
+        f.write('\n')
@@ -0,0 +1,146 @@
+import py
+import random
+from cStringIO import StringIO
+from rpython.translator.sandbox import _fastmarshal, _marshal
+from rpython.rlib import rmarshal
+from rpython.rlib.rarithmetic import r_longlong
+
+
+def random_value(rnd, depth=0):
+    kind = rnd.randrange(9 if depth < 4 else 7)
+    if kind == 0:
+        return None
+    elif kind == 1:
+        return rnd.choice([True, False])
+    elif kind == 2:
+        return rnd.randrange(-2**31, 2**31)
+    elif kind == 3:
+        return rnd.randrange(-2**63, 2**63)
+    elif kind == 4:
+        return rnd.choice([0.0, -1.5, 1e300, 3.141592, float('inf')])
+    elif kind in (5, 6):
+        return ''.join([chr(rnd.randrange(256))
+                        for i in range(rnd.randrange(20))])
+    items = [random_value(rnd, depth + 1) for i in range(rnd.randrange(5))]
+    if kind == 7:
+        return tuple(items)
+    return items
+
+def test_same_format_as_marshal():
+    rnd = random.Random(42)
+    for i in range(2000):
+        x = random_value(rnd)
+        data = _fastmarshal.dumps(x)
+        assert data == _marshal.dumps(x)
+        assert _fastmarshal.loads(data) == x
+        assert _fastmarshal.load(StringIO(data)) == x
+
+def test_fallback_dump():
+    for x in [{1: 2}, 2**100, u'unicode', ('x', {})]:
+        assert _fastmarshal.dumps(x) == _marshal.dumps(x)
+        py.test.raises(ValueError, _fastmarshal.loads, _marshal.dumps(x))
+
+def test_understood_by_rmarshal():
+    cases = [(int, -42), (int, 2**40), (r_longlong, -2**62),
+             (str, 'hello\x00'), (float, 0.25), ((int, str), (5, 'x')),
+             ([str], ['a', 'bc']), (bool, True)]
+    for tp, x in cases:
+        loader = rmarshal.get_loader(tp)
+        assert loader(rmarshal.Loader(_fastmarshal.dumps(x))) == x
+        buf = []
+        rmarshal.get_marshaller(tp)(buf, x)
+        assert _fastmarshal.loads(''.join(buf)) == x
+
+def test_load_prefix():
+    first = _fastmarshal.dumps('ll_os.ll_os_write')
+    data = first + _fastmarshal.dumps((1, 'spam'))
+    x, pos = _fastmarshal.load_prefix(data)
+    assert x == 'll_os.ll_os_write'
+    assert pos == len(first)
+    x, pos = _fastmarshal.load_prefix(data, pos)
+    assert x == (1, 'spam')
+    assert pos == len(data)
+    for i in range(len(first)):
+        e = py.test.raises(EOFError, _fastmarshal.load_prefix, data[:i])
+        # 'needed' is a lower bound of the length of the data, exact once
+        # the length of the string is known
+        assert i < e.value.needed <= len(first)
+        if i >= 5:
+            assert e.value.needed == len(first)
+    for i in range(len(first), len(data)):
+        py.test.raises(EOFError, _fastmarshal.load_prefix, data[:i],
+                       len(first))
+
+def check_rejected(data):
+    # either 'data' is rejected, or it is valid and decodes to a value
+    # that round-trips and that the reference _marshal agrees with.
+    # Returns True if it was rejected.
+    try:
+        x = _fastmarshal.loads(data)
+    except (ValueError, EOFError):
+        return True
+    dumped = _fastmarshal.dumps(x)
+    assert _fastmarshal.dumps(_fastmarshal.loads(dumped)) == dumped
+    assert _fastmarshal.dumps(_marshal.loads(data)) == dumped
+    return False
+
+def test_fuzz_mutations():
+    rnd = random.Random(1234)
+    rejected = 0
+    for i in range(3000):
+        data = _fastmarshal.dumps(random_value(rnd))
+        data = list(data)
+        for j in range(rnd.randrange(1, 4)):
+            if not data:
+                break
+            k = rnd.randrange(len(data))
+            action = rnd.randrange(3)
+            if action == 0:
+                data[k] = chr(rnd.randrange(256))
+            elif action == 1:
+                del data[k]
+            else:
+                data.insert(k, chr(rnd.randrange(256)))
+        rejected += check_rejected(''.join(data))
+    assert 0 < rejected < 3000
+
+def test_fuzz_random_bytes():
+    rnd = random.Random(5678)
+    rejected = 0
+    for i in range(3000):
+        data = ''.join([chr(rnd.randrange(256))
+                        for j in range(rnd.randrange(30))])
+        rejected += check_rejected(data)
+    assert rejected > 2000
+
+def test_truncated():
+    rnd = random.Random(91011)
+    for i in range(200):
+        data = _fastmarshal.dumps(random_value(rnd))
+        for j in range(len(data)):
+            py.test.raises(EOFError, _fastmarshal.loads, data[:j])
+
+def test_malicious_lengths():
+    # huge lengths must not make us allocate or loop before seeing data
+    py.test.raises(EOFError, _fastmarshal.loads, 's\xff\xff\xff\x7fabc')
+    py.test.raises(EOFError, _fastmarshal.loads, '[\xff\xff\xff\x7fN')
+    py.test.raises(ValueError, _fastmarshal.loads, 's\xff\xff\xff\xff')
+    py.test.raises(ValueError, _fastmarshal.loads, '(\x00\x00\x00\x80')
+    py.test.raises(ValueError, _fastmarshal.loads, 'f\x03abc')
+    py.test.raises(ValueError, _fastmarshal.loads, 'c\x00\x00\x00\x00')
+    py.test.raises(ValueError, _fastmarshal.loads, 'NN')
+
+def test_nesting_limit():
+    x = None
+    for i in range(_fastmarshal.MAX_DEPTH):
+        x = (x,)
+    assert _fastmarshal.loads(_fastmarshal.dumps(x)) == x
+    py.test.raises(ValueError, _fastmarshal.loads, _fastmarshal.dumps((x,)))
+    py.test.raises(ValueError, _fastmarshal.loads, '(\x01\x00\x00\x00' * 10000)
+
+def test_dumped_size():
+    rnd = random.Random(4321)
+    for i in range(500):
+        x = random_value(rnd)
+        assert _fastmarshal.dumped_size(x) == len(_fastmarshal.dumps(x))
+    assert _fastmarshal.dumped_size({1: 2}) == len(_marshal.dumps({1: 2}))
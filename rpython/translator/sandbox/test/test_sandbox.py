@@ -1,5 +1,5 @@
 import py
-import sys, os, time
+import sys, os, time, errno
 import struct
 import subprocess
 import signal
@@ -42,10 +42,17 @@ def compile(f, gc='ref', **kwds):
                     check_str_without_nul=True, **kwds)
     return str(t.compile())
 
-def run_in_subprocess(exe):
+def expect_pipelined(f, fnname, args):
+    msg = read_message(f)
+    assert msg == fnname
+    msg = read_message(f)
+    assert msg == args
+
+def run_in_subprocess(exe, env=None):
     popen = subprocess.Popen(exe, stdin=subprocess.PIPE,
                              stdout=subprocess.PIPE,
-                             stderr=subprocess.STDOUT)
+                             stderr=subprocess.STDOUT,
+                             env=env)
     return popen.stdin, popen.stdout
 
 def test_open_dup():
@@ -325,6 +332,48 @@ def test_environ_items():
     f.close()
     assert tail == ""
 
+def test_protocol_pipelined_writes():
+    def entry_point(argv):
+        os.write(1, "hello\n")
+        os.write(2, "world\n")
+        fd = os.dup(42)
+        os.write(1, str(fd))
+        count = os.write(fd, "spam")
+        os.write(1, str(count))
+        return 0
+
+    exe = compile(entry_point)
+    g, f = run_in_subprocess(exe, env={'RPY_SANDBOX_PROTOCOL': '2'})
+    expect(f, g, "sandbox.protocol", (2,), 2)
+    expect_pipelined(f, "ll_os.ll_os_write", (1, "hello\n"))
+    expect_pipelined(f, "ll_os.ll_os_write", (2, "world\n"))
+    expect(f, g, "ll_os.ll_os_dup", (42, True), 43)
+    expect_pipelined(f, "ll_os.ll_os_write", (1, "43"))
+    expect(f, g, "ll_os.ll_os_write", (43, "spam"), 3)
+    expect_pipelined(f, "ll_os.ll_os_write", (1, "3"))
+    g.close()
+    tail = f.read()
+    f.close()
+    assert tail == ""
+
+def test_protocol_fallback():
+    def entry_point(argv):
+        count = os.write(1, "hello\n")
+        os.write(1, str(count))
+        return 0
+
+    exe = compile(entry_point)
+    for answer in [RuntimeError("unknown"), OSError(errno.EPERM, "no"),
+                   IOError(), ValueError(), "not an int", 1]:
+        g, f = run_in_subprocess(exe, env={'RPY_SANDBOX_PROTOCOL': '2'})
+        expect(f, g, "sandbox.protocol", (2,), answer)
+        expect(f, g, "ll_os.ll_os_write", (1, "hello\n"), 5)
+        expect(f, g, "ll_os.ll_os_write", (1, "5"), 1)
+        g.close()
+        tail = f.read()
+        f.close()
+        assert tail == ""
+
 
 class TestPrintedResults:
 
@@ -1,13 +1,15 @@
 import py
-import errno, os, StringIO
+import errno, os, sys, time, StringIO
 from rpython.tool.sourcetools import func_with_new_name
 from rpython.rtyper.lltypesystem import rffi
 from rpython.translator.sandbox.sandlib import SandboxedProc
 from rpython.translator.sandbox.sandlib import SimpleIOSandboxedProc
 from rpython.translator.sandbox.sandlib import VirtualizedSandboxedProc
 from rpython.translator.sandbox.sandlib import VirtualizedSocketProc
+from rpython.translator.sandbox.sandlib import SandboxPool, KILL_REASONS
 from rpython.translator.sandbox.test.test_sandbox import compile
 from rpython.translator.sandbox.vfs import Dir, File, RealDir, RealFile
+from rpython.translator.sandbox.vfs import MemDir, Quota
 
 
 class MockSandboxedProc(SandboxedProc):
@@ -100,6 +102,25 @@ def test_simpleio():
     assert output == "Please enter a number:\nThe double is: 42\n"
     assert error == ""
 
+def test_simpleio_protocol_versions():
+    def entry_point(argv):
+        for i in range(100):
+            count = os.write(1, "%d\n" % i)
+            os.write(2, "%d" % count)
+        return 0
+    exe = compile(entry_point)
+
+    expected_output = ''.join(["%d\n" % i for i in range(100)])
+    expected_error = ''.join(["%d" % len("%d\n" % i) for i in range(100)])
+    for version in [1, 2]:
+        class Proc(SimpleIOSandboxedProc):
+            protocol_version = version
+        proc = Proc([exe])
+        output, error = proc.communicate("")
+        assert output == expected_output
+        assert error == expected_error
+        assert proc.protocol == version
+
 def test_socketio():
     class SocketProc(VirtualizedSocketProc, SimpleIOSandboxedProc):
         def build_virtual_root(self):
@@ -265,3 +286,287 @@ def test_getuid():
     output, error = proc.communicate("")
     assert output == "uid is 1000\neuid is 1000\ngid is 1000\negid is 1000\n"
     assert error == ""
+
+def test_pool():
+    def entry_point(argv):
+        # "startup": read a file before waiting for the job on stdin
+        fd = os.open('/hi.txt', os.O_RDONLY, 0777)
+        greeting = os.read(fd, 100)
+        os.close(fd)
+        job = os.read(0, 100)
+        fd = os.open('/job.txt', os.O_RDONLY, 0777)
+        jobdata = os.read(fd, 100)
+        os.close(fd)
+        os.write(1, greeting + job + jobdata)
+        return 0
+    exe = compile(entry_point)
+    executables = [exe]
+
+    pool = SandboxPool(lambda: SandboxedProcWithFiles(executables), size=2)
+    try:
+        assert len(pool.ready) == 2
+        for proc in pool.ready:
+            fnname, args = proc.pending_request
+            assert fnname == 'll_os.ll_os_read' and args[0] == 0
+        for i in range(3):
+            root = Dir({'job.txt': File("job %d\n" % i)})
+            output, error = pool.communicate("input %d\n" % i,
+                                             virtual_root=root)
+            assert output == "Hello, world!\ninput %d\njob %d\n" % (i, i)
+            assert error == ""
+            assert len(pool.ready) == 2
+        # if the replacement subprocess fails to start, the result of
+        # the job is still returned and the pool is just smaller
+        executables[0] = '/bin/false'
+        output, error = pool.communicate("input 3\n", virtual_root=root)
+        assert output == "Hello, world!\ninput 3\njob 2\n"
+        assert len(pool.ready) == 1
+        executables[0] = exe
+        output, error = pool.communicate("input 4\n", virtual_root=root)
+        assert output == "Hello, world!\ninput 4\njob 2\n"
+        assert len(pool.ready) == 2
+    finally:
+        pool.close()
+    assert pool.ready == []
+
+def test_large_read_write():
+    def entry_point(argv):
+        fd = os.open('/big', os.O_RDONLY, 0777)
+        chunks = []
+        while True:
+            data = os.read(fd, 64 * 1024 * 1024)
+            if not data:
+                break
+            chunks.append(data)
+        os.close(fd)
+        data = ''.join(chunks)
+        os.write(1, data)
+        os.write(2, str(len(chunks)))
+        return 0
+    exe = compile(entry_point)
+
+    big = ''.join([chr(i % 251) for i in range(1000)]) * 20000
+    for version in [1, 2]:
+        class BigFileProc(SandboxedProcWithFiles):
+            protocol_version = version
+            def build_virtual_root(self):
+                return Dir({'big': File(big)})
+        proc = BigFileProc([exe])
+        output, error = proc.communicate("")
+        assert output == big
+        assert error == str((len(big) - 1) // proc.max_read_size + 1)
+
+
+def test_writable_vfs():
+    def entry_point(argv):
+        os.mkdir('/tmp/sub', 0777)
+        fd = os.open('/tmp/sub/out.txt', os.O_WRONLY|os.O_CREAT|os.O_TRUNC,
+                     0666)
+        os.write(fd, 'hello ')
+        os.write(fd, 'world\n')
+        os.close(fd)
+        fd = os.open('/tmp/sub/out.txt', os.O_RDWR|os.O_APPEND, 0)
+        os.write(fd, 'more\n')
+        os.lseek(fd, 0, os.SEEK_SET)
+        os.write(1, 'read: ' + os.read(fd, 100))
+        os.close(fd)
+        for path in ['/hi.txt', '/new.txt']:
+            try:
+                os.open(path, os.O_WRONLY|os.O_CREAT, 0666)
+            except OSError as e:
+                print 'denied %s: %d' % (path, e.errno)
+        fd = os.open('/tmp/big', os.O_WRONLY|os.O_CREAT, 0666)
+        try:
+            os.write(fd, 'x' * 200)
+        except OSError as e:
+            print 'quota: %d' % (e.errno,)
+        os.close(fd)
+        try:
+            os.rmdir('/tmp/sub')
+        except OSError as e:
+            print 'rmdir: %d' % (e.errno,)
+        os.unlink('/tmp/sub/out.txt')
+        os.rmdir('/tmp/sub')
+        print ','.join(os.listdir('/tmp'))
+        return 0
+    exe = compile(entry_point)
+
+    class WritableTmpProc(SandboxedProcWithFiles):
+        def build_virtual_root(self):
+            self.quota = Quota(max_bytes=100, max_inodes=10)
+            root = SandboxedProcWithFiles.build_virtual_root(self)
+            root.entries['tmp'] = MemDir(quota=self.quota)
+            return root
+
+    proc = WritableTmpProc([exe])
+    output, error = proc.communicate("")
+    assert output == ("read: hello world\nmore\n"
+                      "denied /hi.txt: %d\ndenied /new.txt: %d\n"
+                      "quota: %d\nrmdir: %d\nbig\n" % (
+                          errno.EPERM, errno.EPERM,
+                          errno.ENOSPC, errno.ENOTEMPTY))
+    assert error == ""
+    assert proc.quota.used_inodes == 1
+    assert proc.quota.used_bytes == 0
+
+def test_read_write_unknown_fd():
+    def entry_point(argv):
+        count = 0
+        try:
+            os.write(42, 'x')
+        except OSError as e:
+            if e.errno == errno.EBADF:
+                count += 1
+        try:
+            os.read(42, 1)
+        except OSError as e:
+            if e.errno == errno.EBADF:
+                count += 1
+        return count
+    exe = compile(entry_point)
+
+    class VfsOnlyProc(VirtualizedSandboxedProc):
+        def build_virtual_root(self):
+            return Dir({})
+
+    proc = VfsOnlyProc([exe])
+    assert proc.handle_until_return() == 2
+
+def test_profiling():
+    def entry_point(argv):
+        for i in range(3):
+            fd = os.open('/hi.txt', os.O_RDONLY, 0777)
+            os.read(fd, 100)
+            os.close(fd)
+        try:
+            os.open('/missing', os.O_RDONLY, 0777)
+        except OSError:
+            pass
+        os.write(1, 'done\n')
+        return 0
+    exe = compile(entry_point)
+
+    class CountingFile(object):
+        def __init__(self, f):
+            self.f = f
+            self.count = 0
+        def write(self, data):
+            self.count += len(data)
+            self.f.write(data)
+        def flush(self):
+            self.f.flush()
+
+    written = {}
+    class CountingProc(SandboxedProcWithFiles):
+        def handle_request(self, child_stdin, fnname, args):
+            g = CountingFile(child_stdin)
+            result = SandboxedProcWithFiles.handle_request(self, g,
+                                                           fnname, args)
+            written[fnname] = written.get(fnname, 0) + g.count
+            return result
+
+    proc = CountingProc([exe])
+    profile = proc.enable_profiling()
+    assert proc.enable_profiling() is profile
+    output, error = proc.communicate("")
+    assert output == "done\n"
+    report = profile.report()
+    assert report['finished']
+    functions = report['functions']
+    assert functions['ll_os.ll_os_open']['calls'] == 4
+    assert functions['ll_os.ll_os_open']['errors'] == 1
+    assert functions['ll_os.ll_os_read']['calls'] == 3
+    assert functions['ll_os.ll_os_read']['bytes_out'] == 3 * (5 + 5 + 14)
+    assert functions['ll_os.ll_os_close']['calls'] == 3
+    assert functions['ll_os.ll_os_write']['calls'] == 1
+    for fnname, stats in functions.items():
+        assert stats['bytes_out'] == written[fnname]
+    assert written['ll_os.ll_os_write'] == 0      # pipelined
+    assert report['wall_time'] >= report['handler_time']
+
+class TestLimits:
+
+    def setup_class(cls):
+        def entry_point(argv):
+            if argv[1] == 'loop':
+                n = len(argv)
+                while n != 0:     # loops forever: 1000003 is prime
+                    n = (n * 7) % 1000003
+                print n
+            else:
+                for i in range(int(argv[1])):
+                    os.write(1, '.')
+            return 0
+        cls.exe = compile(entry_point)
+
+    def run(self, proc):
+        proc.setup_communicate("")
+        returncode = proc.handle_until_return()
+        output, error = proc.finish_communicate()
+        return returncode, output
+
+    def test_timeout(self):
+        proc = SimpleIOSandboxedProc([self.exe, 'loop'])
+        t0 = time.time()
+        proc.settimeout(0.3)
+        returncode, output = self.run(proc)
+        assert returncode != 0
+        assert proc.kill_reason == 'timeout'
+        assert time.time() - t0 < 1.0
+
+    def test_cpu_time(self):
+        if sys.platform == 'win32':
+            py.test.skip("posix only")
+        class LimitedProc(SimpleIOSandboxedProc):
+            cpu_time_limit = 0.5
+        proc = LimitedProc([self.exe, 'loop'])
+        returncode, output = self.run(proc)
+        assert returncode < 0
+        assert proc.kill_reason == 'cpu-time'
+        # a subprocess that finishes in time is not affected
+        proc = LimitedProc([self.exe, '3'])
+        assert self.run(proc) == (0, '...')
+        assert proc.kill_reason is None
+
+    def test_cpu_time_other_sigkill(self):
+        if sys.platform == 'win32':
+            py.test.skip("posix only")
+        import signal, threading
+        class LimitedProc(SimpleIOSandboxedProc):
+            cpu_time_limit = 60
+        # a SIGKILL that does not come from the CPU time limit, e.g.
+        # from the OOM killer, is not reported as 'cpu-time'
+        proc = LimitedProc([self.exe, 'loop'])
+        killer = threading.Timer(0.3, os.kill, (proc.popen.pid,
+                                                signal.SIGKILL))
+        killer.start()
+        try:
+            returncode, output = self.run(proc)
+        finally:
+            killer.cancel()
+        assert returncode == -signal.SIGKILL
+        assert proc.kill_reason is None
+        assert 0 < proc.cpu_time < 60
+
+    def test_max_syscalls(self):
+        class LimitedProc(SimpleIOSandboxedProc):
+            max_syscalls = 20
+        proc = LimitedProc([self.exe, '10'])
+        assert self.run(proc) == (0, '.' * 10)
+        assert proc.kill_reason is None
+        proc = LimitedProc([self.exe, '1000000'])
+        returncode, output = self.run(proc)
+        assert returncode != 0
+        assert proc.kill_reason == 'syscalls'
+        assert proc.syscall_count == 21
+        assert output == '.' * (20 - 1)    # one request to negotiate
+
+    def test_interact_reports_kill_reason(self):
+        class LimitedProc(SimpleIOSandboxedProc):
+            max_syscalls = 5
+        proc = LimitedProc([self.exe, '1000000'])
+        stdout = StringIO.StringIO()
+        stderr = StringIO.StringIO()
+        proc.interact(StringIO.StringIO(''), stdout, stderr)
+        assert stderr.getvalue() == '[Subprocess killed: %s]\n' % (
+            KILL_REASONS['syscalls'],)
@@ -0,0 +1,190 @@
+import py
+import os, sys, time
+from rpython.translator.sandbox.sandlib import SimpleIOSandboxedProc
+from rpython.translator.sandbox.sandlib import SandboxPool
+from rpython.translator.sandbox.sandmux import SandboxMultiplexer, _Channel
+from rpython.translator.sandbox.sandmux import READ_SIZE
+from rpython.translator.sandbox.test.test_sandbox import compile
+from rpython.translator.sandbox import _fastmarshal
+
+
+def test_channel_requests():
+    first = (_fastmarshal.dumps('ll_os.ll_os_read') +
+             _fastmarshal.dumps((0, 100)))
+    data = (first + _fastmarshal.dumps('ll_os.ll_os_write') +
+            _fastmarshal.dumps((1, 'x' * 1000)))
+    n = len(first)
+    channel = _Channel.__new__(_Channel)
+    channel.chunks = []
+    channel.size = channel.needed = 0
+    channel.feed(data[:n + 10])
+    assert channel.requests() == [('ll_os.ll_os_read', (0, 100))]
+    assert channel.needed == 22        # the string 'll_os.ll_os_write'
+    channel.feed(data[n + 10:n + 40])
+    assert channel.requests() == []
+    assert channel.needed == 22 + 15 + 1000
+    channel.feed(data[n + 40:-1])
+    channel.chunks.append('garbage')   # not even looked at
+    assert channel.requests() == []
+    channel.chunks.pop()
+    channel.feed(data[-1:])
+    assert channel.requests() == [
+        ('ll_os.ll_os_write', (1, 'x' * 1000))]
+    assert channel.size == channel.needed == 0
+    channel.feed(_fastmarshal.dumps('fn') + _fastmarshal.dumps({}))
+    py.test.raises(ValueError, channel.requests)
+
+# the size of the request for os.write(1, ''): a request for os.write(1, s)
+# is WRITE_REQUEST + len(s) bytes
+WRITE_REQUEST = len(_fastmarshal.dumps('ll_os.ll_os_write') +
+                    _fastmarshal.dumps((1, '')))
+
+def make_request(size):
+    # a write request of exactly 'size' bytes
+    data = (_fastmarshal.dumps('ll_os.ll_os_write') +
+            _fastmarshal.dumps((1, 'x' * (size - WRITE_REQUEST))))
+    assert len(data) == size
+    return data
+
+def test_channel_requests_multiple_of_read_size():
+    # a request that arrives as full reads only is still decoded as
+    # soon as its last byte arrives
+    for count in range(1, 6):
+        data = make_request(count * READ_SIZE)
+        channel = _Channel.__new__(_Channel)
+        channel.chunks = []
+        channel.size = channel.needed = 0
+        for i in range(count):
+            channel.feed(data[i * READ_SIZE:(i + 1) * READ_SIZE])
+            requests = channel.requests()
+            if i < count - 1:
+                assert requests == []
+        assert requests == [('ll_os.ll_os_write',
+                             (1, 'x' * (count * READ_SIZE - WRITE_REQUEST)))]
+
+
+class TestMultiplexer:
+
+    def setup_class(cls):
+        def entry_point(argv):
+            if argv[1] == 'loop':
+                n = len(argv)
+                while n != 0:     # loops forever: 1000003 is prime
+                    n = (n * 7) % 1000003
+                print n
+                return 0
+            if argv[1] == 'big':
+                total = 0
+                while True:
+                    t = os.read(0, 1000000)
+                    if not t:
+                        break
+                    total += len(t)
+                print total
+                return 0
+            data = ''
+            while True:
+                t = os.read(0, 7)
+                if not t:
+                    break
+                data += t
+            for i in range(int(argv[1])):
+                os.write(1, '%d:%s\n' % (i, data))
+            os.write(2, 'done\n')
+            return 0
+        cls.exe = compile(entry_point)
+
+    def test_request_multiple_of_read_size(self):
+        # a subprocess that sends a request of exactly 3 * READ_SIZE
+        # bytes in one write, and then waits for the answer
+        class SlowMultiplexer(SandboxMultiplexer):
+            def _serve(self, channel):
+                # let the pipe fill up, so that each read is a full one
+                time.sleep(0.2)
+                SandboxMultiplexer._serve(self, channel)
+        size = 3 * READ_SIZE - WRITE_REQUEST
+        script = ("import os, struct\n"
+                  "data = (struct.pack('<ci', 's', 17) + 'll_os.ll_os_write' +"
+                  "        struct.pack('<cicici', '(', 2, 'i', 1, 's', %d) +"
+                  "        'x' * %d)\n"
+                  "assert len(data) == %d\n"
+                  "os.write(1, data)\n"
+                  "os.read(0, 100)\n" % (size, size, 3 * READ_SIZE))
+        mux = SlowMultiplexer()
+        proc = SimpleIOSandboxedProc([sys.executable, '-c', script])
+        mux.add(proc, input='', timeout=30)
+        returncodes = mux.run()
+        assert proc.kill_reason is None
+        assert returncodes[proc] == 0
+        assert mux.outputs[proc] == ('x' * size, '')
+
+    def test_many(self):
+        mux = SandboxMultiplexer()
+        procs = []
+        for i in range(30):
+            proc = SimpleIOSandboxedProc([self.exe, str(i)])
+            mux.add(proc, input='input%d' % i, timeout=60)
+            procs.append(proc)
+        returncodes = mux.run()
+        for i, proc in enumerate(procs):
+            assert returncodes[proc] == 0
+            expected = ''.join(['%d:input%d\n' % (j, i) for j in range(i)])
+            assert mux.outputs[proc] == (expected, 'done\n')
+            # the pipes are closed when the subprocess finishes
+            assert proc.popen.stdin.closed
+            assert proc.popen.stdout.closed
+
+    def test_timeout(self):
+        mux = SandboxMultiplexer()
+        looping = SimpleIOSandboxedProc([self.exe, 'loop'])
+        normal = SimpleIOSandboxedProc([self.exe, '3'])
+        mux.add(looping, input='', timeout=0.5)
+        mux.add(normal, input='abc', timeout=60)
+        t0 = time.time()
+        returncodes = mux.run()
+        assert time.time() - t0 < 30
+        assert returncodes[looping] < 0
+        assert looping.kill_reason == 'timeout'
+        assert normal.kill_reason is None
+        assert returncodes[normal] == 0
+        assert mux.outputs[normal] == ('0:abc\n1:abc\n2:abc\n', 'done\n')
+
+    def test_stalled_reader(self):
+        import signal
+        class StoppedProc(SimpleIOSandboxedProc):
+            def do_ll_os__ll_os_read(self, fd, size):
+                # stop reading answers, with one much larger than the pipe
+                os.kill(self.popen.pid, signal.SIGSTOP)
+                return SimpleIOSandboxedProc.do_ll_os__ll_os_read(
+                    self, fd, size)
+            def kill(self, reason=None):
+                SimpleIOSandboxedProc.kill(self, reason)
+                os.kill(self.popen.pid, signal.SIGCONT)
+        mux = SandboxMultiplexer()
+        stopped = StoppedProc([self.exe, 'big'])
+        mux.add(stopped, input='x' * 3000000, timeout=2)
+        normals = []
+        for i in range(3):
+            proc = SimpleIOSandboxedProc([self.exe, 'big'])
+            mux.add(proc, input='y' * 3000000, timeout=60)
+            normals.append(proc)
+        returncodes = mux.run()
+        assert returncodes[stopped] < 0
+        assert stopped.kill_reason == 'timeout'
+        for proc in normals:
+            assert returncodes[proc] == 0
+            assert mux.outputs[proc] == ('3000000\n', '')
+
+    def test_from_pool(self):
+        pool = SandboxPool(lambda: SimpleIOSandboxedProc([self.exe, '2']),
+                           size=3)
+        mux = SandboxMultiplexer()
+        procs = []
+        for i in range(3):
+            proc = pool.acquire()
+            mux.add(proc, input='job%d' % i)
+            procs.append(proc)
+        mux.run()
+        for i, proc in enumerate(procs):
+            assert mux.outputs[proc] == ('0:job%d\n1:job%d\n' % (i, i),
+                                         'done\n')
@@ -0,0 +1,82 @@
+import json
+from cStringIO import StringIO
+from rpython.translator.sandbox import sandprof
+from rpython.translator.sandbox.sandprof import SandboxProfile
+from rpython.translator.sandbox._fastmarshal import dumps
+
+
+def test_record():
+    profile = SandboxProfile()
+    profile.record('ll_os.ll_os_read', (3, 100), 'x' * 100, 0.0000015)
+    profile.record('ll_os.ll_os_read', (3, 100), '', 0.5)
+    profile.record('ll_os.ll_os_open', ('/foo', 0, 0), None, 0.001,
+                   error=True)
+    profile.record('ll_os.ll_os_stat', ('/foo',), OSError(2, 'foo'), 0.0,
+                   error=True)
+    profile.record('ll_os.ll_os_write', (1, 'hi'), 2, 0.0, pipelined=True)
+    profile.record_idle(2.5)
+    report = profile.report()
+    assert not report['finished']
+    assert report['idle_time'] == 2.5
+    read = report['functions']['ll_os.ll_os_read']
+    assert read['calls'] == 2
+    assert read['errors'] == 0
+    assert read['bytes_in'] == 2 * len(dumps('ll_os.ll_os_read') +
+                                       dumps((3, 100)))
+    assert read['bytes_out'] == len(dumps(0) + dumps('x' * 100) +
+                                    dumps(0) + dumps(''))
+    assert read['max_time'] == 0.5
+    assert sum(read['histogram']) == 2
+    assert read['histogram'][1] == 1     # between 1us and 2us
+    assert read['histogram'][19] == 1    # between 0.26s and 0.52s
+    opn = report['functions']['ll_os.ll_os_open']
+    assert (opn['calls'], opn['errors'], opn['bytes_out']) == (1, 1, 0)
+    stat = report['functions']['ll_os.ll_os_stat']
+    assert stat['bytes_out'] == len(dumps(1) + dumps(2))
+    write = report['functions']['ll_os.ll_os_write']
+    assert (write['calls'], write['bytes_out']) == (1, 0)
+    assert abs(report['handler_time'] - 0.5010015) < 1e-9
+    profile.finish()
+    report = profile.report()
+    assert report['finished']
+    assert report['wall_time'] >= 0.0
+    assert profile.report() == report
+
+def test_write_json():
+    profile = SandboxProfile()
+    profile.record('ll_time.ll_time_time', (), 1234.5, 100.0)
+    f = StringIO()
+    profile.write(f)
+    report = json.loads(f.getvalue())
+    stats = report['functions']['ll_time.ll_time_time']
+    assert stats['histogram'][-1] == 1
+    assert len(report['histogram_bounds']) == len(stats['histogram']) - 1
+
+def test_too_many_fnnames():
+    profile = SandboxProfile()
+    for i in range(sandprof.MAX_FNNAMES + 10):
+        profile.record('fn%d' % i, (), None, 0.0, error=True)
+    functions = profile.report()['functions']
+    assert len(functions) == sandprof.MAX_FNNAMES + 1
+    assert functions[sandprof.OTHER_FNNAME]['calls'] == 10
+
+def test_record_non_marshal_results():
+    import os
+    from rpython.translator.sandbox.sandlib import write_message
+    from rpython.translator.sandbox.sandlib import RESULTTYPE_STATRESULT
+    from rpython.translator.sandbox.sandlib import RESULTTYPE_LONGLONG
+    st = os.stat_result((0o100644, 12, 34, 1, 1000, 1000, 5678,
+                         1.5, 1234567890.25, 0.0))
+    profile = SandboxProfile()
+    profile.record('ll_os.ll_os_stat', ('/foo',), st, 0.0,
+                   resulttype=RESULTTYPE_STATRESULT)
+    profile.record('ll_os.ll_os_lseek', (3, 0, 2), 2**40, 0.0,
+                   resulttype=RESULTTYPE_LONGLONG)
+    functions = profile.report()['functions']
+    for fnname, answer, resulttype in [
+            ('ll_os.ll_os_stat', st, RESULTTYPE_STATRESULT),
+            ('ll_os.ll_os_lseek', 2**40, RESULTTYPE_LONGLONG)]:
+        f = StringIO()
+        write_message(f, 0)
+        write_message(f, answer, resulttype)
+        assert functions[fnname]['bytes_out'] == len(f.getvalue())
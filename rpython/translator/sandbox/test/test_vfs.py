@@ -1,5 +1,5 @@
 import py
-import sys, stat, os
+import sys, stat, os, errno
 from rpython.translator.sandbox.vfs import *
 from rpython.tool.udir import udir
 
@@ -112,3 +112,143 @@ def test_realdir_exclude():
     py.test.raises(OSError, v_xdir.join, 'test_realdir_exclude.No')
     py.test.raises(OSError, v_xdir.join, 'test_realdir_exclude.nO')
     py.test.raises(OSError, v_xdir.join, 'test_realdir_exclude.NO')
+
+def test_memdir_memfile():
+    quota = Quota(max_bytes=20, max_inodes=3)
+    d = MemDir(quota=quota)
+    assert not d.read_only
+    assert d.access(os.W_OK)
+    f = d.create('foo')
+    py.test.raises(OSError, d.create, 'foo')
+    py.test.raises(OSError, d.create, '')
+    d.mkdir('sub')
+    assert sorted(d.keys()) == ['foo', 'sub']
+    assert quota.used_inodes == 2
+    h = f.open_writable(readable=True)
+    assert h.write('hello') == 5
+    h.seek(0)
+    assert h.read() == 'hello'
+    h.seek(10)
+    h.write('!')
+    assert f.getsize() == 11
+    assert quota.used_bytes == 11
+    e = py.test.raises(OSError, h.write, 'x' * 20)
+    assert e.value.errno == errno.ENOSPC
+    h.truncate(2)
+    assert quota.used_bytes == 2
+    h.close()
+    h = f.open()
+    assert h.read() == 'he'
+    py.test.raises(OSError, h.write, 'x')
+    h = f.open_writable(append=True)
+    h.write('y')
+    py.test.raises(OSError, h.read)
+    assert f.open().read() == 'hey'
+    f.open_writable(truncate=True)
+    assert f.getsize() == 0
+    d.join('sub').create('x')
+    e = py.test.raises(OSError, d.rmdir, 'sub')
+    assert e.value.errno == errno.ENOTEMPTY
+    e = py.test.raises(OSError, d.create, 'bar')
+    assert e.value.errno == errno.ENOSPC
+    py.test.raises(OSError, d.unlink, 'sub')
+    py.test.raises(OSError, d.rmdir, 'foo')
+    d.join('sub').unlink('x')
+    d.rmdir('sub')
+    d.unlink('foo')
+    assert d.keys() == []
+    assert quota.used_inodes == 0
+    assert quota.used_bytes == 0
+
+def test_memdir_unlink_open_file():
+    quota = Quota()
+    d = MemDir(quota=quota)
+    h = d.create('foo').open_writable(readable=True)
+    h.write('hello')
+    d.unlink('foo')
+    assert d.keys() == []
+    assert quota.used_inodes == 0
+    assert quota.used_bytes == 5
+    h.write(' world')
+    h.seek(0)
+    assert h.read() == 'hello world'
+    h.close()
+    assert quota.used_bytes == 0
+    h.close()
+    assert quota.used_bytes == 0
+
+def test_overlaydir():
+    lower = Dir({'file': File('data'), 'sub': Dir({'x': File('')})})
+    d = OverlayDir(lower)
+    d.create('new')
+    assert sorted(d.keys()) == ['file', 'new', 'sub']
+    assert d.join('file').read_only
+    py.test.raises(OSError, d.create, 'file')
+    py.test.raises(OSError, d.unlink, 'file')
+    py.test.raises(OSError, d.rmdir, 'sub')
+    sub = d.join('sub')
+    assert isinstance(sub, OverlayDir)
+    assert d.join('sub') is sub
+    sub.mkdir('y')
+    assert sorted(sub.keys()) == ['x', 'y']
+    assert lower.join('sub').keys() == ['x']
+    d.unlink('new')
+    assert sorted(d.keys()) == ['file', 'sub']
+
+def test_readonly_dir_refuses_writes():
+    d = Dir({'foo': File('')})
+    for meth in [d.create, d.mkdir, d.unlink, d.rmdir]:
+        e = py.test.raises(OSError, meth, 'foo')
+        assert e.value.errno == errno.EPERM
+
+def test_cachedrealdir():
+    d = udir.ensure('test_cachedrealdir', dir=1)
+    d.join('file1').write('data')
+    d.join('file2.pyc').write('')
+    d.join('.hidden').write('')
+    d.ensure('sub', dir=1).join('subfile').write('spam')
+    v = CachedRealDir(str(d), exclude=['.PYC'])
+    assert sorted(v.keys()) == ['file1', 'sub']
+    f = v.join('file1')
+    assert isinstance(f, RealFile)
+    assert v.join('file1') is f
+    sub = v.join('sub')
+    assert isinstance(sub, CachedRealDir)
+    assert sub.join('subfile').open().read() == 'spam'
+    for name in ['file2.pyc', '.hidden', 'missing']:
+        e = py.test.raises(OSError, v.join, name)
+        assert e.value.errno == errno.ENOENT
+    assert sorted(v._children) == ['file1', 'sub']
+    # the real directory is not looked at again
+    d.join('file3').write('')
+    py.test.raises(OSError, v.join, 'file3')
+    assert 'file3' not in v.keys()
+    # unless we ask for it
+    v = CachedRealDir(str(d), check_mtime=True)
+    assert 'file4' not in v.keys()
+    d.join('file4').write('')
+    os.utime(str(d), (0, 12345))
+    assert 'file4' in v.keys()
+    assert v.join('file4').getsize() == 0
+
+def test_cachedrealdir_manifest():
+    d = udir.ensure('test_cachedrealdir_manifest', dir=1)
+    d.join('file1').write('data')
+    d.ensure('sub', dir=1).join('subfile').write('spam')
+    if HASLINK:
+        d.join('link').mksymlinkto('file1')
+    manifest = CachedRealDir(str(d)).scan()
+    filename = str(udir.join('test_cachedrealdir.manifest'))
+    save_manifest(filename, manifest)
+    manifest = load_manifest(filename)
+    d.join('sub', 'subfile').remove()
+    # the manifest is trusted unless check_mtime=True
+    v = CachedRealDir(str(d), manifest=manifest)
+    assert v.join('sub').keys() == ['subfile']
+    assert isinstance(v.join('sub').join('subfile'), RealFile)
+    if HASLINK:
+        e = py.test.raises(OSError, v.join, 'link')
+        assert e.value.errno == errno.EACCES
+    v = CachedRealDir(str(d), manifest=manifest, check_mtime=True)
+    assert v.join('sub').keys() == []
+    assert v.join('file1').open().read() == 'data'
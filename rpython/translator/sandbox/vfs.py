@@ -67,6 +67,15 @@ class Dir(FSObject):
             return self.entries[name]
         except KeyError:
             raise OSError(errno.ENOENT, name)
+    # the following operations are only allowed in writable directories
+    def create(self, name):
+        raise OSError(errno.EPERM, "write access denied")
+    def mkdir(self, name):
+        raise OSError(errno.EPERM, "write access denied")
+    def unlink(self, name):
+        raise OSError(errno.EPERM, "write access denied")
+    def rmdir(self, name):
+        raise OSError(errno.EPERM, "write access denied")
 
 class RealDir(Dir):
     # If show_dotfiles=False, we pretend that all files whose name starts
@@ -81,37 +90,148 @@ class RealDir(Dir):
         self.path = path
         self.show_dotfiles = show_dotfiles
         self.follow_links  = follow_links
-        self.exclude       = [excl.lower() for excl in exclude]
+        self.exclude       = tuple([excl.lower() for excl in exclude])
     def __repr__(self):
         return '<RealDir %s>' % (self.path,)
     def keys(self):
         names = os.listdir(self.path)
         if not self.show_dotfiles:
             names = [name for name in names if not name.startswith('.')]
-        for excl in self.exclude:
-            names = [name for name in names if not name.lower().endswith(excl)]
+        if self.exclude:
+            names = [name for name in names
+                          if not name.lower().endswith(self.exclude)]
         return names
+    def subdir(self, path):
+        return RealDir(path, show_dotfiles = self.show_dotfiles,
+                             follow_links  = self.follow_links,
+                             exclude       = self.exclude)
     def join(self, name):
         if name.startswith('.') and not self.show_dotfiles:
             raise OSError(errno.ENOENT, name)
-        for excl in self.exclude:
-            if name.lower().endswith(excl):
-                raise OSError(errno.ENOENT, name)
+        if self.exclude and name.lower().endswith(self.exclude):
+            raise OSError(errno.ENOENT, name)
         path = os.path.join(self.path, name)
         if self.follow_links:
             st = os.stat(path)
         else:
             st = os.lstat(path)
         if stat.S_ISDIR(st.st_mode):
-            return RealDir(path, show_dotfiles = self.show_dotfiles,
-                                 follow_links  = self.follow_links,
-                                 exclude       = self.exclude)
+            return self.subdir(path)
         elif stat.S_ISREG(st.st_mode):
             return RealFile(path)
         else:
             # don't allow access to symlinks and other special files
             raise OSError(errno.EACCES, path)
 
+class CachedRealDir(RealDir):
+    # A RealDir that looks at the real directory only once: the result of
+    # keys() and of each join(), including the failed ones, is remembered,
+    # and the subdirectories are CachedRealDirs too.  If check_mtime=True,
+    # the cache of a directory is dropped when its mtime changes, at the
+    # cost of one stat() per lookup.  The whole tree can be scanned in
+    # advance with scan(), which returns a manifest that can be saved with
+    # save_manifest() and given to the constructor of a later instance.
+    def __init__(self, path, show_dotfiles=False, follow_links=False,
+                 exclude=[], check_mtime=False, manifest=None):
+        RealDir.__init__(self, path, show_dotfiles=show_dotfiles,
+                                     follow_links=follow_links,
+                                     exclude=exclude)
+        self.check_mtime = check_mtime
+        self._clear()
+        if manifest is not None:
+            self._load(manifest)
+    def __repr__(self):
+        return '<CachedRealDir %s>' % (self.path,)
+    def _clear(self):
+        self._mtime = None
+        self._keys = None       # set of names, once listed
+        self._children = {}     # {name: node, or errno of a failed join}
+    def _check(self):
+        if self.check_mtime:
+            mtime = os.stat(self.path).st_mtime
+            if mtime != self._mtime:
+                self._clear()
+                self._mtime = mtime
+    def keys(self):
+        self._check()
+        if self._keys is None:
+            self._keys = set(RealDir.keys(self))
+        return list(self._keys)
+    def subdir(self, path):
+        return CachedRealDir(path, show_dotfiles = self.show_dotfiles,
+                                   follow_links  = self.follow_links,
+                                   exclude       = self.exclude,
+                                   check_mtime   = self.check_mtime)
+    def join(self, name):
+        self._check()
+        try:
+            node = self._children[name]
+        except KeyError:
+            # list the directory instead of trying the name: most lookups
+            # done by imports fail, and this way the missing names (as well
+            # as the dotfiles and the excluded names) are not stored
+            if self._keys is None:
+                self._keys = set(RealDir.keys(self))
+            if name not in self._keys:
+                raise OSError(errno.ENOENT, name)
+            try:
+                node = RealDir.join(self, name)
+            except OSError as e:
+                node = e.errno
+            self._children[name] = node
+        if isinstance(node, int):
+            raise OSError(node, name)
+        return node
+
+    def scan(self):
+        """Fill the cache for the whole tree.  Returns a manifest, a tree
+        of tuples that can be passed to the constructor of another
+        CachedRealDir on the same path, to avoid scanning again.
+        """
+        entries = []
+        for name in self.keys():
+            try:
+                node = self.join(name)
+            except OSError as e:
+                entries.append((name, e.errno))
+                continue
+            if isinstance(node, CachedRealDir):
+                entries.append((name, node.scan()))
+            else:
+                entries.append((name, None))
+        mtime = self._mtime
+        if mtime is None:
+            mtime = os.stat(self.path).st_mtime
+        return (mtime, tuple(entries))
+    def _load(self, manifest):
+        mtime, entries = manifest
+        if self.check_mtime:
+            self._check()
+            if mtime != self._mtime:
+                return      # out of date
+        self._keys = set()
+        for name, submanifest in entries:
+            path = os.path.join(self.path, name)
+            if submanifest is None:
+                node = RealFile(path)
+            elif isinstance(submanifest, int):
+                node = submanifest          # the errno of a failed join
+            else:
+                node = self.subdir(path)
+                node._load(submanifest)
+            self._keys.add(name)
+            self._children[name] = node
+
+def save_manifest(filename, manifest):
+    import marshal
+    with open(filename, 'wb') as f:
+        marshal.dump(manifest, f)
+
+def load_manifest(filename):
+    import marshal
+    with open(filename, 'rb') as f:
+        return marshal.load(f)
+
 class File(FSObject):
     kind = stat.S_IFREG
     def __init__(self, data=''):
@@ -135,3 +255,199 @@ class RealFile(File):
             return open(self.path, "rb")
         except IOError as e:
             raise OSError(e.errno, "open failed")
+
+
+# ____________________________________________________________
+#
+# Writable nodes, kept in memory
+
+class Quota(object):
+    """Limits on the total size of the file data ('max_bytes') and on the
+    number of files and directories ('max_inodes') that a sandbox can
+    create.  None means no limit.
+    """
+    def __init__(self, max_bytes=None, max_inodes=None):
+        self.max_bytes = max_bytes
+        self.max_inodes = max_inodes
+        self.used_bytes = 0
+        self.used_inodes = 0
+    def charge_bytes(self, delta):
+        if (delta > 0 and self.max_bytes is not None and
+                self.used_bytes + delta > self.max_bytes):
+            raise OSError(errno.ENOSPC, "disk quota exceeded")
+        self.used_bytes += delta
+    def charge_inode(self, delta=1):
+        if (delta > 0 and self.max_inodes is not None and
+                self.used_inodes + delta > self.max_inodes):
+            raise OSError(errno.ENOSPC, "inode quota exceeded")
+        self.used_inodes += delta
+
+class MemDir(Dir):
+    """A directory in which the sandboxed process can create, write and
+    remove files and subdirectories, which only exist in memory.
+    """
+    read_only = False
+    def __init__(self, entries=None, quota=None):
+        if entries is None:
+            entries = {}
+        if quota is None:
+            quota = Quota()
+        self.entries = entries
+        self.quota = quota
+    def _check_new_name(self, name):
+        if not name or name in ('.', '..') or '/' in name:
+            raise OSError(errno.EINVAL, name)
+        try:
+            self.join(name)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+        else:
+            raise OSError(errno.EEXIST, name)
+    def create(self, name):
+        self._check_new_name(name)
+        self.quota.charge_inode()
+        node = self.entries[name] = MemFile(quota=self.quota)
+        return node
+    def mkdir(self, name):
+        self._check_new_name(name)
+        self.quota.charge_inode()
+        self.entries[name] = MemDir(quota=self.quota)
+    def unlink(self, name):
+        node = self.join(name)
+        if name not in self.entries:
+            raise OSError(errno.EPERM, "write access denied")
+        if stat.S_ISDIR(node.kind):
+            raise OSError(errno.EISDIR, name)
+        del self.entries[name]
+        # open handles keep the data, like on a real filesystem
+        node.unlinked = True
+        node.release_if_unused()
+        self.quota.charge_inode(-1)
+    def rmdir(self, name):
+        node = self.join(name)
+        if name not in self.entries:
+            raise OSError(errno.EPERM, "write access denied")
+        if not stat.S_ISDIR(node.kind):
+            raise OSError(errno.ENOTDIR, name)
+        if node.keys():
+            raise OSError(errno.ENOTEMPTY, name)
+        del self.entries[name]
+        self.quota.charge_inode(-1)
+
+class OverlayDir(MemDir):
+    """A writable directory on top of the read-only directory 'lower':
+    all the entries of 'lower' are visible but cannot be changed, and new
+    entries are created in memory.
+    """
+    def __init__(self, lower, quota=None):
+        MemDir.__init__(self, quota=quota)
+        self.lower = lower
+        self.subdirs = {}    # {name: OverlayDir on a subdir of 'lower'}
+    def __repr__(self):
+        return '<OverlayDir %r>' % (self.lower,)
+    def keys(self):
+        names = set(self.lower.keys())
+        names.update(self.entries.keys())
+        return list(names)
+    def join(self, name):
+        try:
+            return self.entries[name]
+        except KeyError:
+            pass
+        try:
+            return self.subdirs[name]
+        except KeyError:
+            pass
+        node = self.lower.join(name)
+        if stat.S_ISDIR(node.kind):
+            node = self.subdirs[name] = OverlayDir(node, self.quota)
+        return node
+
+class MemFile(File):
+    read_only = False
+    def __init__(self, data='', quota=None):
+        if quota is None:
+            quota = Quota()
+        quota.charge_bytes(len(data))
+        self.data = bytearray(data)
+        self.quota = quota
+        self.unlinked = False
+        self.open_handles = 0
+    def __repr__(self):
+        return '<MemFile %d bytes>' % (len(self.data),)
+    def open(self):
+        return MemFileHandle(self, readable=True, writable=False)
+    def open_writable(self, readable=False, truncate=False, append=False):
+        if truncate:
+            self.truncate(0)
+        return MemFileHandle(self, readable, writable=True, append=append)
+    def truncate(self, size):
+        if size < 0:
+            raise OSError(errno.EINVAL, "negative size")
+        delta = size - len(self.data)
+        self.quota.charge_bytes(delta)
+        if delta < 0:
+            del self.data[size:]
+        else:
+            self.data.extend('\x00' * delta)
+    def release_if_unused(self):
+        # the data of an unlinked file is freed when its last handle closes
+        if self.unlinked and self.open_handles == 0:
+            self.truncate(0)
+
+class MemFileHandle(object):
+    """An open MemFile, with the same interface as real file objects."""
+    def __init__(self, node, readable, writable, append=False):
+        self.node = node
+        self.readable = readable
+        self.writable = writable
+        self.append = append
+        self.pos = 0
+        node.open_handles += 1
+    def read(self, size=-1):
+        if not self.readable:
+            raise OSError(errno.EBADF, "file not open for reading")
+        data = self.node.data
+        if size < 0:
+            end = len(data)
+        else:
+            end = min(self.pos + size, len(data))
+        result = str(data[self.pos:end])
+        self.pos = max(self.pos, end)
+        return result
+    def write(self, s):
+        if not self.writable:
+            raise OSError(errno.EBADF, "file not open for writing")
+        node = self.node
+        if self.append:
+            self.pos = len(node.data)
+        end = self.pos + len(s)
+        if end > len(node.data):
+            node.quota.charge_bytes(end - len(node.data))
+            if self.pos > len(node.data):
+                node.data.extend('\x00' * (self.pos - len(node.data)))
+        node.data[self.pos:end] = s
+        self.pos = end
+        return len(s)
+    def seek(self, pos, how=0):
+        if how == 1:
+            pos += self.pos
+        elif how == 2:
+            pos += len(self.node.data)
+        if pos < 0:
+            raise OSError(errno.EINVAL, "negative position")
+        self.pos = pos
+    def tell(self):
+        return self.pos
+    def truncate(self, size):
+        if not self.writable:
+            raise OSError(errno.EBADF, "file not open for writing")
+        self.node.truncate(size)
+    def close(self):
+        node = self.node
+        if node is not None:
+            self.node = None
+            node.open_handles -= 1
+            node.release_if_unused()
+